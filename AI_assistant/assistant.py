@@ -0,0 +1,53 @@
+import argparse
+import asyncio
+import threading
+import speech
+from assistant_core import AssistantCore
+# Importing the skills registers their intents
+import greet
+import reminder
+import gcalendar
+
+# Function to read a typed command
+def read_typed():
+    return input("Command: ")
+
+# Function to load the heavy subsystems in the background once the prompt is up,
+# so the first calendar or voice command doesn't pay for them
+def warm_up(voice):
+    gcalendar.warm_up()
+    reminder.get_index()
+    if voice:
+        import audio_stream
+        audio_stream.get_stream()
+
+# Main loop: one entry point for the weather, time/date, reminder and calendar skills
+def main():
+    parser = argparse.ArgumentParser(description="Voice assistant")
+    parser.add_argument('--text', action='store_true', help="type commands instead of speaking them")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="profile the first skill handler: .prof for cProfile, anything else for collapsed stacks")
+    args = parser.parse_args()
+    listen = read_typed if args.text else greet.listen
+
+    restored = reminder.restore_reminders()
+    if restored:
+        print(f"Restored {restored} pending reminder(s).")
+    reminder_thread = threading.Thread(target=reminder.check_reminders, daemon=True)
+    reminder_thread.start()
+
+    greet.speak("Hello! I'm your AI assistant. How can I help you today?", cacheable=True)
+    threading.Thread(target=warm_up, args=(not args.text,), daemon=True).start()
+    core = AssistantCore(listen, default=greet.not_understood, profile_path=args.profile)
+    # Follow-up questions (e.g. which city) are answered by the next command heard
+    greet.listen = core.follow_up
+    try:
+        asyncio.run(core.run())
+    except KeyboardInterrupt:
+        pass
+
+    reminder.store.close()
+    speech.wait_until_idle()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import asyncio
+import collections
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import intents
+import metrics
+import speech
+
+# Event-loop core of the assistant. Listening runs on its own thread and feeds
+# commands to the loop; every command becomes a task whose skill handler runs
+# on a worker thread, so a slow weather lookup or calendar insert never stops
+# the assistant from hearing the next command. Speech is already queued on the
+# speech worker.
+#
+# "stop" (the cancel intent) cancels every command still running and drops
+# their queued speech. Each skill has a timeout (intents.register(timeout=...),
+# DEFAULT_SKILL_TIMEOUT otherwise) after which it is cancelled the same way.
+# A cancelled handler thread can't be interrupted; it finishes in the
+# background and anything it says is dropped.
+#
+# Skills registered with serial=True (setting, listing and cancelling
+# reminders, calendar inserts) run one at a time in the order they were heard,
+# so "remind me ..." followed by "list my reminders" lists the new reminder.
+# A serial skill that timed out or was stopped keeps its place until its
+# thread has really finished; only the user stops waiting for it.
+# Exit lets every running command finish before saying goodbye.
+
+DEFAULT_SKILL_TIMEOUT = 15.0
+# How long a skill waits for the answer to a follow-up question ("which city?")
+FOLLOW_UP_TIMEOUT = 10.0
+CANCEL_INTENT = 'cancel'
+EXIT_INTENT = 'exit'
+
+# The turn handled by the current skill thread, for follow_up()
+_current = threading.local()
+
+
+# One command being handled
+class _Turn:
+    __slots__ = ('command', 'intent', 'task', 'cancelled')
+
+    def __init__(self, command, intent):
+        self.command = command
+        self.intent = intent
+        self.task = None
+        self.cancelled = False
+
+
+class AssistantCore:
+    def __init__(self, listen, router=intents.router, default=None, timeout=DEFAULT_SKILL_TIMEOUT, max_workers=4,
+                 speech_module=speech, profile_path=None):
+        # listen() blocks until the next command and returns it ('' when
+        # nothing was heard); EOFError or KeyboardInterrupt ends the session
+        self._listen = listen
+        self.router = router
+        self.default = default
+        self.timeout = timeout
+        self.speech = speech_module
+        self.profile_path = profile_path
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='skill')
+        self._loop = None
+        self._commands = None
+        self._turns = set()
+        # Held by the serial skill running now; asyncio.Lock wakes waiters in order
+        self._serial = None
+        # Futures of skills waiting on a follow-up answer, oldest first
+        self._follow_ups = collections.deque()
+        self.handled = 0
+        self.cancelled = 0
+        self.timed_out = 0
+
+    # Function to run the assistant until the exit intent or the end of input
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._commands = asyncio.Queue()
+        self._serial = asyncio.Lock()
+        threading.Thread(target=self._listen_loop, daemon=True).start()
+        try:
+            while True:
+                command = await self._commands.get()
+                if command is None:
+                    # Out of input: answer what was already asked
+                    await self.drain()
+                    break
+                if not command:
+                    continue
+                if self._follow_ups and self._answer_follow_up(command):
+                    continue
+                intent = self._route(command)
+                if intent is not None and intent.name == EXIT_INTENT:
+                    # Answer what was already asked, then say goodbye
+                    await self.drain()
+                    self._start(command, intent)
+                    await self.drain()
+                    break
+                self._start(command, intent)
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _listen_loop(self):
+        while True:
+            try:
+                command = self._listen()
+            except (EOFError, KeyboardInterrupt):
+                command = None
+            except Exception as e:
+                print(f"Listening failed: {e}")
+                command = None
+            self._loop.call_soon_threadsafe(self._commands.put_nowait, command)
+            if command is None:
+                return
+
+    def _route(self, command):
+        with metrics.timer('route'):
+            intent, _ = self.router.route(command)
+        if intent is None:
+            metrics.count('command_not_understood')
+        return intent
+
+    # Function to start the task handling a routed command
+    def _start(self, command, intent):
+        if intent is None:
+            handler, name, timeout, serial = self.default, None, self.timeout, False
+        else:
+            handler, name, timeout, serial = intent.handler, intent.name, intent.timeout or self.timeout, intent.serial
+        if name == CANCEL_INTENT:
+            self.cancel_all()
+        turn = _Turn(command, name)
+        if serial:
+            turn.task = asyncio.ensure_future(self._handle_serial(turn, handler, timeout))
+        else:
+            turn.task = asyncio.ensure_future(self._handle(turn, handler, timeout))
+        self._turns.add(turn)
+        turn.task.add_done_callback(lambda _: self._turns.discard(turn))
+
+    # The timeout starts once the skill's turn comes, not while it waits in line
+    async def _handle_serial(self, turn, handler, timeout):
+        await self._serial.acquire()
+        try:
+            future, event = self._submit(turn, handler)
+        except BaseException:
+            self._serial.release()
+            raise
+        # The next serial skill waits for this handler's thread, even after a
+        # timeout or "stop" has stopped the turn waiting for it
+        future.add_done_callback(lambda _: self._serial.release())
+        return await self._reply(turn, future, event, timeout)
+
+    async def _handle(self, turn, handler, timeout):
+        future, event = self._submit(turn, handler)
+        return await self._reply(turn, future, event, timeout)
+
+    # Function to start a handler on a skill thread; returns its future and the
+    # event that drops its speech once the turn is given up
+    def _submit(self, turn, handler):
+        event = threading.Event()
+        if handler is None:
+            future = self._loop.create_future()
+            future.set_result(None)
+            return future, event
+        context = contextvars.copy_context()
+        context.run(self.speech.cancelled.set, event)
+        call = functools.partial(context.run, self._call, turn, handler)
+        return self._loop.run_in_executor(self._executor, call), event
+
+    # Function to wait for a handler's result on behalf of the user. A timeout
+    # or cancellation only stops the waiting; the thread runs to its end.
+    async def _reply(self, turn, future, event, timeout):
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), timeout)
+            self.handled += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            event.set()
+            self._cancel_follow_ups(turn)
+            print(f"{turn.intent or 'Command'} timed out after {timeout:g} s: {turn.command}")
+            self.speech.speak("Sorry, that is taking too long.", cacheable=True)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            event.set()
+            self._cancel_follow_ups(turn)
+            raise
+        except Exception as e:
+            print(f"{turn.intent or 'Command'} failed: {e}")
+        return None
+
+    def _call(self, turn, handler):
+        if self.profile_path:
+            path, self.profile_path = self.profile_path, None
+            with metrics.profile(path):
+                result = self._call(turn, handler)
+            print(f"Profile written to {path}")
+            return result
+        _current.turn = turn
+        try:
+            with metrics.timer(f'handle_{turn.intent}' if turn.intent else 'not_understood'):
+                return handler(turn.command)
+        finally:
+            _current.turn = None
+
+    # Function to cancel every running command and the speech they queued
+    def cancel_all(self):
+        for turn in list(self._turns):
+            turn.cancelled = True
+            turn.task.cancel()
+        dropped = self.speech.cancel()
+        metrics.count('commands_cancelled')
+        return dropped
+
+    # Function to wait until every running command has finished
+    async def drain(self):
+        tasks = [turn.task for turn in self._turns]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Function for skills to ask a follow-up question: called from a handler
+    # thread in place of listen(), it waits for the next command heard
+    def follow_up(self):
+        turn = getattr(_current, 'turn', None)
+        future = asyncio.run_coroutine_threadsafe(self._wait_follow_up(turn), self._loop)
+        return future.result()
+
+    async def _wait_follow_up(self, turn):
+        future = self._loop.create_future()
+        entry = (turn, future)
+        self._follow_ups.append(entry)
+        try:
+            return await asyncio.wait_for(future, FOLLOW_UP_TIMEOUT)
+        except asyncio.TimeoutError:
+            return ''
+        finally:
+            if entry in self._follow_ups:
+                self._follow_ups.remove(entry)
+
+    def _answer_follow_up(self, command):
+        intent, _ = self.router.route(command)
+        if intent is not None and intent.name == CANCEL_INTENT:
+            return False
+        _, future = self._follow_ups.popleft()
+        if not future.done():
+            future.set_result(command)
+        return True
+
+    def _cancel_follow_ups(self, turn):
+        for waiting, future in list(self._follow_ups):
+            if waiting is turn and not future.done():
+                future.set_result('')
+
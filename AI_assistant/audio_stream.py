@@ -0,0 +1,326 @@
+import collections
+import math
+import os
+import threading
+import time
+import wave
+from array import array
+from operator import mul
+
+import speech_recognition as sr
+
+import metrics
+import recognizers
+
+SAMPLE_RATE = 16000
+# Samples per frame; 512 at 16 kHz is 32 ms
+CHUNK = 512
+
+_TYPECODES = {2: 'h', 4: 'i'}
+
+
+# Function to get the RMS energy of one frame of little-endian PCM
+def frame_energy(frame, sample_width=2):
+    samples = array(_TYPECODES[sample_width], frame)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(map(mul, samples, samples)) / len(samples))
+
+
+# Audio source that keeps one microphone stream open for the whole session
+class MicrophoneSource:
+    def __init__(self, sample_rate=SAMPLE_RATE, chunk=CHUNK, device_index=None):
+        self.microphone = sr.Microphone(device_index=device_index, sample_rate=sample_rate, chunk_size=chunk)
+        self.sample_rate = sample_rate
+        self.sample_width = 2
+        self.chunk = chunk
+        self._opened = False
+
+    def read(self):
+        if not self._opened:
+            self.microphone.__enter__()
+            self.sample_width = self.microphone.SAMPLE_WIDTH
+            self._opened = True
+        return self.microphone.stream.read(self.chunk)
+
+    def close(self):
+        if self._opened:
+            self.microphone.__exit__(None, None, None)
+            self._opened = False
+
+
+# Audio source that plays WAV files (16-bit mono PCM) as if they were the
+# microphone, with a short silence between files. With realtime=True frames are
+# paced at the real audio rate; otherwise they are delivered as fast as possible.
+class WavSource:
+    def __init__(self, paths, chunk=CHUNK, gap=0.5, realtime=False):
+        self.paths = list(paths)
+        self.chunk = chunk
+        self.gap = gap
+        self.realtime = realtime
+        with wave.open(self.paths[0], 'rb') as first:
+            self.sample_rate = first.getframerate()
+            self.sample_width = first.getsampwidth()
+        self._frames = self._generate()
+        self._next_at = None
+
+    def _generate(self):
+        silence = b'\0' * self.chunk * self.sample_width
+        for path in self.paths:
+            with wave.open(path, 'rb') as audio:
+                if audio.getnchannels() != 1 or audio.getframerate() != self.sample_rate \
+                        or audio.getsampwidth() != self.sample_width:
+                    raise ValueError(f"{path}: expected mono {self.sample_rate} Hz audio like the first file")
+                while True:
+                    frame = audio.readframes(self.chunk)
+                    if not frame:
+                        break
+                    yield frame.ljust(self.chunk * self.sample_width, b'\0')
+            for _ in range(int(self.gap * self.sample_rate / self.chunk)):
+                yield silence
+
+    # Returns the next frame, or b'' once every file has been played
+    def read(self):
+        if self.realtime:
+            now = time.monotonic()
+            if self._next_at is None or self._next_at < now:
+                self._next_at = now
+            time.sleep(self._next_at - now)
+            self._next_at += self.chunk / self.sample_rate
+        return next(self._frames, b'')
+
+    def close(self):
+        self._frames.close()
+
+
+# Energy-based voice activity detector. The noise floor is calibrated once from
+# the first frames and then follows the background level during silence, so the
+# threshold keeps adapting without stopping to re-calibrate.
+class EnergyVAD:
+    def __init__(self, sample_rate=SAMPLE_RATE, chunk=CHUNK, sample_width=2, calibration=0.5, ratio=3.0,
+                 min_energy=300.0, adapt_rate=0.05, start_frames=2, pause=0.8, preroll=0.3,
+                 min_speech=0.2, max_speech=15.0):
+        frame_seconds = chunk / sample_rate
+        self.sample_width = sample_width
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.adapt_rate = adapt_rate
+        self.start_frames = start_frames
+        self.calibration_frames = max(1, int(calibration / frame_seconds))
+        self.pause_frames = max(1, int(pause / frame_seconds))
+        self.min_speech_frames = max(1, int(min_speech / frame_seconds))
+        self.max_speech_frames = max(1, int(max_speech / frame_seconds))
+        self.noise_floor = None
+        self.in_speech = False
+        self._calibration = []
+        self._preroll = collections.deque(maxlen=max(start_frames, int(preroll / frame_seconds)))
+        self._voiced_run = 0
+        self._silent_run = 0
+        # Silent preroll frames at the head of the utterance being collected
+        self._lead = 0
+        self._speech = []
+
+    @property
+    def threshold(self):
+        return max(self.min_energy, (self.noise_floor or 0.0) * self.ratio)
+
+    # Function to drop any utterance in progress; the noise floor is kept
+    def reset(self):
+        self.in_speech = False
+        self._voiced_run = 0
+        self._silent_run = 0
+        self._preroll.clear()
+        self._speech = []
+
+    # Function to feed one frame; returns the bytes of a finished utterance or None
+    def process(self, frame):
+        energy = frame_energy(frame, self.sample_width)
+        if self.noise_floor is None:
+            self._calibration.append(energy)
+            if len(self._calibration) >= self.calibration_frames:
+                self.noise_floor = sum(self._calibration) / len(self._calibration)
+                self._calibration = []
+            self._preroll.append(frame)
+            return None
+
+        voiced = energy > self.threshold
+        if not self.in_speech:
+            self._preroll.append(frame)
+            if voiced:
+                self._voiced_run += 1
+                if self._voiced_run >= self.start_frames:
+                    self.in_speech = True
+                    self._speech = list(self._preroll)
+                    self._lead = len(self._speech) - self._voiced_run
+                    self._silent_run = 0
+            else:
+                self._voiced_run = 0
+                self.noise_floor += self.adapt_rate * (energy - self.noise_floor)
+            return None
+
+        self._speech.append(frame)
+        self._silent_run = 0 if voiced else self._silent_run + 1
+        if self._silent_run < self.pause_frames and len(self._speech) < self.max_speech_frames:
+            return None
+        self.in_speech = False
+        self._voiced_run = 0
+        self._preroll.clear()
+        speech, self._speech = self._speech, []
+        if len(speech) - self._lead - self._silent_run < self.min_speech_frames:
+            # Too short to be a command: a click or a cough
+            return None
+        return b''.join(speech)
+
+
+# Persistent capture pipeline: a capture thread runs the VAD over the audio
+# source and queues finished utterances; a recognition thread turns them into
+# text. Capturing the next command overlaps with recognizing the last one, and
+# there is no per-command calibration pause.
+class AudioStream:
+    def __init__(self, source, recognize=None, vad=None):
+        self.source = source
+        self.recognize = recognize
+        self.vad = vad or EnergyVAD(source.sample_rate, source.chunk, source.sample_width)
+        # Utterances waiting for the recognizer: (AudioData, started_at)
+        self._utterances = collections.deque()
+        # Finished results: (text or AudioData, error, started_at)
+        self._results = collections.deque()
+        self._recognizing = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._finished = False
+        # Set by clear(); the capture thread owns the VAD and resets it
+        self._reset_vad = False
+        self._threads = []
+        self.utterances = 0
+        # When the speech behind the last result listen() returned began (time.monotonic())
+        self.heard_at = None
+        self._speech_started = None
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+        self._threads = [threading.Thread(target=self._capture, daemon=True)]
+        if self.recognize:
+            self._threads.append(threading.Thread(target=self._recognize_loop, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self.source.close()
+
+    def _capture(self):
+        try:
+            while self._running:
+                frame = self.source.read()
+                if not frame:
+                    break
+                if self._reset_vad:
+                    with self._cond:
+                        self._reset_vad = False
+                        self.vad.reset()
+                was_speaking = self.vad.in_speech
+                speech = self.vad.process(frame)
+                if not was_speaking and self.vad.in_speech:
+                    self._speech_started = time.monotonic()
+                if speech is not None or was_speaking != self.vad.in_speech:
+                    with self._cond:
+                        if speech is not None:
+                            self.utterances += 1
+                            audio = sr.AudioData(speech, self.source.sample_rate, self.source.sample_width)
+                            if self.recognize:
+                                self._utterances.append((audio, self._speech_started))
+                            else:
+                                self._results.append((audio, None, self._speech_started))
+                        self._cond.notify_all()
+        except Exception as e:
+            # e.g. the microphone went away or a WAV file doesn't match the first
+            print(f"Audio capture failed: {e}")
+        finally:
+            # listen() must see the end of the stream however capture stopped
+            with self._cond:
+                self.vad.reset()
+                self._finished = True
+                self._cond.notify_all()
+
+    def _recognize_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._utterances or not self._running or self._finished)
+                if not self._utterances:
+                    return
+                audio, started_at = self._utterances.popleft()
+                self._recognizing += 1
+            text, error = None, None
+            try:
+                with metrics.timer('recognize'):
+                    text = self.recognize(audio)
+            except Exception as e:
+                error = e
+            with self._cond:
+                self._recognizing -= 1
+                self._results.append((text, error, started_at))
+                self._cond.notify_all()
+
+    def _busy(self):
+        return self.vad.in_speech or self._utterances or self._recognizing
+
+    # Function to drop everything heard so far, e.g. the assistant's own voice,
+    # including an utterance the VAD is still collecting
+    def clear(self):
+        with self._cond:
+            self._utterances.clear()
+            self._results.clear()
+            self._reset_vad = True
+
+    # Function to get the next command: recognized text, or AudioData when the
+    # stream has no recognizer. Recognition errors are raised here. Raises
+    # sr.WaitTimeoutError if nobody starts speaking within `timeout` seconds and
+    # EOFError once a finite source (WAV files) has run out.
+    def listen(self, timeout=None):
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._results:
+                if self._finished and not self._busy():
+                    raise EOFError("audio source exhausted")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0 and not self._busy():
+                    raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+                # Once speech has started, wait for it to finish instead of timing out
+                self._cond.wait(None if self._busy() else remaining)
+            result, error, self.heard_at = self._results.popleft()
+        if error:
+            raise error
+        return result
+
+
+# Function to create the audio source for this deployment. ASSISTANT_AUDIO_FILES
+# (a os.pathsep-separated list of WAV files) replaces the microphone.
+def create_source():
+    files = os.getenv("ASSISTANT_AUDIO_FILES")
+    if files:
+        return WavSource(files.split(os.pathsep), realtime=True)
+    return MicrophoneSource()
+
+
+_stream = None
+_stream_lock = threading.Lock()
+
+
+# Function to get the process-wide audio stream, opening the source on first use
+def get_stream():
+    global _stream
+    with _stream_lock:
+        if _stream is None:
+            _stream = AudioStream(create_source(), recognizers.get_recognizer()).start()
+    return _stream
@@ -0,0 +1,76 @@
+import argparse
+
+from benchmarks.bench_assistant import bench_assistant_core, bench_intents, bench_metrics, bench_phrase_cache, \
+    bench_startup
+from benchmarks.bench_audio import bench_audio_stream, bench_recognizers
+from benchmarks.bench_calendar import bench_calendar_batch, bench_calendar_outbox, bench_calendar_service, \
+    bench_event_index
+from benchmarks.bench_hotpaths import REGRESSION_TOLERANCE, bench_hotpaths
+from benchmarks.bench_parsing import bench_parser, bench_temporal
+from benchmarks.bench_reminders import bench_recurrence, bench_reminder_index, bench_reminder_memory, \
+    bench_service, bench_store
+from benchmarks.bench_weather import bench_weather, bench_weather_many
+
+# Entry point for the benchmarks, which live per area in benchmarks/:
+#   python benchmark.py                  run all of them
+#   python benchmark.py parser store     run some
+#   python benchmark.py hotpaths         the regression suite; exits non-zero when a
+#                                        case is slower than benchmark_baseline.json
+
+BENCHMARKS = {
+    'recurrence': bench_recurrence,
+    'parser': bench_parser,
+    'temporal': bench_temporal,
+    'store': bench_store,
+    'weather': bench_weather,
+    'weather_many': bench_weather_many,
+    'calendar_service': bench_calendar_service,
+    'calendar_batch': bench_calendar_batch,
+    'event_index': bench_event_index,
+    'audio_stream': bench_audio_stream,
+    'recognizers': bench_recognizers,
+    'intents': bench_intents,
+    'startup': bench_startup,
+    'phrase_cache': bench_phrase_cache,
+    'service': bench_service,
+    'metrics': bench_metrics,
+    'hotpaths': bench_hotpaths,
+    'reminder_memory': bench_reminder_memory,
+    'assistant_core': bench_assistant_core,
+    'reminder_index': bench_reminder_index,
+    'calendar_outbox': bench_calendar_outbox
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the assistant hot paths")
+    parser.add_argument('names', nargs='*', help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rules', type=int, default=100_000)
+    parser.add_argument('--phrases', type=int, default=300_000)
+    parser.add_argument('--reminders', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--events', type=int, default=50)
+    parser.add_argument('--cities', type=int, default=40)
+    parser.add_argument('--commands', type=int, default=5, help="spoken commands for the audio benchmarks")
+    parser.add_argument('--wav-dir', help="recorded commands for the recognizers benchmark")
+    parser.add_argument('--backends', help="comma-separated speech backends to compare")
+    parser.add_argument('--requests', type=int, default=20_000, help="requests for the service load test")
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.05, help="stub server latency in seconds")
+    parser.add_argument('--loads', default='1000,10000,100000', help="comma-separated loads for the hot-path suite")
+    parser.add_argument('--baseline', help="hot-path baseline to compare against (default: benchmark_baseline.json)")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help="allowed hot-path slowdown against the baseline before it fails, e.g. 0.25")
+    parser.add_argument('--save-baseline', action='store_true', help="write the hot-path results as the new baseline")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name](args)
+
+
+if __name__ == '__main__':
+    main()
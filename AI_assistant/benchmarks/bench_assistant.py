@@ -0,0 +1,290 @@
+import random
+import tempfile
+import time
+
+from benchmarks.common import APP_DIR, report
+
+# The assistant itself: intent routing, startup, spoken phrase cache, metrics
+# overhead and the asyncio core under slow skills.
+
+
+ROUTED_COMMANDS = [
+    "what time is the weather update", "what is the weather in pune", "remind me to call mom at 5 pm",
+    "schedule a meeting with the team on friday at 10 am", "what is the date today", "tell me a joke", "bye"
+]
+
+
+# Routing cost as the number of registered skills grows: the intent automaton
+# versus an if-chain of substring checks like the old greet.process_command
+def bench_intents(args):
+    from intents import IntentRouter
+
+    base = [('weather', ['weather', 'temperature']), ('time', ['what time', 'time']), ('date', ['date']),
+            ('reminder', ['remind me', 'reminder']), ('calendar', ['schedule', 'meeting with']),
+            ('exit', ['exit', 'bye'])]
+    commands = [ROUTED_COMMANDS[i % len(ROUTED_COMMANDS)] for i in range(args.lookups * 10)]
+    for skills in (10, 100, 1000, 10000):
+        intents = base + [(f"skill{i}", [f"skill{i} word", f"keyword{i}"]) for i in range(skills - len(base))]
+        router = IntentRouter()
+        for name, phrases in intents:
+            router.register(name, phrases, None)
+        router.route('')
+
+        started = time.perf_counter()
+        for command in commands:
+            router.route(command)
+        report(f"intents: automaton, {skills} skills", len(commands), time.perf_counter() - started)
+        started = time.perf_counter()
+        for command in commands:
+            next((name for name, phrases in intents if any(phrase in command for phrase in phrases)), None)
+        report(f"intents: if-chain, {skills} skills", len(commands), time.perf_counter() - started)
+
+
+# Cold start of the assistant in fresh interpreters: import time of the entry
+# point (with the slowest modules from -X importtime) and time until the first
+# prompt is shown, median of several runs
+def bench_startup(args):
+    import os
+    import statistics
+    import subprocess
+    import sys
+
+    here = APP_DIR
+    runs = 5
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, ASSISTANT_TTS='stub', REMINDER_STORE_DIR=directory)
+        imports, prompts = [], []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, '-c', 'import assistant'], cwd=here, env=env, check=True)
+            imports.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            process = subprocess.Popen([sys.executable, '-u', 'assistant.py', '--text'], cwd=here, env=env,
+                                       stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            output = b''
+            while not output.endswith(b'Command: '):
+                byte = process.stdout.read(1)
+                if not byte:
+                    raise SystemExit(f"startup: assistant exited before prompting: {output!r}")
+                output += byte
+            prompts.append(time.perf_counter() - started)
+            process.communicate(b'')
+
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], cwd=here, env=env, check=True)
+        interpreter = time.perf_counter() - started
+        trace = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import assistant'], cwd=here, env=env,
+                               check=True, capture_output=True, text=True).stderr
+
+    print(f"startup: bare interpreter {interpreter * 1000:.0f} ms, median of {runs} runs below")
+    print(f"startup: import assistant {statistics.median(imports) * 1000:.0f} ms")
+    print(f"startup: time to first prompt {statistics.median(prompts) * 1000:.0f} ms")
+    # Cumulative import time of each of the assistant's own modules
+    own = []
+    for line in trace.splitlines()[1:]:
+        _, total_us, module = line.split('|')
+        if os.path.exists(os.path.join(here, module.strip() + '.py')):
+            own.append((int(total_us), module.strip()))
+    for total_us, module in sorted(own, reverse=True)[:5]:
+        print(f"startup: -X importtime {module:<20} {total_us / 1000:7.1f} ms")
+
+
+ANNOUNCEMENTS = [
+    "Hello! I'm your AI assistant. How can I help you today?",
+    "I'm not sure how to help with that. Can you please try again?",
+    "Sorry, I couldn't fetch the weather information at the moment.",
+    "Sure, for which city would you like the weather update?",
+    "Goodbye! Have a great day!"
+]
+
+
+# Time from queuing an announcement to the first audio, for the engine alone
+# and with the phrase cache cold and warm, over a session of fixed phrases and
+# templates. The stub engine has a start-up cost and a per-utterance latency.
+def bench_phrase_cache(args):
+    import speech
+
+    rng = random.Random(args.seed)
+    session = []
+    for i in range(args.commands * 20):
+        kind = rng.random()
+        # Announcements are cached whole; templates only their fixed part
+        if kind < 0.5:
+            session.append((rng.choice(ANNOUNCEMENTS), True))
+        elif kind < 0.75:
+            session.append((["The current time is", f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:00"], (True, False)))
+        else:
+            session.append((["Reminder set for", f"{rng.randrange(1, 13):02d}:00 PM on October {rng.randrange(1, 29)}"],
+                            (True, False)))
+
+    def engine_factory():
+        return speech.StubEngine(seconds_per_char=0.0005, warmup=0.3, latency=0.08)
+
+    def run(label, phrase_cache, player):
+        worker = speech.SpeechWorker(engine_factory, coalesce_window=0, phrase_cache=phrase_cache,
+                                     player=player).start()
+        delays = []
+        for text, cacheable in session:
+            queued = time.perf_counter()
+            worker.speak(text, wait=True, cacheable=cacheable)
+            starts = (worker.engine.started if worker.engine else []) + (player.started if player else [])
+            delays.append(min(start for start in starts if start >= queued) - queued)
+        first = delays[0]
+        delays.sort()
+        print(f"phrase_cache: {label:<12} first {first * 1000:7.1f} ms  p50 {delays[len(delays) // 2] * 1000:6.1f} ms  "
+              f"p99 {delays[int(len(delays) * 0.99)] * 1000:6.1f} ms  engine started: {worker.engine is not None}")
+        if phrase_cache:
+            print(f"phrase_cache: {label:<12} {phrase_cache.metrics()}")
+
+    run("engine only", None, None)
+    with tempfile.TemporaryDirectory() as directory:
+        run("cold cache", speech.PhraseCache(directory), speech.StubPlayer())
+        # A new process: same directory, fresh engine and counters
+        run("warm cache", speech.PhraseCache(directory), speech.StubPlayer())
+
+
+# Cost of the stage instrumentation around a real hot-path call (routing a
+# command): bare, with metrics off (the shipped default) and with metrics on,
+# plus the time to export what was collected
+def bench_metrics(args):
+    import metrics
+    from intents import IntentRouter
+
+    router = IntentRouter()
+    router.register('weather', ['weather', 'temperature'], None)
+    router.register('time', ['what time'], None)
+    commands = [ROUTED_COMMANDS[i % len(ROUTED_COMMANDS)] for i in range(args.lookups * 100)]
+    registry = metrics.Registry()
+    enabled = registry.timed('route')(router.route)
+
+    if metrics.ENABLED:
+        print("metrics: unset ASSISTANT_METRICS to measure the disabled path")
+        return
+
+    def disabled_timer(command):
+        with metrics.timer('route'):
+            return router.route(command)
+
+    def enabled_timer(command):
+        with registry.timer('route'):
+            return router.route(command)
+
+    variants = [('bare', router.route), ('off, timed', metrics.timed('route')(router.route)), ('off, timer', disabled_timer),
+                ('on, timed', enabled), ('on, timer', enabled_timer)]
+    baseline = None
+    for label, route in variants:
+        # Best of a few runs: the differences are small next to scheduling noise
+        elapsed = float('inf')
+        for _ in range(5):
+            started = time.perf_counter()
+            for command in commands:
+                route(command)
+            elapsed = min(elapsed, time.perf_counter() - started)
+        baseline = baseline or elapsed
+        report(f"metrics: {label}", len(commands), elapsed)
+        print(f"    overhead {(elapsed - baseline) / len(commands) * 1e9:+.0f} ns/call")
+
+    started = time.perf_counter()
+    text = registry.prometheus()
+    lines = registry.jsonl()
+    print(f"metrics: export {(time.perf_counter() - started) * 1000:.2f} ms "
+          f"({len(text.splitlines())} Prometheus lines, {len(lines.splitlines())} JSON lines)")
+
+
+# Back-to-back commands against slow simulated backends (weather and calendar
+# calls that take SLOW_SKILL_SECONDS): end-to-end latency from when a command is
+# heard to when its skill has answered, for the old serial loop and for the
+# asyncio core, plus how fast 'stop' and a skill timeout take effect
+SLOW_SKILL_SECONDS = 0.5
+CORE_COMMANDS = ["what is the weather in pune", "what time is it", "what is the date today",
+                 "schedule a meeting with the team on friday at 10 am", "what time is it", "what is the date today"]
+
+
+def bench_assistant_core(args):
+    import asyncio
+    import types
+    import speech
+    from assistant_core import AssistantCore
+    from intents import IntentRouter
+
+    gap = 0.1
+    done = {}
+
+    def skill(seconds):
+        def handler(command):
+            time.sleep(seconds)
+            done[command] = time.perf_counter()
+        return handler
+
+    router = IntentRouter()
+    router.register('weather', ['weather'], skill(SLOW_SKILL_SECONDS))
+    router.register('calendar', ['schedule'], skill(SLOW_SKILL_SECONDS))
+    router.register('time', ['what time'], skill(0.005))
+    router.register('date', ['date'], skill(0.005))
+    router.register('cancel', ['stop'], None)
+    router.register('hang', ['hang'], skill(5.0), timeout=0.3)
+    quiet = types.SimpleNamespace(cancelled=speech.cancelled, speak=lambda *a, **kw: True, cancel=lambda: 0)
+    commands = [f"{CORE_COMMANDS[i % len(CORE_COMMANDS)]} #{i}" for i in range(args.commands * 4)]
+
+    # Function to hand out the commands as if spoken every `gap` seconds. A
+    # command said while the listener was busy is picked up as soon as it
+    # listens again, but its latency still counts from when it was said.
+    def scripted(script, heard):
+        script = iter(enumerate(script, 1))
+        origin = []
+
+        def listen():
+            if not origin:
+                origin.append(time.perf_counter())
+            i, command = next(script, (None, None))
+            if command is None:
+                raise EOFError
+            said = origin[0] + i * gap
+            time.sleep(max(0.0, said - time.perf_counter()))
+            heard[command] = said
+            return command
+        return listen
+
+    def summary(label, heard):
+        latencies = sorted(done[command] - heard[command] for command in heard if command in done)
+        fast = sorted(done[command] - heard[command] for command in heard
+                      if command in done and router.route(command)[0].name not in ('weather', 'calendar'))
+        print(f"assistant core: {label:<7} {len(latencies)} commands  p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms"
+              f"  max {latencies[-1] * 1000:7.1f} ms  quick skills p50 {fast[len(fast) // 2] * 1000:7.1f} ms"
+              f"  max {fast[-1] * 1000:7.1f} ms")
+
+    # The loop as it was: listen, handle, listen again
+    heard = {}
+    listen = scripted(commands, heard)
+    started = time.perf_counter()
+    try:
+        while True:
+            router.dispatch(listen())
+    except EOFError:
+        pass
+    serial = time.perf_counter() - started
+    summary("serial", heard)
+
+    done.clear()
+    heard = {}
+    core = AssistantCore(scripted(commands, heard), router=router, speech_module=quiet)
+    started = time.perf_counter()
+    asyncio.run(core.run())
+    print(f"assistant core: session {serial:.2f} s serial, {time.perf_counter() - started:.2f} s with the core")
+    summary("core", heard)
+
+    # 'stop' while two slow skills are running, and a skill that hangs past its timeout
+    done.clear()
+    heard = {}
+    core = AssistantCore(scripted(["what is the weather in pune", "schedule a meeting", "stop", "hang"], heard),
+                         router=router, speech_module=quiet)
+
+    async def session():
+        await core.run()
+        await core.drain()
+
+    started = time.perf_counter()
+    asyncio.run(session())
+    print(f"assistant core: stop cancelled {core.cancelled} running skill(s), "
+          f"{core.timed_out} timed out; session {time.perf_counter() - started:.2f} s")
@@ -0,0 +1,218 @@
+import math
+import random
+import tempfile
+import time
+import wave
+from array import array
+
+import speech_recognition as sr
+
+from benchmarks.common import report
+
+# Microphone pipeline on synthetic or recorded commands: the always-on audio
+# stream and the speech recognizer backends.
+
+
+# Function to write a synthetic spoken command: background noise around a burst
+# of amplitude-modulated harmonics standing in for speech
+def synthetic_command(path, seconds, rng, sample_rate=16000):
+    samples = array('h')
+    lead = int(0.3 * sample_rate)
+    voiced = int(seconds * sample_rate)
+    pitch = rng.uniform(100, 220)
+    for i in range(lead + voiced + lead):
+        value = rng.gauss(0, 60)
+        if lead <= i < lead + voiced:
+            t = (i - lead) / sample_rate
+            envelope = 0.6 + 0.4 * math.sin(2 * math.pi * 4 * t)
+            value += 6000 * envelope * sum(math.sin(2 * math.pi * pitch * k * t) / k for k in (1, 2, 3))
+        samples.append(max(-32768, min(32767, int(value))))
+    with wave.open(path, 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(sample_rate)
+        audio.writeframes(samples.tobytes())
+    return path
+
+
+# Real-time audio source for the turn-around benchmark: background noise until
+# prompt(), then the next WAV file as the user's reply. It works both as an
+# audio_stream source and as a speech_recognition AudioSource.
+class PromptedSource(sr.AudioSource):
+    def __init__(self, paths, chunk=512, reaction=0.2, seed=0):
+        self.files = [wave.open(path, 'rb') for path in paths]
+        self.sample_rate = self.SAMPLE_RATE = self.files[0].getframerate()
+        self.sample_width = self.SAMPLE_WIDTH = 2
+        self.chunk = self.CHUNK = chunk
+        self.reaction = reaction
+        self.stream = self
+        self._rng = random.Random(seed)
+        self._speak_at = None
+        self._next_at = None
+
+    def prompt(self):
+        self._speak_at = time.monotonic() + self.reaction
+
+    def read(self, size=None):
+        now = time.monotonic()
+        if self._next_at is None or self._next_at < now:
+            self._next_at = now
+        time.sleep(self._next_at - now)
+        self._next_at += self.chunk / self.sample_rate
+        if self._speak_at is not None and self._next_at >= self._speak_at and self.files:
+            frame = self.files[0].readframes(self.chunk)
+            if len(frame) == self.chunk * 2:
+                return frame
+            self.files.pop(0).close()
+            self._speak_at = None
+        return array('h', (int(self._rng.gauss(0, 60)) for _ in range(self.chunk))).tobytes()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def close(self):
+        pass
+
+
+# Utterance segmentation over WAV files faster than real time, then turn-around
+# per command (prompt to recognized text) for the old per-command calibration
+# loop versus the persistent stream, both in real time with a stub recognizer
+def bench_audio_stream(args):
+    from audio_stream import AudioStream, WavSource
+
+    def recognize(audio):
+        time.sleep(args.latency)
+        return f"{len(audio.frame_data)} bytes"
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [synthetic_command(f"{directory}/command{i}.wav", rng.uniform(0.6, 1.5), rng)
+                 for i in range(args.commands)]
+        stream = AudioStream(WavSource(paths), recognize)
+        started = time.perf_counter()
+        heard = []
+        try:
+            while True:
+                heard.append(stream.listen())
+        except EOFError:
+            pass
+        report("audio_stream: segment + recognize WAVs", len(heard), time.perf_counter() - started)
+        if len(heard) != len(paths):
+            raise SystemExit(f"audio_stream: expected {len(paths)} utterances, got {len(heard)}")
+
+        def legacy_turns(source):
+            recognizer = sr.Recognizer()
+            for _ in paths:
+                started = time.perf_counter()
+                with source:
+                    recognizer.adjust_for_ambient_noise(source)
+                    source.prompt()
+                    audio = recognizer.listen(source, timeout=5)
+                recognize(audio)
+                yield time.perf_counter() - started
+
+        def stream_turns(source):
+            stream = AudioStream(source, recognize).start()
+            for _ in paths:
+                started = time.perf_counter()
+                source.prompt()
+                stream.listen(timeout=5)
+                yield time.perf_counter() - started
+            stream.stop()
+
+        for label, turns in (("calibrate every command", legacy_turns), ("persistent stream", stream_turns)):
+            timings = list(turns(PromptedSource(paths, seed=args.seed)))
+            print(f"audio_stream: {label:<24} turn-around avg {sum(timings) / len(timings):6.3f} s  "
+                  f"max {max(timings):6.3f} s")
+
+
+# Function to compute the word error rate of a transcript against a reference
+def word_error_rate(reference, hypothesis):
+    reference, hypothesis = reference.lower().split(), hypothesis.lower().split()
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / max(1, len(reference))
+
+
+# Stand-in engine for runs without recordings: returns the transcript registered
+# for the audio after a fixed delay
+class ScriptedBackend:
+    name = 'scripted'
+
+    def __init__(self, transcripts, latency):
+        self.transcripts = transcripts
+        self.latency = latency
+
+    def load(self):
+        return self
+
+    def recognize(self, audio):
+        import recognizers
+        time.sleep(self.latency)
+        return self.transcripts[recognizers.audio_key(audio)]
+
+
+SPOKEN_COMMANDS = [
+    "what is the weather in london", "set a reminder to call mom tomorrow at 5 pm",
+    "schedule a meeting with the team on friday at 10 am", "what time is it", "what is the date today"
+]
+
+
+# Latency and accuracy of the speech backends over a fixed set of WAV commands
+# (--wav-dir: each name.wav next to a name.txt transcript), first with a cold
+# result cache and then replayed against the warm cache. Without --wav-dir the
+# commands are synthetic and a scripted backend stands in for the engine.
+def bench_recognizers(args):
+    import glob
+    import os
+    import recognizers
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.wav_dir:
+            paths = sorted(glob.glob(os.path.join(args.wav_dir, '*.wav')))
+            references = [open(path[:-4] + '.txt', encoding='utf-8').read().strip() for path in paths]
+        else:
+            rng = random.Random(args.seed)
+            references = [SPOKEN_COMMANDS[i % len(SPOKEN_COMMANDS)] for i in range(args.commands)]
+            paths = [synthetic_command(f"{directory}/command{i}.wav", rng.uniform(0.6, 1.5), rng)
+                     for i in range(len(references))]
+        clips = []
+        for path in paths:
+            with sr.AudioFile(path) as source:
+                clips.append(sr.Recognizer().record(source))
+
+    names = args.backends.split(',') if args.backends else ['google' if args.wav_dir else 'scripted']
+    for name in names:
+        started = time.perf_counter()
+        try:
+            if name == 'scripted':
+                transcripts = {recognizers.audio_key(clip): text for clip, text in zip(clips, references)}
+                backend = ScriptedBackend(transcripts, args.latency)
+            else:
+                backend = recognizers.create_backend(name).load()
+        except (ValueError, sr.RequestError) as e:
+            print(f"recognizers: {name}: skipped ({e})")
+            continue
+        print(f"recognizers: {name}: loaded in {time.perf_counter() - started:.3f} s")
+        recognizer = recognizers.CachedRecognizer(backend)
+        for label in ("cold cache", "warm cache"):
+            timings, errors = [], 0.0
+            for clip, reference in zip(clips, references):
+                started = time.perf_counter()
+                try:
+                    text = recognizer(clip)
+                except (sr.UnknownValueError, sr.RequestError):
+                    text = ''
+                timings.append(time.perf_counter() - started)
+                errors += word_error_rate(reference, text)
+            timings.sort()
+            print(f"recognizers: {name:<12} {label:<10} p50 {timings[len(timings) // 2] * 1000:8.1f} ms  "
+                  f"max {timings[-1] * 1000:8.1f} ms  WER {errors / len(clips):6.1%}")
+        print(f"recognizers: {name}: cache hits {recognizer.hits}, misses {recognizer.misses}")
@@ -0,0 +1,331 @@
+import contextlib
+import io
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from email.parser import BytesParser
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.common import StubHTTPServer, report
+
+# Calendar skill against a fake Calendar API: single and batched inserts, the
+# local event index and the write-behind outbox.
+
+
+# Local stand-in for the Calendar v3 events.insert, events.list and batch
+# endpoints with injected latency, optional rate-limit errors, duplicate-id
+# detection and sync tokens (an offset into the log of inserted events)
+class FakeCalendarServer:
+    def __init__(self, latency=0.02, quota_error_rate=0.0, seed=0):
+        self.latency = latency
+        self.quota_error_rate = quota_error_rate
+        self.requests = 0
+        self.inserted = 0
+        self.up = True
+        self._ids = set()
+        self._log = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; don't let Nagle hold the body
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                fake.requests += 1
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                time.sleep(fake.latency)
+                if not fake.up:
+                    return self._reply(503, {'error': {'code': 503, 'message': 'Backend unavailable'}})
+                if self.path.startswith('/batch'):
+                    return self._batch(body)
+                self._reply(*fake.insert(json.loads(body or b'{}')))
+
+            def do_GET(self):
+                fake.requests += 1
+                time.sleep(fake.latency)
+                query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                self._reply(*fake.list(query))
+
+            def _batch(self, body):
+                content_type = self.headers['Content-Type']
+                message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+                boundary = f"batch_{fake.requests}"
+                parts = []
+                for part in message.get_payload():
+                    request_id = part['Content-ID'].strip('<>')
+                    inner_body = re.split(r'\r?\n\r?\n', part.get_payload(), maxsplit=1)[1]
+                    status, payload = fake.insert(json.loads(inner_body))
+                    payload = json.dumps(payload)
+                    parts.append(
+                        f"--{boundary}\r\nContent-Type: application/http\r\n"
+                        f"Content-ID: <response-{request_id}>\r\n\r\n"
+                        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                        f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n{payload}\r\n"
+                    )
+                body = (''.join(parts) + f"--{boundary}--\r\n").encode()
+                self._send(200, f'multipart/mixed; boundary={boundary}', body)
+
+            def _reply(self, status, payload):
+                self._send(status, 'application/json', json.dumps(payload).encode())
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = StubHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/calendar/v3/"
+        self.batch_url = f"http://127.0.0.1:{self.server.server_port}/batch/calendar/v3"
+
+    # Function to handle one events.insert: returns (status, payload)
+    def insert(self, event):
+        with self._lock:
+            if self._rng.random() < self.quota_error_rate:
+                return 403, {'error': {'code': 403, 'message': 'Rate Limit Exceeded',
+                                       'errors': [{'reason': 'rateLimitExceeded'}]}}
+            event_id = event.setdefault('id', f"evt{len(self._ids)}")
+            if event_id in self._ids:
+                return 409, {'error': {'code': 409, 'message': 'The requested identifier already exists.'}}
+            self._ids.add(event_id)
+            self.inserted += 1
+            event['htmlLink'] = f"https://calendar.example/event?eid={event_id}"
+            self._log.append(event)
+        return 200, event
+
+    # Function to handle one events.list page: returns (status, payload)
+    def list(self, query, page_size=250):
+        with self._lock:
+            start = int(query.get('pageToken') or query.get('syncToken') or 0)
+            items = self._log[start:start + page_size]
+            payload = {'kind': 'calendar#events', 'items': items}
+            if start + page_size < len(self._log):
+                payload['nextPageToken'] = str(start + page_size)
+            else:
+                payload['nextSyncToken'] = str(len(self._log))
+        return 200, payload
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# Function to point gcalendar at a fake endpoint with a long-lived fake token
+def use_fake_calendar(gcalendar, fake, directory):
+    token_path = f"{directory}/token.json"
+    with open(token_path, 'w') as token:
+        json.dump({
+            'token': 'fake-token', 'refresh_token': 'fake-refresh', 'client_id': 'fake',
+            'client_secret': 'fake', 'scopes': gcalendar.SCOPES,
+            'expiry': (datetime.utcnow() + timedelta(days=1)).isoformat() + 'Z'
+        }, token)
+    gcalendar.TOKEN_PATH = token_path
+    gcalendar.CALENDAR_API_ENDPOINT = fake.url
+    gcalendar.CALENDAR_BATCH_ENDPOINT = fake.batch_url
+    gcalendar.reset_calendar_service()
+
+
+# First-event and steady-state latency of create_event, rebuilding the service
+# for every event (the old behaviour) versus the cached service
+def bench_calendar_service(args):
+    import gcalendar
+    from pytz import timezone
+
+    start = timezone('Asia/Kolkata').localize(datetime(2030, 1, 1, 10))
+    with FakeCalendarServer(latency=args.latency) as fake, tempfile.TemporaryDirectory() as directory:
+        use_fake_calendar(gcalendar, fake, directory)
+        started = time.perf_counter()
+        gcalendar.get_calendar_service()
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        gcalendar.get_calendar_service()
+        warm = time.perf_counter() - started
+        print(f"calendar: get_calendar_service cold {cold * 1000:.1f} ms, cached {warm * 1000:.3f} ms")
+        for label, rebuild in (("rebuild per event", True), ("cached service", False)):
+            gcalendar.reset_calendar_service()
+            timings = []
+            for i in range(args.events):
+                if rebuild:
+                    gcalendar.reset_calendar_service()
+                started = time.perf_counter()
+                ok, message = gcalendar.create_event(start, start + timedelta(hours=1), f"Event {i}")
+                timings.append(time.perf_counter() - started)
+                if not ok:
+                    raise SystemExit(message)
+            steady = sorted(timings[1:])
+            print(f"calendar: {label:<18} first {timings[0] * 1000:7.1f} ms  "
+                  f"steady p50 {steady[len(steady) // 2] * 1000:7.1f} ms")
+
+
+# Throughput of create_events as the batch size grows, against the fake batch
+# endpoint with some rate-limit errors that have to be retried
+def bench_calendar_batch(args):
+    import gcalendar
+    from pytz import timezone
+
+    start = timezone('Asia/Kolkata').localize(datetime(2030, 1, 1, 10))
+    events = [
+        {'start_time': start + timedelta(hours=i), 'end_time': start + timedelta(hours=i + 1), 'summary': f"Event {i}"}
+        for i in range(args.events)
+    ]
+    for batch_size in (1, 10, 50):
+        with FakeCalendarServer(args.latency, quota_error_rate=0.05, seed=args.seed) as fake, \
+                tempfile.TemporaryDirectory() as directory:
+            use_fake_calendar(gcalendar, fake, directory)
+            started = time.perf_counter()
+            # Backoff sleeps are shortened so the run measures request throughput
+            results = gcalendar.create_events(events, batch_size=batch_size, sleep=lambda seconds: time.sleep(seconds / 100))
+            elapsed = time.perf_counter() - started
+            failed = sum(1 for ok, _ in results if not ok)
+            report(f"calendar_batch: batch size {batch_size}", len(events), elapsed)
+            print(f"calendar_batch: {fake.requests} HTTP requests, {fake.inserted} inserted, {failed} failed")
+
+
+# Full and incremental sync of the local event index, then overlap and
+# next-free-slot queries answered from the index versus a linear scan
+def bench_event_index(args):
+    import gcalendar
+    from event_index import EventIndex
+
+    rng = random.Random(args.seed)
+    origin = datetime(2030, 1, 1).timestamp()
+    count = args.events * 200
+    with FakeCalendarServer(latency=0.0) as fake, tempfile.TemporaryDirectory() as directory:
+        use_fake_calendar(gcalendar, fake, directory)
+        for i in range(count):
+            start = origin + rng.randrange(365 * 24) * 3600
+            fake.insert({'id': f"evt{i}", 'summary': f"Event {i}",
+                         'start': {'dateTime': datetime.fromtimestamp(start).astimezone().isoformat()},
+                         'end': {'dateTime': datetime.fromtimestamp(start + 3600).astimezone().isoformat()}})
+        index = EventIndex(f"{directory}/calendar_cache.json")
+        service = gcalendar.get_calendar_service()
+        started = time.perf_counter()
+        index.sync(service)
+        report("event_index: full sync", len(index), time.perf_counter() - started)
+        started = time.perf_counter()
+        changed = index.sync(service)
+        report("event_index: incremental sync", changed, time.perf_counter() - started)
+        started = time.perf_counter()
+        EventIndex(index.path).load()
+        report("event_index: load from disk", len(index), time.perf_counter() - started)
+
+    windows = [(origin + rng.randrange(365 * 24 * 60) * 60, 1800) for _ in range(args.lookups * 50)]
+    events = list(index.events.values())
+
+    def linear():
+        return sum(1 for start, length in windows
+                   if any(s < start + length and e > start for s, e, _ in events))
+
+    def indexed():
+        return sum(1 for start, length in windows if index.overlapping(start, start + length))
+
+    for label, query in (("linear scan", linear), ("indexed", indexed)):
+        started = time.perf_counter()
+        busy = query()
+        report(f"event_index: overlap {label}", len(windows), time.perf_counter() - started)
+    print(f"event_index: {busy} of {len(windows)} windows conflict")
+    started = time.perf_counter()
+    for start, length in windows:
+        index.next_free_slot(length, start)
+    report("event_index: next_free_slot", len(windows), time.perf_counter() - started)
+
+
+# Latency the user waits for when scheduling an event: a direct insert against
+# the slow fake endpoint versus queuing it in the outbox. Then the endpoint is
+# taken down while events are queued, the outbox is reopened as if the
+# assistant restarted, and the endpoint comes back: every event must arrive
+# exactly once despite the retries and some rate-limit errors.
+def bench_calendar_outbox(args):
+    import event_index
+    import gcalendar
+    from event_index import EventIndex
+    from pytz import timezone
+
+    start = timezone('Asia/Kolkata').localize(datetime(2030, 1, 1, 10))
+
+    def p50(timings):
+        return sorted(timings)[len(timings) // 2] * 1000
+
+    with FakeCalendarServer(args.latency, quota_error_rate=0.1, seed=args.seed) as fake, \
+            tempfile.TemporaryDirectory() as directory:
+        use_fake_calendar(gcalendar, fake, directory)
+        event_index._index = EventIndex(f"{directory}/calendar_cache.json")
+        gcalendar.CALENDAR_OUTBOX_PATH = f"{directory}/calendar_outbox.sqlite3"
+        gcalendar._outbox = None
+
+        def open_outbox():
+            outbox = gcalendar.get_outbox()
+            # Shortened so the run doesn't sit out minutes of backoff
+            outbox.base_delay, outbox.max_delay = 0.05, 0.5
+            return outbox
+
+        outbox = open_outbox()
+        fake.quota_error_rate = 0.0
+        gcalendar.get_calendar_service()
+        timings = []
+        for i in range(args.events):
+            started = time.perf_counter()
+            gcalendar.create_event(start + timedelta(hours=i), start + timedelta(hours=i + 1), f"Direct {i}")
+            timings.append(time.perf_counter() - started)
+        print(f"calendar_outbox: direct insert    p50 {p50(timings):7.2f} ms")
+        fake.quota_error_rate = 0.1
+        expected = fake.inserted
+
+        for label, up in (("endpoint up", True), ("endpoint down", False)):
+            fake.up = up
+            timings = []
+            for i in range(args.events):
+                started = time.perf_counter()
+                ok, message = gcalendar.queue_event(start + timedelta(days=1, hours=i),
+                                                    start + timedelta(days=1, hours=i + 1), f"{label} {i}")
+                timings.append(time.perf_counter() - started)
+                if not ok:
+                    raise SystemExit(message)
+            expected += args.events
+            print(f"calendar_outbox: queued, {label:<13} p50 {p50(timings):7.2f} ms")
+            if up:
+                started = time.perf_counter()
+                outbox.wait(60)
+                print(f"calendar_outbox: drained {args.events} events in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        time.sleep(1.0)
+        print(f"calendar_outbox: down for 1 s, {len(outbox)} events waiting after {outbox.batches} batches")
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            message = gcalendar.create_event_from_command("schedule a meeting with Ravi tomorrow at 3 pm")
+            command = time.perf_counter() - started
+        print(f"calendar_outbox: 'schedule a meeting' while down {command * 1000:.2f} ms: {message}")
+        expected += 1
+
+        # Restart: the queued events are read back from disk
+        outbox.stop()
+        gcalendar._outbox = None
+        outbox = open_outbox()
+        fake.up = True
+        started = time.perf_counter()
+        if not outbox.wait(60):
+            raise SystemExit(f"calendar_outbox: {len(outbox)} events still waiting")
+        print(f"calendar_outbox: back up after restart, drained in {(time.perf_counter() - started) * 1000:.0f} ms")
+        print(f"calendar_outbox: {fake.requests} HTTP requests, {fake.inserted} inserted of {expected}, "
+              f"{len(outbox.failures())} refused")
+        if fake.inserted != expected:
+            raise SystemExit("calendar_outbox: events were lost or duplicated")
+        outbox.stop()
+        gcalendar._outbox = None
@@ -0,0 +1,250 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+import temporal
+from reminder_record import reminder_payload
+from scheduler import Scheduler
+from benchmarks.bench_parsing import reminder_corpus
+from benchmarks.common import APP_DIR, HOTPATH_NOW
+
+
+# Hot-path suite: fixed corpora and loads, a frozen clock, stub TTS and a
+# temporary reminder store, so runs are comparable between commits. Every
+# case reports throughput, per-call p50/p99 and peak memory, and is compared
+# against the stored baseline (benchmark_baseline.json; --save-baseline rewrites
+# it). A case that regressed makes the suite exit non-zero, so it can gate CI.
+BASELINE_PATH = os.path.join(APP_DIR, 'benchmark_baseline.json')
+# Allowed drift against the baseline before a case is flagged (shared machines are noisy)
+REGRESSION_TOLERANCE = 0.25
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls.fromtimestamp(HOTPATH_NOW.timestamp(), tz)
+
+
+class _FrozenDate(date):
+    @classmethod
+    def today(cls):
+        return cls(HOTPATH_NOW.year, HOTPATH_NOW.month, HOTPATH_NOW.day)
+
+
+# Function to stop the clock at HOTPATH_NOW for the parsing modules
+@contextlib.contextmanager
+def frozen_clock(*modules):
+    saved = [(module, vars(module).get('datetime'), vars(module).get('date')) for module in modules]
+    for module, datetime_class, date_class in saved:
+        if datetime_class is not None:
+            module.datetime = _FrozenDatetime
+        if date_class is not None:
+            module.date = _FrozenDate
+    try:
+        yield
+    finally:
+        for module, datetime_class, date_class in saved:
+            if datetime_class is not None:
+                module.datetime = datetime_class
+            if date_class is not None:
+                module.date = date_class
+
+
+# Function to generate calendar commands that always carry a date and a time
+def calendar_corpus(size, seed):
+    rng = random.Random(seed)
+    people = ['john', 'priya', 'the team', 'the design review group', 'alex and sam', 'my manager']
+    dates = ['today', 'tomorrow', 'day after tomorrow', 'next monday', 'on friday', 'on 15th august',
+             'on aug 21st', '3rd of march']
+    times = ['at 3 pm', 'at 10:30 am', 'at 9am', "at 7 o'clock", 'at noon', 'at 4 p.m.', 'at 11']
+    return [f"schedule a meeting with {rng.choice(people)} {rng.choice(dates)} {rng.choice(times)}"
+            for _ in range(size)]
+
+
+def time_corpus(size, seed):
+    rng = random.Random(seed)
+    expressions = ['at 5 pm', 'at 9:30am', "7 o'clock", 'in 20 minutes', 'in 2 hours', 'at noon',
+                   'at midnight', '11:45 pm', 'this evening', 'tonight', '']
+    return [rng.choice(expressions) for _ in range(size)]
+
+
+# Function to wrap a per-item call as a hot-path run: run(True) times every
+# call and returns (latencies, CPU seconds); run(False) just does the work.
+# Throughput is taken from CPU time so CPU-quota throttling on a shared machine
+# doesn't read as a regression; the per-call latencies are wall-clock.
+def per_call(func, items):
+    def run(timed):
+        if not timed:
+            for item in items:
+                func(item)
+            return None
+        clock = time.perf_counter
+        latencies = [0.0] * len(items)
+        started = time.process_time()
+        for i, item in enumerate(items):
+            call_started = clock()
+            func(item)
+            latencies[i] = clock() - call_started
+        return latencies, time.process_time() - started
+    return run
+
+
+# Function to drain `load` due one-off reminders through the reminder checker:
+# the real scheduler loop and fire_reminder, with a clock already past every
+# deadline so nothing sleeps. Latency is the time between consecutive fires.
+def reminder_loop(reminder, load, seed):
+    rng = random.Random(seed)
+    start = HOTPATH_NOW.timestamp()
+    texts = [f"reminder {i}" for i in range(100)]
+    rows = [(start + rng.randrange(7 * 24 * 3600), reminder_payload(rng.choice(texts))) for _ in range(load)]
+    horizon = max(when for when, _ in rows) + 1
+
+    def run(timed):
+        clock = time.perf_counter
+        latencies = [0.0] * load if timed else None
+        state = {'fired': 0, 'last': 0.0}
+
+        def on_fire(when, payload, key):
+            result = reminder.fire_reminder(when, payload, key)
+            fired = state['fired']
+            if timed:
+                now = clock()
+                latencies[fired] = now - state['last']
+                state['last'] = now
+            state['fired'] = fired + 1
+            if fired + 1 == load:
+                scheduler.stop()
+            return result
+
+        scheduler = Scheduler(on_fire, clock=lambda: horizon)
+        scheduler.schedule_many(rows, keys=range(load))
+        reminder.scheduler = scheduler
+        started = time.process_time()
+        state['last'] = clock()
+        reminder.check_reminders()
+        return (latencies, time.process_time() - started) if timed else None
+    return run
+
+
+# Function to compare a case with its baseline entry; returns the throughput,
+# p50 and p99 ratios and whether the case regressed. p99 is reported but not
+# judged: single preemptions dominate it.
+def compare(stats, previous, tolerance=REGRESSION_TOLERANCE):
+    speed = stats['throughput'] / previous['throughput']
+    median = stats['p50'] / previous['p50']
+    tail = stats['p99'] / previous['p99']
+    return speed, median, tail, speed < 1 - tolerance or median > 1 + tolerance
+
+
+# Function to run one case: (throughput per second, p50 s, p99 s, peak bytes).
+# The faster of two timed runs is kept, which takes out most scheduling noise.
+def hotpath_stats(run):
+    latencies, elapsed = min(run(True), run(True), key=lambda result: result[1])
+    latencies.sort()
+    count = len(latencies)
+    tracemalloc.start()
+    run(False)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'throughput': count / elapsed,
+        'p50': latencies[count // 2],
+        'p99': latencies[min(count - 1, int(count * 0.99))],
+        'peak': peak
+    }
+
+
+# Function to run the suite in a fresh interpreter. reminder, speech and
+# gcalendar read their settings when first imported, and earlier benchmarks in
+# this process may already have imported them with the real TTS and store.
+def bench_hotpaths(args):
+    command = [sys.executable, '-m', 'benchmarks.bench_hotpaths', '--seed', str(args.seed), '--loads', args.loads,
+               '--tolerance', str(args.tolerance)]
+    if args.baseline:
+        command += ['--baseline', os.path.abspath(args.baseline)]
+    if args.save_baseline:
+        command.append('--save-baseline')
+    with tempfile.TemporaryDirectory() as store_dir:
+        env = dict(os.environ, ASSISTANT_TTS='stub', ASSISTANT_TTS_CACHE='', REMINDER_STORE_DIR=store_dir)
+        status = subprocess.run(command, cwd=APP_DIR, env=env).returncode
+    if status:
+        raise SystemExit(status)
+
+
+def run_hotpaths(args):
+    import gcalendar
+    import reminder
+    import reminder_parser
+    reminder.store.open(0)
+
+    loads = [int(load) for load in args.loads.split(',')]
+    cases = [
+        ('parse_reminder_input', lambda n: per_call(reminder.parse_reminder_input, reminder_corpus(n, args.seed))),
+        ('parse_time_expression', lambda n: per_call(reminder.parse_time_expression, time_corpus(n, args.seed))),
+        ('gcalendar.parse_command', lambda n: per_call(gcalendar.parse_command, calendar_corpus(n, args.seed))),
+        ('extract_date+extract_time', lambda n: per_call(
+            lambda command: (gcalendar.extract_date(command), gcalendar.extract_time(command)),
+            calendar_corpus(n, args.seed))),
+        ('check_reminders', lambda n: reminder_loop(reminder, n, args.seed))
+    ]
+
+    baseline_path = args.baseline or BASELINE_PATH
+    baseline = {}
+    if not args.save_baseline and os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressed = []
+    scheduler = reminder.scheduler
+    try:
+        for name, make in cases:
+            for load in loads:
+                run = make(load)
+                # The commands print their progress, and fired reminders print a banner
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), \
+                        frozen_clock(reminder, reminder_parser, gcalendar, temporal):
+                    stats = hotpath_stats(run)
+                key = f"{name}@{load}"
+                results[key] = stats
+                line = (f"hotpaths: {key:<36} {stats['throughput']:>10.0f} /s  p50 {stats['p50'] * 1e6:8.1f} us  "
+                        f"p99 {stats['p99'] * 1e6:8.1f} us  peak {stats['peak'] / 1024 / 1024:8.2f} MiB")
+                previous = baseline.get(key)
+                if previous:
+                    speed, median, tail, regression = compare(stats, previous, args.tolerance)
+                    line += f"  vs baseline x{speed:.2f} throughput, x{median:.2f} p50, x{tail:.2f} p99"
+                    if regression:
+                        line += "  REGRESSION"
+                        regressed.append(key)
+                print(line)
+    finally:
+        reminder.scheduler = scheduler
+        reminder.store.close()
+
+    if args.save_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"hotpaths: baseline written to {baseline_path}")
+    elif regressed:
+        raise SystemExit(f"hotpaths: {len(regressed)} case(s) slower than the baseline by more than "
+                         f"{args.tolerance:.0%}: {', '.join(regressed)}")
+
+
+# Entry point for bench_hotpaths(), which sets up the environment
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Hot-path regression suite")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--loads', default='1000,10000,100000')
+    parser.add_argument('--baseline')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument('--save-baseline', action='store_true')
+    run_hotpaths(parser.parse_args())
@@ -0,0 +1,177 @@
+import calendar
+import random
+import re
+from datetime import datetime, timedelta
+
+import temporal
+from reminder_parser import parse_many, parse_reminder, resolve
+from benchmarks.common import measure, report
+from tests.test_temporal import TEMPORAL_CASES, TEMPORAL_TODAY
+
+# Reminder and date/time parsing: the compiled single-pass parser against the
+# original regex-per-call code, and the shared temporal grammar with its cache.
+
+
+# Baseline reminder parser (as it was before reminder_parser.py), kept to compare against
+def legacy_parse_reminder_input(input_text):
+    recurring_patterns = {
+        'day': r'(every\s*day|daily)',
+        'week': r'every\s*week',
+        'month': r'every\s*month',
+        'year': r'every\s*year'
+    }
+    reminder_text = input_text
+    recurring_type = None
+    time_str = None
+    date_str = None
+    for recurrence, pattern in recurring_patterns.items():
+        if re.search(pattern, input_text, re.IGNORECASE):
+            recurring_type = recurrence
+            reminder_text = re.sub(pattern, '', input_text, flags=re.IGNORECASE).strip()
+            break
+    date_patterns = [
+        r'(today|tomorrow|the next day)',
+        r'(on|for) (\d{1,2}(?:st|nd|rd|th)? (?:of )?(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?))',
+        r'(\d{1,2}(?:st|nd|rd|th)? (?:of )?(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?))'
+    ]
+    for pattern in date_patterns:
+        date_match = re.search(pattern, reminder_text, re.IGNORECASE)
+        if date_match:
+            date_str = date_match.group()
+            reminder_text = re.sub(re.escape(date_str), '', reminder_text, flags=re.IGNORECASE).strip()
+            break
+    time_patterns = [
+        r'at (\d{1,2}(?::\d{2})?\s*(?:am|pm))',
+        r'(\d{1,2}(?::\d{2})?\s*(?:am|pm))',
+        r'(\d{1,2}\s*o\'clock)',
+        r'at (\w+)',
+        r'in (\d+) (minute|minutes|hour|hours|day|days)',
+    ]
+    for pattern in time_patterns:
+        time_match = re.search(pattern, reminder_text, re.IGNORECASE)
+        if time_match:
+            time_str = time_match.group()
+            reminder_text = re.sub(re.escape(time_str), '', reminder_text, flags=re.IGNORECASE).strip()
+            break
+    return reminder_text, recurring_type, time_str, date_str
+
+
+def legacy_parse_date_expression(date_input):
+    if not date_input:
+        return datetime.now().date()
+    today = datetime.now().date()
+    if 'today' in date_input.lower():
+        return today
+    elif 'tomorrow' in date_input.lower():
+        return today + timedelta(days=1)
+    elif 'the next day' in date_input.lower():
+        return today + timedelta(days=2)
+    date_match = re.search(r'(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?(\w+)', date_input, re.IGNORECASE)
+    if date_match:
+        day = int(date_match.group(1))
+        month = date_match.group(2).lower()
+        month_num = list(calendar.month_abbr).index(month[:3].title())
+        parsed_date = datetime(today.year, month_num, day).date()
+        if parsed_date < today:
+            parsed_date = datetime(today.year + 1, month_num, day).date()
+        return parsed_date
+    return None
+
+
+def legacy_parse_time_expression(time_input):
+    now = datetime.now()
+    if not time_input:
+        return now.replace(hour=9, minute=0, second=0, microsecond=0)
+    relative_time_match = re.match(r'in (\d+) (minute|minutes|hour|hours|day|days)', time_input, re.IGNORECASE)
+    if relative_time_match:
+        value = int(relative_time_match.group(1))
+        unit = relative_time_match.group(2).lower()
+        if 'minute' in unit:
+            return now + timedelta(minutes=value)
+        elif 'hour' in unit:
+            return now + timedelta(hours=value)
+        elif 'day' in unit:
+            return now + timedelta(days=value)
+    time_patterns = [
+        (r'(?:at\s)?(\d{1,2})(?::(\d{2}))?\s*(am|pm)?', lambda h, m, p: (int(h) % 12 + (12 if p and p.lower() == 'pm' else 0), int(m) if m else 0)),
+        (r'(\d{1,2})\s*o\'clock', lambda h, _: (int(h) % 12, 0)),
+        (r'noon', lambda: (12, 0)),
+        (r'midnight', lambda: (0, 0)),
+    ]
+    for pattern, time_func in time_patterns:
+        match = re.match(pattern, time_input, re.IGNORECASE)
+        if match:
+            hour, minute = time_func(*match.groups())
+            return now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return None
+
+
+# Function to generate reminder utterances from templates
+def reminder_corpus(size, seed):
+    rng = random.Random(seed)
+    tasks = ['call mom', 'pay the electricity bill', 'water the plants', 'take my medicine',
+             'submit the quarterly report', 'book a dentist appointment', 'buy milk', 'stand up and stretch']
+    recurrences = ['', 'every day', 'daily', 'every week', 'every month', 'every year']
+    dates = ['', 'today', 'tomorrow', 'on 15th august', 'for 3rd of march', '21 dec']
+    times = ['', 'at 5 pm', 'at 9:30am', "7 o'clock", 'in 20 minutes', 'in 2 hours', 'at noon']
+    corpus = []
+    for _ in range(size):
+        parts = [rng.choice(tasks), rng.choice(recurrences), rng.choice(dates), rng.choice(times)]
+        rng.shuffle(parts)
+        corpus.append('remind me to ' + ' '.join(part for part in parts if part))
+    return corpus
+
+
+# Compare the single-pass parser with the baseline regex-per-call functions
+def bench_parser(args):
+    corpus = reminder_corpus(args.phrases, args.seed)
+
+    def legacy():
+        for text in corpus:
+            _, _, time_str, date_str = legacy_parse_reminder_input(text)
+            try:
+                legacy_parse_date_expression(date_str)
+            except ValueError:
+                pass
+            legacy_parse_time_expression(time_str)
+        return len(corpus)
+
+    def single_pass():
+        now = datetime.now()
+        for text in corpus:
+            resolve(parse_reminder(text), now)
+        return len(corpus)
+
+    def batch():
+        # Bulk import: parse in chunks so the result lists stay bounded
+        now = datetime.now()
+        for i in range(0, len(corpus), 1000):
+            for parsed in parse_many(corpus[i:i + 1000]):
+                resolve(parsed, now)
+        return len(corpus)
+
+    report("parser: baseline regex-per-call", *measure(legacy))
+    report("parser: compiled single pass", *measure(single_pass))
+    report("parser: parse_many in chunks of 1000", *measure(batch))
+
+
+# Throughput of the shared extractor over the conformance corpus, with the LRU
+# cache warm and bypassed (tests/test_temporal.py checks the results)
+def bench_temporal(args):
+    texts = [text for text, _, _ in TEMPORAL_CASES]
+    corpus = [texts[i % len(texts)] for i in range(args.phrases)]
+
+    def uncached():
+        for text in corpus:
+            temporal._extract.__wrapped__(temporal.normalize(text), TEMPORAL_TODAY)
+        return len(corpus)
+
+    def cached():
+        for text in corpus:
+            temporal.extract_date(text, TEMPORAL_TODAY)
+            temporal.extract_time(text, TEMPORAL_TODAY)
+        return len(corpus)
+
+    report("temporal: regex every call", *measure(uncached))
+    report("temporal: LRU cache (date + time)", *measure(cached))
+    print(f"temporal: {temporal.cache_info()}")
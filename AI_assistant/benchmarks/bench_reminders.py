@@ -0,0 +1,279 @@
+import collections
+import heapq
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from recurrence import RECURRENCE_TYPES, Recurrence
+from reminder_record import reminder_payload
+from reminder_store import ReminderStore
+from scheduler import Scheduler
+from benchmarks.common import APP_DIR, HOTPATH_NOW, measure, report
+
+# Reminder scheduling and storage: recurrence expansion, the journal-backed
+# store, the HTTP reminder service, memory per pending reminder and the index.
+
+
+# Expand recurring rules over a year in fire-time order, the way the scheduler does:
+# one pending occurrence per rule in a heap, advanced lazily as it fires
+def bench_recurrence(args):
+    origin = datetime(2024, 1, 1)
+    horizon = (origin + timedelta(days=365)).timestamp()
+
+    def expand():
+        rng = random.Random(args.seed)
+        rules = []
+        heap = []
+        for i in range(args.rules):
+            start = origin + timedelta(days=rng.randrange(365), minutes=rng.randrange(24 * 60))
+            rules.append(Recurrence(start, rng.choice(RECURRENCE_TYPES)))
+            heap.append((start.timestamp(), i))
+        heapq.heapify(heap)
+
+        fired = 0
+        while heap and heap[0][0] < horizon:
+            i = heap[0][1]
+            fired += 1
+            heapq.heapreplace(heap, (rules[i].advance().timestamp(), i))
+        return fired
+
+    report(f"recurrence: {args.rules} rules over 1 year", *measure(expand))
+
+
+# Startup time of the durable store with a large snapshot plus a journal tail,
+# and how fast the input path can record new reminders
+def bench_store(args):
+    rng = random.Random(args.seed)
+    base = time.time()
+    window = 6 * 60 * 60
+    with tempfile.TemporaryDirectory() as directory:
+        store = ReminderStore(directory)
+        store.open(base)
+        store._apply(
+            ['set', i, f"reminder {i % 1000}", base + rng.randrange(86400 * 365), None, None, 0]
+            for i in range(1, args.reminders + 1)
+        )
+        store.close()
+
+        # Compaction is held off so the whole batch is left as journal tail
+        store = ReminderStore(directory, compact_every=100_000)
+        store.open(base)
+        started = time.perf_counter()
+        for i in range(args.reminders + 1, args.reminders + 50_001):
+            store.record_set(i, f"reminder {i % 1000}", base + i, 'day', base, 0)
+        report("store: record_set (enqueue only)", 50_000, time.perf_counter() - started)
+        started = time.perf_counter()
+        store.flush()
+        report("store: group-committed to the journal", 50_000, time.perf_counter() - started)
+        # Simulate a crash: the journal tail is never compacted by this instance
+
+        started = time.perf_counter()
+        store = ReminderStore(directory)
+        rows = store.open(base + window)
+        loaded = time.perf_counter() - started
+        scheduler = Scheduler(lambda when, payload, key: None)
+        scheduler.schedule_many((row[2], row) for row in rows)
+        elapsed = time.perf_counter() - started
+        stored = store._db.execute('SELECT COUNT(*) FROM reminders').fetchone()[0]
+        store.close()
+    print(f"store: {stored} reminders stored, {len(rows)} due in the first window")
+    report("store: open (replay 50k tail + first window)", len(rows), loaded)
+    report("store: open + schedule first window", len(rows), elapsed)
+
+
+# Function to drive the reminder service with `connections` keep-alive clients
+# sending create requests for `users` users; returns per-request latencies
+async def reminder_service_load(host, port, requests, connections, users, seed):
+    import asyncio
+
+    rng = random.Random(seed)
+    base = time.time() + 3600
+    bodies = [
+        json.dumps({'text': f"reminder {i}", 'fire_at': base + rng.randrange(86400 * 30)}).encode()
+        for i in range(requests)
+    ]
+    paths = [f"/users/user{rng.randrange(users)}/reminders" for _ in range(requests)]
+    latencies = []
+    statuses = collections.Counter()
+    next_request = iter(range(requests))
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        for i in next_request:
+            started = time.perf_counter()
+            writer.write(f"POST {paths[i]} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(bodies[i])}\r\n\r\n".encode() + bodies[i])
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line == b'\r\n':
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            statuses[int(status_line.split()[1])] += 1
+        writer.close()
+
+    await asyncio.gather(*(client() for _ in range(connections)))
+    return latencies, statuses
+
+
+# Load test of reminder_service.py: the service runs in its own process and
+# keep-alive clients create reminders for many users as fast as it answers
+def bench_service(args):
+    import asyncio
+    import resource
+    import socket
+    import subprocess
+    import sys
+
+    here = APP_DIR
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    with tempfile.TemporaryDirectory() as directory:
+        process = subprocess.Popen([sys.executable, 'reminder_service.py', '--port', str(port), '--store', directory],
+                                   cwd=here, stdout=subprocess.PIPE, text=True)
+        try:
+            print(f"service: {process.stdout.readline().strip()}")
+            for _ in range(100):
+                try:
+                    socket.create_connection(('127.0.0.1', port)).close()
+                    break
+                except OSError:
+                    time.sleep(0.05)
+            started = time.perf_counter()
+            latencies, statuses = asyncio.run(
+                reminder_service_load('127.0.0.1', port, args.requests, args.connections, 1000, args.seed))
+            elapsed = time.perf_counter() - started
+        finally:
+            process.terminate()
+            process.wait()
+    # Client and service share the machine, so also report what the service
+    # could sustain on its own: requests per CPU-second it used
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    service_cpu = usage.ru_utime + usage.ru_stime
+    latencies.sort()
+    report(f"service: create over {args.connections} connections", len(latencies), elapsed)
+    print(f"service: p50 {latencies[len(latencies) // 2] * 1000:.2f} ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms  statuses {dict(statuses)}")
+    print(f"service: {service_cpu:.2f} CPU-s used, {len(latencies) / service_cpu:.0f} creates per CPU-second")
+
+
+# Bytes per pending reminder for the representations the reminder code has
+# used: the original (text, datetime) lists, scheduler entries with tuple
+# payloads and a Recurrence per recurring rule, and the current compact
+# entries: (epoch, id, text) for one-offs and a ReminderRecord only for
+# recurring rules.
+# Every text is built fresh, as it would be when parsed from a command.
+def bench_reminder_memory(args):
+    rng = random.Random(args.seed)
+    tasks = [task.split() for task in ('call mom', 'pay the electricity bill', 'water the plants',
+                                       'take my medicine', 'submit the quarterly report', 'buy milk')]
+    start = HOTPATH_NOW.timestamp()
+    load = [(rng.choice(tasks), start + rng.randrange(365 * 86400),
+             rng.choice(RECURRENCE_TYPES) if rng.random() < 0.2 else None) for _ in range(args.reminders)]
+
+    def original():
+        reminders, recurring = [], []
+        for words, when, recurring_type in load:
+            moment = datetime.fromtimestamp(when)
+            if recurring_type:
+                recurring.append((' '.join(words), moment.time(), recurring_type))
+            else:
+                reminders.append((' '.join(words), moment))
+        return reminders, recurring
+
+    def tuple_payloads():
+        scheduler = Scheduler(None)
+        items = []
+        for i, (words, when, recurring_type) in enumerate(load):
+            recurrence = Recurrence(datetime.fromtimestamp(when), recurring_type) if recurring_type else None
+            items.append((when, (i, ' '.join(words), recurrence)))
+        scheduler.schedule_many(items)
+        return scheduler
+
+    def compact():
+        scheduler = Scheduler(None)
+        scheduler.schedule_many(
+            ((when, reminder_payload(' '.join(words), recurring_type, when if recurring_type else None))
+             for words, when, recurring_type in load), keys=range(len(load)))
+        return scheduler
+
+    for label, build in (("original (text, datetime) lists", original),
+                         ("scheduler + tuple/Recurrence", tuple_payloads),
+                         ("compact id-keyed entries", compact)):
+        tracemalloc.start()
+        started = time.perf_counter()
+        kept = build()
+        elapsed = time.perf_counter() - started
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report(f"reminder memory: {label}", len(load), elapsed, size)
+        print(f"    {size / len(load):.0f} bytes per reminder")
+        del kept
+
+
+# Reminder queries ("tomorrow", "next 10", "about rent") on the query index
+# against a linear scan of every pending reminder, plus the cost of keeping
+# the index up to date as reminders are set, moved and cancelled
+def bench_reminder_index(args):
+    from reminder_index import ReminderIndex, index_terms
+
+    rng = random.Random(args.seed)
+    tasks = ['call', 'pay the bill for', 'book the dentist for', 'buy a gift for', 'email', 'water the plants with']
+    people = [f"person{i}" for i in range(5000)]
+    start = HOTPATH_NOW.timestamp()
+    for load in (args.reminders // 10, args.reminders):
+        rows = [(i, f"{rng.choice(tasks)} {rng.choice(people)}", start + rng.randrange(365 * 86400), None)
+                for i in range(load)]
+        started = time.perf_counter()
+        index = ReminderIndex().load(rows)
+        report(f"reminder_index: build, {load} reminders", load, time.perf_counter() - started)
+
+        days = [start + rng.randrange(365) * 86400 for _ in range(args.lookups)]
+        queries = [f"dentist {rng.choice(people)}" for _ in range(args.lookups)]
+        # The scans are slow enough at 1M that a tenth of the queries tells the story
+        scanned = args.lookups // 10
+
+        def linear_day(day):
+            return sorted((row for row in rows if day <= row[2] < day + 86400), key=lambda row: row[2])
+
+        def linear_next(after):
+            return heapq.nsmallest(10, (row for row in rows if row[2] >= after), key=lambda row: row[2])
+
+        def linear_search(query):
+            terms = index_terms(query)
+            return sorted((row for row in rows if terms <= set(row[1].split())), key=lambda row: row[2])
+
+        cases = [
+            ("one day", days, linear_day, lambda day: index.between(day, day + 86400)),
+            ("next 10", days, linear_next, lambda after: index.upcoming(after, 10)),
+            ("search", queries, linear_search, index.search)
+        ]
+        for label, inputs, linear, indexed in cases:
+            for method, query, items in (("linear scan", linear, inputs[:scanned]), ("indexed", indexed, inputs)):
+                started = time.perf_counter()
+                for item in items:
+                    query(item)
+                report(f"reminder_index: {label}, {method}", len(items), time.perf_counter() - started)
+            probe = inputs[0]
+            if [row[0] for row in linear(probe)] != [entry[0] for entry in indexed(probe)]:
+                raise SystemExit(f"reminder_index: {label} results differ from the linear scan")
+
+        moves = [(rng.randrange(load), start + rng.randrange(365 * 86400)) for _ in range(args.lookups * 50)]
+        started = time.perf_counter()
+        for reminder_id, fire_at in moves:
+            _, text, _ = index.reminders[reminder_id]
+            index.put(reminder_id, text, fire_at)
+        report("reminder_index: move (fire/snooze)", len(moves), time.perf_counter() - started)
+        started = time.perf_counter()
+        for reminder_id, _ in moves:
+            index.remove(reminder_id)
+        report("reminder_index: cancel", len(moves), time.perf_counter() - started)
+        del rows, index
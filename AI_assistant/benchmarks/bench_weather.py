@@ -0,0 +1,116 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.common import StubHTTPServer, report
+
+# Weather lookups against a local stub of the weatherapi.com API.
+
+
+# Local stand-in for weatherapi.com's current.json with injected latency
+class StubWeatherServer:
+    def __init__(self, latency=0.05):
+        self.requests = 0
+        self.connections = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; don't let Nagle hold the body
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                city = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+                if city.lower() == 'nowhere':
+                    return self._reply(400, {'error': {'code': 1006, 'message': 'No matching location found.'}})
+                self._reply(200, {
+                    'location': {'name': city},
+                    'current': {'temp_c': 20 + len(city) % 10, 'condition': {'text': 'Sunny'}}
+                })
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.server = StubHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/current.json"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# Repeated and concurrent lookups for a handful of cities: plain requests.get per
+# lookup versus the pooled, cached, coalescing WeatherClient
+def bench_weather(args):
+    import requests
+    from weather_client import WeatherClient
+
+    rng = random.Random(args.seed)
+    cities = ['Pune', 'Mumbai', 'Delhi', 'Bengaluru', 'Chennai', 'Kolkata']
+    lookups = [rng.choice(cities) for _ in range(args.lookups)]
+
+    with StubWeatherServer(latency=args.latency) as stub:
+        def naive(city):
+            response = requests.get(stub.url, params={'key': 'stub', 'q': city, 'aqi': 'no'})
+            return response.json()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(naive, lookups))
+        elapsed = time.perf_counter() - started
+        report("weather: requests.get per lookup", len(lookups), elapsed)
+        print(f"weather: {stub.requests} requests, {stub.connections} connections")
+
+        stub.requests = stub.connections = 0
+        client = WeatherClient('stub', base_url=stub.url)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(client.current, lookups))
+        elapsed = time.perf_counter() - started
+        report("weather: WeatherClient", len(lookups), elapsed)
+        print(f"weather: {stub.requests} requests, {stub.connections} connections, "
+              f"{client.cache_hits} cache hits, {client.coalesced} coalesced")
+
+
+# Current conditions for a dashboard's worth of cities: a serial get_weather loop
+# versus get_weather_many, with one unknown city to show partial failure
+def bench_weather_many(args):
+    from weather_client import WeatherClient
+
+    cities = [f"City {i}" for i in range(args.cities - 1)] + ['Nowhere']
+    with StubWeatherServer(latency=args.latency) as stub:
+        client = WeatherClient('stub', base_url=stub.url, pool_size=args.cities)
+        started = time.perf_counter()
+        for city in cities:
+            client.get_weather(city)
+        report("weather_many: serial get_weather", len(cities), time.perf_counter() - started)
+
+        client.clear_cache()
+        started = time.perf_counter()
+        results = client.get_weather_many(cities, max_workers=args.cities, deadline=5)
+        report("weather_many: get_weather_many", len(cities), time.perf_counter() - started)
+        failed = [city for city, (ok, _) in results.items() if not ok]
+        print(f"weather_many: one round-trip is {args.latency:.3f} s; failed: {failed}")
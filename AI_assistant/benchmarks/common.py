@@ -0,0 +1,42 @@
+import os
+import time
+import tracemalloc
+from datetime import datetime
+from http.server import ThreadingHTTPServer
+
+# Helpers shared by the benchmark modules: result lines, wall-clock plus
+# peak-memory measurement, a fixed clock and a quiet local HTTP server.
+
+# The assistant's own modules, which the subprocess benchmarks run from
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Function to print one benchmark result line
+def report(name, count, elapsed, peak_bytes=None):
+    line = f"{name:<40} {count:>10} items {elapsed:8.3f} s {count / elapsed if elapsed else 0:>12.0f} /s"
+    if peak_bytes is not None:
+        line += f" peak {peak_bytes / 1024 / 1024:8.2f} MiB"
+    print(line)
+
+
+# Function to run a workload once for wall-clock time and once under tracemalloc
+# (tracing slows allocation-heavy code several times over, so the two are kept apart)
+def measure(workload):
+    started = time.perf_counter()
+    count = workload()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    workload()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 makes bursts of connections wait on SYN retries
+    request_queue_size = 128
+
+
+# A fixed 'now', so runs that depend on the date compare between commits
+HOTPATH_NOW = datetime(2024, 6, 12, 9, 0)
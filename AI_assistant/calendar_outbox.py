@@ -0,0 +1,193 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Write-behind outbox for calendar inserts. An event is committed to a local
+# SQLite table and the user is answered straight away; a flusher thread sends
+# the queued events to the Calendar API in batches whenever it is reachable.
+# Every event gets its id when it is queued, so a batch that is resent after a
+# timeout or a crash can't create it twice (the API answers 409 for the repeat).
+# While the API is down or rate limited the flusher backs off exponentially and
+# the events stay on disk across restarts.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    queued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbox_queued_at ON outbox (failed, queued_at);
+"""
+
+# Outcomes reported by send() for each event
+SENT = 'sent'
+RETRY = 'retry'
+FAILED = 'failed'
+
+
+def _doubling(attempt, base, cap):
+    return min(cap, base * 2 ** attempt)
+
+
+class CalendarOutbox:
+    # send(bodies) inserts a list of event bodies and returns one (outcome,
+    # message) per body. on_sent() runs after a batch went through and
+    # on_failed(body, message) for each event the API refused for good.
+    # backoff(attempt, base, cap) gives the pause after a failed attempt.
+    def __init__(self, path, send, batch_size=50, base_delay=1.0, max_delay=300.0, on_sent=None, on_failed=None,
+                 backoff=_doubling):
+        self.path = path
+        self.send = send
+        self.batch_size = batch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+        self._backoff = backoff
+        self._cond = threading.Condition()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._thread = None
+        self._stopped = False
+        # Consecutive batches that had to be retried, and when the next may go
+        self._failures = 0
+        self._paused_until = 0.0
+        self._pending = 0
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=FULL')
+        self._db.executescript(SCHEMA)
+        self._pending = self._db.execute('SELECT COUNT(*) FROM outbox WHERE failed = 0').fetchone()[0]
+        self._thread = threading.Thread(target=self._run, name='calendar-outbox', daemon=True)
+        self._thread.start()
+        return self
+
+    def __len__(self):
+        return self._pending
+
+    # Function to queue an event body; returns its id once it is safely on disk
+    def enqueue(self, body):
+        body = dict(body)
+        body.setdefault('id', uuid.uuid4().hex)
+        with self._db_lock, self._db:
+            added = self._db.execute('INSERT OR IGNORE INTO outbox (id, body, queued_at) VALUES (?, ?, ?)',
+                                     (body['id'], json.dumps(body), time.time())).rowcount
+        with self._cond:
+            self._pending += added
+            self._cond.notify_all()
+        return body['id']
+
+    # Function to list the bodies of the events still waiting to be sent
+    def pending(self):
+        with self._db_lock:
+            rows = self._db.execute('SELECT body FROM outbox WHERE failed = 0 ORDER BY queued_at')
+            return [json.loads(body) for body, in rows]
+
+    # Function to list the events the API refused as (id, body, error)
+    def failures(self):
+        with self._db_lock:
+            rows = self._db.execute('SELECT id, body, last_error FROM outbox WHERE failed = 1 ORDER BY queued_at')
+            return [(event_id, json.loads(body), error) for event_id, body, error in rows]
+
+    # Function to send what is queued now instead of waiting out the backoff
+    def flush(self):
+        with self._cond:
+            self._paused_until = 0.0
+            self._cond.notify_all()
+
+    # Function to wait until everything queued has been sent or refused;
+    # returns False if that did not happen within `timeout` seconds
+    def wait(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        with self._db_lock:
+            self._db.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    delay = self._paused_until - time.monotonic()
+                    if self._pending and delay <= 0:
+                        break
+                    self._cond.wait(delay if self._pending else None)
+                if self._stopped:
+                    return
+            try:
+                self._send_batch()
+            except Exception as e:
+                print(f"Calendar outbox flush failed: {e}")
+                self._back_off()
+
+    def _send_batch(self):
+        with self._db_lock:
+            rows = self._db.execute('SELECT id, body FROM outbox WHERE failed = 0 ORDER BY queued_at LIMIT ?',
+                                    (self.batch_size,)).fetchall()
+        if not rows:
+            with self._cond:
+                self._pending = 0
+                self._cond.notify_all()
+            return
+        bodies = [json.loads(body) for _, body in rows]
+        try:
+            outcomes = self.send(bodies)
+        except Exception as e:
+            outcomes = [(RETRY, str(e))] * len(bodies)
+        self.batches += 1
+
+        sent, retry, failed = [], [], []
+        for (event_id, _), body, (outcome, message) in zip(rows, bodies, outcomes):
+            if outcome == SENT:
+                sent.append((event_id,))
+            elif outcome == RETRY:
+                retry.append((message, event_id))
+            else:
+                failed.append((message, event_id))
+                if self.on_failed:
+                    self.on_failed(body, message)
+        with self._db_lock, self._db:
+            self._db.executemany('DELETE FROM outbox WHERE id = ?', sent)
+            self._db.executemany('UPDATE outbox SET attempts = attempts + 1, last_error = ? WHERE id = ?', retry)
+            self._db.executemany('UPDATE outbox SET attempts = attempts + 1, last_error = ?, failed = 1 WHERE id = ?',
+                                 failed)
+        self.sent += len(sent)
+        self.failed += len(failed)
+        with self._cond:
+            self._pending -= len(sent) + len(failed)
+            self._cond.notify_all()
+
+        if retry:
+            if not self._failures:
+                print(f"Calendar unreachable, {self._pending} event(s) waiting: {retry[0][0]}")
+            self._back_off()
+        else:
+            self._failures = 0
+            if sent and self.on_sent:
+                self.on_sent()
+
+    def _back_off(self):
+        delay = self._backoff(self._failures, self.base_delay, self.max_delay)
+        self._failures += 1
+        with self._cond:
+            self._paused_until = time.monotonic() + delay
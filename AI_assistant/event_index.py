@@ -0,0 +1,210 @@
+import json
+import os
+import threading
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+DEFAULT_PATH = 'calendar_cache.json'
+
+
+def _to_timestamp(value):
+    return value.timestamp() if isinstance(value, datetime) else float(value)
+
+
+# Function to read the start or end of a Calendar event as an epoch timestamp
+def _event_time(moment):
+    if 'dateTime' in moment:
+        return datetime.fromisoformat(moment['dateTime']).timestamp()
+    # All-day events only carry a date; treat them as local midnight
+    return datetime.fromisoformat(moment['date']).timestamp()
+
+
+# Local copy of the primary calendar kept up to date with Calendar sync tokens
+# and saved to disk. Events are indexed by start time in sorted arrays; with the
+# longest event duration as a bound, overlap queries only look at the handful of
+# events that can possibly intersect the window, so they need no network calls.
+class EventIndex:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.sync_token = None
+        # id -> (start, end, summary)
+        self.events = {}
+        self._starts = []
+        self._ids = []
+        self._max_duration = 0.0
+        self._lock = threading.RLock()
+        # Held for a whole sync, so queries only wait for the changes to be applied
+        self._sync_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.events)
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as cache:
+                    data = json.load(cache)
+                events = {event_id: tuple(event) for event_id, event in data.get('events', {}).items()}
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                # A damaged cache is only a copy; the next sync starts over
+                print(f"Ignoring the calendar cache {self.path}: {e}")
+                return self
+            with self._lock:
+                self.sync_token = data.get('sync_token')
+                self.events = events
+                self._rebuild()
+        return self
+
+    def save(self):
+        with self._lock:
+            data = {'sync_token': self.sync_token, 'events': self.events}
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as cache:
+                json.dump(data, cache)
+            os.replace(temp_path, self.path)
+
+    def _rebuild(self):
+        order = sorted(self.events, key=lambda event_id: self.events[event_id][0])
+        self._starts = [self.events[event_id][0] for event_id in order]
+        self._ids = order
+        self._max_duration = max((end - start for start, end, _ in self.events.values()), default=0.0)
+
+    def put(self, event_id, start, end, summary=''):
+        with self._lock:
+            self.remove(event_id)
+            start, end = _to_timestamp(start), _to_timestamp(end)
+            self.events[event_id] = (start, end, summary)
+            position = bisect_left(self._starts, start)
+            self._starts.insert(position, start)
+            self._ids.insert(position, event_id)
+            self._max_duration = max(self._max_duration, end - start)
+
+    def remove(self, event_id):
+        with self._lock:
+            event = self.events.pop(event_id, None)
+            if event is None:
+                return False
+            position = bisect_left(self._starts, event[0])
+            while self._ids[position] != event_id:
+                position += 1
+            del self._starts[position]
+            del self._ids[position]
+            return True
+
+    # Function to apply one Calendar API event resource
+    def apply(self, event):
+        if event.get('status') == 'cancelled':
+            self.remove(event['id'])
+        elif 'start' in event and 'end' in event:
+            self.put(event['id'], _event_time(event['start']), _event_time(event['end']), event.get('summary', ''))
+
+    # Function to pull changes from the Calendar API. The first call does a full
+    # sync; later calls send the stored sync token and only receive what changed.
+    # The pages are fetched without holding the index lock, so conflict checks
+    # never wait on the network. `pending()` lists event bodies that exist only
+    # locally (queued, not sent yet); they are put back after a full resync.
+    # Returns the number of changed events.
+    def sync(self, service, pending=None):
+        from googleapiclient.errors import HttpError
+
+        with self._sync_lock:
+            full = False
+            try:
+                items, sync_token = self._fetch(service, self.sync_token)
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                # 410 Gone: the sync token expired, start over with a full sync
+                items, sync_token = self._fetch(service, None)
+                full = True
+            queued = pending() if full and pending else []
+            changed = len(items) or int(full)
+            with self._lock:
+                if full:
+                    self.events = {}
+                    self._rebuild()
+                for event in items:
+                    self.apply(event)
+                for event in queued:
+                    self.apply(event)
+                self.sync_token = sync_token or self.sync_token
+                # Nothing new: the cache on disk and its sync token are still good
+                if changed:
+                    self.save()
+            return changed
+
+    # Function to page through a list call; returns (items, next sync token)
+    def _fetch(self, service, sync_token):
+        items = []
+        page_token = None
+        events_resource = service.events()
+        while True:
+            params = {'calendarId': 'primary', 'singleEvents': True, 'pageToken': page_token}
+            if sync_token:
+                params['syncToken'] = sync_token
+            response = events_resource.list(**params).execute()
+            items.extend(response.get('items', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return items, response.get('nextSyncToken')
+
+    # Function to list (id, start, end, summary) of events overlapping [start, end)
+    def overlapping(self, start, end):
+        start, end = _to_timestamp(start), _to_timestamp(end)
+        with self._lock:
+            # Nothing that starts before start - longest duration can reach the window
+            first = bisect_left(self._starts, start - self._max_duration)
+            last = bisect_left(self._starts, end)
+            found = []
+            for event_id in self._ids[first:last]:
+                event_start, event_end, summary = self.events[event_id]
+                if event_end > start:
+                    found.append((event_id, event_start, event_end, summary))
+            return found
+
+    def is_free(self, start, end):
+        return not self.overlapping(start, end)
+
+    # Function to get merged busy intervals within [start, end) as (start, end) timestamps
+    def busy(self, start, end):
+        intervals = sorted((max(s, _to_timestamp(start)), min(e, _to_timestamp(end)))
+                           for _, s, e, _ in self.overlapping(start, end))
+        merged = []
+        for interval_start, interval_end in intervals:
+            if merged and interval_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], interval_end)
+            else:
+                merged.append([interval_start, interval_end])
+        return [tuple(interval) for interval in merged]
+
+    # Function to find the first free slot of `duration` starting no earlier than `after`.
+    # Walks events in start order from `after` and stops at the first big enough gap.
+    def next_free_slot(self, duration, after, horizon=timedelta(days=14)):
+        if isinstance(duration, timedelta):
+            duration = duration.total_seconds()
+        candidate = _to_timestamp(after)
+        limit = candidate + horizon.total_seconds()
+        with self._lock:
+            position = bisect_left(self._starts, candidate - self._max_duration)
+            while position < len(self._starts) and self._starts[position] - candidate < duration \
+                    and candidate + duration <= limit:
+                candidate = max(candidate, self.events[self._ids[position]][1])
+                position += 1
+        if candidate + duration > limit:
+            return None
+        if isinstance(after, datetime):
+            return datetime.fromtimestamp(candidate, after.tzinfo)
+        return candidate
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+# Function to get the process-wide event index, loaded from disk on first use
+def get_event_index(path=DEFAULT_PATH):
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = EventIndex(path).load()
+    return _index
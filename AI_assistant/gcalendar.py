@@ -1,13 +1,17 @@
 import os
-import speech_recognition as sr
+import random
+import threading
+import time
+import uuid
 from datetime import datetime, timedelta
-from pytz import timezone
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
 import re
 from dotenv import load_dotenv
+import intents
+import metrics
+import speech
+import temporal
+from calendar_outbox import CalendarOutbox, FAILED, RETRY, SENT
+from event_index import get_event_index
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,127 +20,330 @@ load_dotenv()
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 CREDENTIALS_JSON_PATH = os.getenv("CREDENTIALS_JSON_PATH")
 
-def get_calendar_service():
+SUMMARY_REGEX = re.compile(r"meeting with (.+?)(?:\s+on|\s+at|$)", re.IGNORECASE)
+
+TOKEN_PATH = 'token.json'
+
+# Optional override of the API root, e.g. a local fake Calendar endpoint
+CALENDAR_API_ENDPOINT = os.getenv("CALENDAR_API_ENDPOINT")
+
+# Refresh the access token this long before it actually expires
+REFRESH_MARGIN = timedelta(minutes=5)
+
+# Credentials are shared process-wide. Service objects are cached per thread
+# because the underlying httplib2 connection is not thread-safe.
+_credentials = None
+_credentials_lock = threading.Lock()
+_local = threading.local()
+
+# The Google client libraries take a few hundred milliseconds to import, so they
+# are imported on first use rather than when the assistant starts
+def load_credentials():
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
     creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+    if os.path.exists(TOKEN_PATH):
+        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             creds.refresh(Request())
         else:
             flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_JSON_PATH, SCOPES)
             creds = flow.run_local_server(port=0)
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-    
-    service = build('calendar', 'v3', credentials=creds)
+        save_credentials(creds)
+    return creds
+
+def save_credentials(creds):
+    with open(TOKEN_PATH, 'w') as token:
+        token.write(creds.to_json())
+
+def get_credentials():
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            _credentials = load_credentials()
+        elif _credentials.refresh_token and _credentials.expiry and \
+                _credentials.expiry - REFRESH_MARGIN <= datetime.utcnow():
+            from google.auth.transport.requests import Request
+            # google-auth keeps expiry as naive UTC
+            _credentials.refresh(Request())
+            save_credentials(_credentials)
+        return _credentials
+
+@metrics.timed('get_calendar_service')
+def get_calendar_service():
+    creds = get_credentials()
+    service = getattr(_local, 'service', None)
+    if service is None or _local.credentials is not creds:
+        from googleapiclient.discovery import build
+        # The bundled discovery document avoids fetching it over the network
+        client_options = {'api_endpoint': CALENDAR_API_ENDPOINT} if CALENDAR_API_ENDPOINT else None
+        service = build('calendar', 'v3', credentials=creds, static_discovery=True,
+                        cache_discovery=False, client_options=client_options)
+        _local.service = service
+        _local.credentials = creds
     return service
 
+# Function to import the Google client libraries ahead of the first calendar
+# command, e.g. from a background thread once the assistant is listening
+def warm_up():
+    import googleapiclient.discovery
+    import googleapiclient.http
+    import google_auth_oauthlib.flow
+    import google.auth.transport.requests
+    # Resume sending whatever the last run left in the outbox
+    get_outbox()
+
+def reset_calendar_service():
+    global _credentials
+    with _credentials_lock:
+        _credentials = None
+    _local.__dict__.clear()
+
+def build_event_body(start_time, end_time, summary, description=None, location=None):
+    if start_time.tzinfo is None or end_time.tzinfo is None:
+        raise ValueError("start_time and end_time must include timezone information")
+
+    event_body = {
+        'summary': summary,
+        'start': {
+            'dateTime': start_time.isoformat(),
+            'timeZone': str(start_time.tzinfo),
+        },
+        'end': {
+            'dateTime': end_time.isoformat(),
+            'timeZone': str(end_time.tzinfo),
+        },
+    }
+
+    if description:
+        event_body['description'] = description
+    if location:
+        event_body['location'] = location
+    return event_body
+
+def describe_error(e):
+    error_message = str(e)
+    if "credentials" in error_message.lower():
+        return "Authentication error: Please check your Google Calendar credentials"
+    elif "quota" in error_message.lower() or "rate limit" in error_message.lower():
+        return "API quota exceeded: Please try again later"
+    else:
+        return f"Failed to create event: {error_message}"
+
+@metrics.timed('create_event')
 def create_event(start_time, end_time, summary, description=None, location=None):
     try:
         service = get_calendar_service()
-        
-        if start_time.tzinfo is None or end_time.tzinfo is None:
-            raise ValueError("start_time and end_time must include timezone information")
-
-        event_body = {
-            'summary': summary,
-            'start': {
-                'dateTime': start_time.isoformat(),
-                'timeZone': str(start_time.tzinfo),
-            },
-            'end': {
-                'dateTime': end_time.isoformat(),
-                'timeZone': str(end_time.tzinfo),
-            },
-        }
-
-        if description:
-            event_body['description'] = description
-        if location:
-            event_body['location'] = location
+        event_body = build_event_body(start_time, end_time, summary, description, location)
 
         event = service.events().insert(
             calendarId='primary',
             body=event_body
         ).execute()
+    except Exception as e:
+        return False, describe_error(e)
+    # Keep the local index current without waiting for the next sync
+    apply_to_index(event)
+    return True, f"Event created successfully. Link: {event.get('htmlLink')}"
 
-        return True, f"Event created successfully. Link: {event.get('htmlLink')}"
+# Function to add an event to the local index; the event exists either way, so
+# a failure here is only reported
+def apply_to_index(event):
+    try:
+        get_event_index().apply(event)
+    except Exception as e:
+        print(f"Could not update the local calendar index: {e}")
+
+# Calendar accepts at most 50 requests per batch call
+MAX_BATCH_SIZE = 50
+MAX_RETRIES = 5
+# Optional override of the batch endpoint, to go with CALENDAR_API_ENDPOINT
+CALENDAR_BATCH_ENDPOINT = os.getenv("CALENDAR_BATCH_ENDPOINT")
+
+def is_retryable(e):
+    import httplib2
+    from googleapiclient.errors import HttpError
+    if isinstance(e, HttpError):
+        status = e.resp.status
+        # 403 is only retryable when it is a rate limit, not a permission problem
+        return status == 429 or status >= 500 or (status == 403 and 'rate' in str(e).lower())
+    # Transport errors (timeouts, dropped connections)
+    return isinstance(e, (OSError, httplib2.HttpLib2Error))
+
+def backoff_delay(attempt, base=1.0, cap=32.0):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+# Function to create many events with batched HTTP requests.
+# `events` holds dicts of create_event's keyword arguments; returns one
+# (ok, message) tuple per event, in order.
+def create_events(events, batch_size=MAX_BATCH_SIZE, max_retries=MAX_RETRIES, sleep=time.sleep):
+    results = [None] * len(events)
+    pending = []
+    for index, event in enumerate(events):
+        try:
+            event_body = build_event_body(**event)
+        except (TypeError, ValueError) as e:
+            results[index] = (False, describe_error(e))
+            continue
+        # A client-chosen id makes retried inserts idempotent: a repeat gets 409
+        event_body.setdefault('id', uuid.uuid4().hex)
+        pending.append((index, event_body))
+
+    try:
+        service = get_calendar_service()
     except Exception as e:
-        error_message = str(e)
-        if "credentials" in error_message.lower():
-            return False, "Authentication error: Please check your Google Calendar credentials"
-        elif "quota" in error_message.lower():
-            return False, "API quota exceeded: Please try again later"
+        for index, _ in pending:
+            results[index] = (False, describe_error(e))
+        return results
+
+    for attempt in range(max_retries + 1):
+        retry = []
+        for start in range(0, len(pending), min(batch_size, MAX_BATCH_SIZE)):
+            chunk = pending[start:start + min(batch_size, MAX_BATCH_SIZE)]
+            retry.extend(_insert_batch(service, chunk, results))
+        pending = retry
+        if not pending:
+            break
+        if attempt < max_retries:
+            sleep(backoff_delay(attempt))
+
+    for index, _ in pending:
+        results[index] = results[index] or (False, "API quota exceeded: Please try again later")
+    return results
+
+# Function to send one batch; fills in results and returns the items worth retrying
+def _insert_batch(service, chunk, results):
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import BatchHttpRequest
+
+    retry = []
+    bodies = {str(index): (index, body) for index, body in chunk}
+
+    def callback(request_id, event, exception):
+        index, body = bodies[request_id]
+        if exception is None:
+            results[index] = (True, f"Event created successfully. Link: {event.get('htmlLink')}")
+        elif isinstance(exception, HttpError) and exception.resp.status == 409:
+            # An earlier attempt already created it
+            results[index] = (True, "Event created successfully.")
+        elif is_retryable(exception):
+            results[index] = (False, describe_error(exception))
+            retry.append((index, body))
         else:
-            return False, f"Failed to create event: {error_message}"
+            results[index] = (False, describe_error(exception))
+
+    if CALENDAR_BATCH_ENDPOINT:
+        batch = BatchHttpRequest(callback=callback, batch_uri=CALENDAR_BATCH_ENDPOINT)
+    else:
+        batch = service.new_batch_http_request(callback=callback)
+    # Building the events() resource is not free, so do it once per batch
+    events_resource = service.events()
+    for request_id, (index, body) in bodies.items():
+        batch.add(events_resource.insert(calendarId='primary', body=body), request_id=request_id)
+    try:
+        batch.execute()
+    except Exception as e:
+        # The whole batch failed; requests without a result yet are retried or failed together
+        for index, body in chunk:
+            if results[index] is None or not results[index][0]:
+                results[index] = (False, describe_error(e))
+                if is_retryable(e) and (index, body) not in retry:
+                    retry.append((index, body))
+    return retry
+
+# Function to send queued event bodies (ids already set) as one batch request;
+# returns one (outcome, message) per body for the outbox
+def send_event_batch(bodies):
+    try:
+        service = get_calendar_service()
+    except Exception as e:
+        # Nothing was sent; keep the events until the credentials work again
+        return [(RETRY, describe_error(e))] * len(bodies)
+    results = [None] * len(bodies)
+    retry = {index for index, _ in _insert_batch(service, list(enumerate(bodies)), results)}
+    return [(RETRY if index in retry else SENT if ok else FAILED, message)
+            for index, (ok, message) in enumerate(results)]
+
+# Function to pull in changes made elsewhere once queued events went through
+def sync_event_index():
+    try:
+        get_event_index().sync(get_calendar_service(), pending=lambda: get_outbox().pending())
+    except Exception as e:
+        print(f"Could not sync the calendar: {e}")
+
+# Function to drop an event the API refused from the local index
+def drop_failed_event(body, message):
+    get_event_index().remove(body['id'])
+    print(f"Could not add '{body.get('summary', 'event')}' to the calendar: {message}")
+
+# Events are queued here and sent in the background, see calendar_outbox
+CALENDAR_OUTBOX_PATH = os.getenv("CALENDAR_OUTBOX_PATH", "calendar_outbox.sqlite3")
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+# Function to get the process-wide outbox, opening it (and resuming its flusher) on first use
+def get_outbox():
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = CalendarOutbox(CALENDAR_OUTBOX_PATH, send_event_batch, batch_size=MAX_BATCH_SIZE,
+                                     max_delay=300.0, on_sent=sync_event_index, on_failed=drop_failed_event,
+                                     backoff=backoff_delay).open()
+    return _outbox
+
+# Function to queue an event for the calendar; returns as soon as it is on local disk
+@metrics.timed('queue_event')
+def queue_event(start_time, end_time, summary, description=None, location=None):
+    try:
+        event_body = build_event_body(start_time, end_time, summary, description, location)
+        event_body['id'] = get_outbox().enqueue(event_body)
+    except Exception as e:
+        return False, describe_error(e)
+    # Show up in conflict checks right away, before the insert is sent
+    apply_to_index(event_body)
+    return True, "Event saved. It will be added to your calendar shortly."
+
+# Minimum time between background syncs started by conflict checks
+SYNC_INTERVAL = 5 * 60
+
+_last_sync = None
+_sync_lock = threading.Lock()
+
+# Function to start an incremental sync of the local index in the background,
+# at most once per SYNC_INTERVAL
+def refresh_event_index():
+    global _last_sync
+    with _sync_lock:
+        if _last_sync is not None and time.monotonic() - _last_sync < SYNC_INTERVAL:
+            return
+        _last_sync = time.monotonic()
+    threading.Thread(target=sync_event_index, daemon=True).start()
+
+# Function to list events overlapping [start_time, end_time). It is answered
+# from the local index without a network call; changes made elsewhere come in
+# through background syncs.
+def find_conflicts(start_time, end_time):
+    refresh_event_index()
+    return get_event_index().overlapping(start_time, end_time)
 
 def extract_date(command):
-    today = datetime.now().date()
-    
-    if 'today' in command:
-        return today
-    elif 'tomorrow' in command:
-        return today + timedelta(days=1)
-    elif 'day after tomorrow' in command:
-        return today + timedelta(days=2)
-    elif 'next' in command:
-        days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-        for i, day in enumerate(days):
-            if day in command.lower():
-                days_ahead = (i - today.weekday() + 7) % 7 or 7
-                return today + timedelta(days=days_ahead)
-    
-    date_patterns = [
-        r'(\d{1,2})(st|nd|rd|th)?\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)',
-        r'(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\s+(\d{1,2})(st|nd|rd|th)?'
-    ]
-    
-    for pattern in date_patterns:
-        match = re.search(pattern, command.lower())
-        if match:
-            groups = match.groups()
-            if len(groups[0]) > 3:
-                month_str, day = groups[0], groups[1]
-            else:
-                month_str, day = groups[2], groups[0]
-            
-            day = int(day)
-            month = datetime.strptime(month_str[:3], '%b').month
-            year = today.year
-            
-            parsed_date = datetime(year, month, day).date()
-            if parsed_date < today:
-                year += 1
-            
-            return datetime(year, month, day).date()
-    
-    return None
+    return temporal.extract_date(command)
 
 def extract_time(command):
-    time_regex = re.compile(r'\b(\d{1,2})(?::(\d{2}))?\s*(AM|PM|am|pm|a\.m\.|p\.m\.)?(?:\b|\s+)')
-    time_match = time_regex.search(command)
-    
-    if time_match:
-        hour, minute, meridiem = time_match.groups()
-        hour = int(hour)
-        minute = int(minute or 0)
-        
-        if meridiem:
-            meridiem = meridiem.lower().replace('.', '')
-        
-        if not meridiem:
-            meridiem = 'pm' if 12 <= hour < 24 else 'am'
-        
-        if meridiem in ['pm', 'p.m.'] and hour != 12:
-            hour += 12
-        elif meridiem in ['am', 'a.m.'] and hour == 12:
-            hour = 0
-        
-        return f"{hour:02d}:{minute:02d}"
-    
-    return None
+    time_value = temporal.extract_time(command)
+    if time_value is None:
+        return None
+    if isinstance(time_value, timedelta):
+        return (datetime.now() + time_value).strftime("%H:%M")
+    hour, minute = time_value
+    return f"{hour:02d}:{minute:02d}"
 
+@metrics.timed('parse_command')
 def parse_command(command):
     print(f"Original command: {command}")
     
@@ -165,31 +372,57 @@ def parse_command(command):
     
     print(f"Parsed date and time: {date_time}")
     
-    summary_match = re.search(r"meeting with (.+?)(?:\s+on|\s+at|$)", command, re.IGNORECASE)
+    summary_match = SUMMARY_REGEX.search(command)
     summary = summary_match.group(1).strip() if summary_match else " Scheduled Meeting"
     
     return summary, date_time
 
-def recognize_speech_and_create_event():
-    recognizer = sr.Recognizer()
-    microphone = sr.Microphone()
+# Function to create an event from a spoken or typed command; returns a message for the user
+def create_event_from_command(command):
+    summary, start_time = parse_command(command)
 
-    with microphone as source:
-        print("Listening for voice command...")
-        recognizer.adjust_for_ambient_noise(source)
-        audio = recognizer.listen(source)
+    from pytz import timezone
+
+    india_tz = timezone('Asia/Kolkata')
+    start_time = india_tz.localize(start_time)
+    end_time = start_time + timedelta(hours=1)
+
+    notes = []
+    conflicts = find_conflicts(start_time, end_time)
+    if conflicts:
+        names = ', '.join(conflict[3] or 'an event' for conflict in conflicts)
+        notes.append(f"Warning: this overlaps with {names}.")
+        free_slot = get_event_index().next_free_slot(end_time - start_time, start_time)
+        if free_slot:
+            notes.append(f"The next free slot is at {free_slot.strftime('%Y-%m-%d %H:%M')}.")
+
+    success, message = queue_event(start_time, end_time, summary)
+    return ' '.join(notes + [message])
 
+# Handler for the assistant's calendar intent
+def handle_calendar_command(command):
     try:
-        command = recognizer.recognize_google(audio)
-        print(f"You said: {command}")
+        message = create_event_from_command(command)
+    except ValueError as e:
+        message = str(e)
+    print(message)
+    speech.speak(message)
 
-        summary, start_time = parse_command(command)
-        
-        india_tz = timezone('Asia/Kolkata')
-        start_time = india_tz.localize(start_time)
-        end_time = start_time + timedelta(hours=1)
+intents.register('calendar', ['schedule', 'meeting with', 'calendar', 'add an event', 'create an event',
+                              'book a meeting'], handle_calendar_command, timeout=30, serial=True)
+
+def recognize_speech_and_create_event():
+    import speech_recognition as sr
+    import audio_stream
+
+    try:
+        print("Listening for voice command...")
+        command = audio_stream.get_stream().listen()
+        print(f"You said: {command}")
 
-        create_event(start_time, end_time, summary)
+        print(create_event_from_command(command))
+        # Give the outbox a moment to send it; anything left goes out on the next run
+        get_outbox().wait(30)
 
     except sr.UnknownValueError:
         print("Sorry, I did not understand that.")
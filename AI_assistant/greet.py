@@ -1,40 +1,53 @@
 import os
-import speech_recognition as sr
-import pyttsx3
+import re
 import datetime
-import webbrowser
-import requests
+import time
 from dotenv import load_dotenv
+import intents
+import metrics
+import speech
+from weather_client import get_client
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize the recognizer and text-to-speech engine
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-
 # WeatherAPI key (loaded from .env file)
 API_KEY = os.getenv("WEATHER_API_KEY")
 
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
+CITY_REGEX = re.compile(r"\b(?:in|for|at)\s+([a-z][a-z .'-]*?)\s*(?:today|tomorrow|now|right now|please)?[?.!]*$",
+                        re.IGNORECASE)
+
+# Speech is queued on the shared speech worker so answers don't block the loop
+def speak(text, cacheable=False):
+    speech.speak(text, cacheable=cacheable)
 
+# Listening goes on while the assistant talks, so the user can cut it off.
+# Whatever was heard over the assistant's own voice is taken for its echo,
+# unless it asks to stop.
 def listen():
-    with sr.Microphone() as source:
-        print("Listening...")
-        recognizer.adjust_for_ambient_noise(source)
-        try:
-            audio = recognizer.listen(source, timeout=5)  # Timeout to prevent hanging
-        except sr.WaitTimeoutError:
-            print("Listening timed out, no speech detected.")
-            return ""
-        
+    # Imported on first use: the typed assistant never loads the audio stack
+    import speech_recognition as sr
+    import audio_stream
+
+    stream = audio_stream.get_stream()
+    print("Listening...")
+    deadline = time.monotonic() + 5  # Timeout to prevent hanging
     try:
-        print("Recognizing...")
-        query = recognizer.recognize_google(audio, language='en-US')
+        while True:
+            with metrics.timer('listen'):
+                query = stream.listen(timeout=max(0.0, deadline - time.monotonic()))
+            if stream.heard_at is None or not speech.spoke_since(stream.heard_at):
+                break
+            if intents.router.mentions(query, 'cancel'):
+                # Barge-in: the echo around it doesn't matter
+                query = 'stop'
+                break
+            print(f"Ignoring what was heard while speaking: {query}")
         print(f"User said: {query}")
         return query.lower()
+    except sr.WaitTimeoutError:
+        print("Listening timed out, no speech detected.")
+        return ""
     except sr.UnknownValueError:
         print("Sorry, I didn't catch that. Can you please repeat?")
         return ""
@@ -43,53 +56,67 @@ def listen():
         return ""
 
 def get_weather(city):
-    base_url = "http://api.weatherapi.com/v1/current.json"
-    params = {
-        "key": API_KEY,
-        "q": city,
-        "aqi": "no"  # Optional: set to "yes" if you want air quality information
-    }
-    try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()  # Will raise an exception for 4xx/5xx status codes
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching weather data: {e}")
-        return "Sorry, I couldn't fetch the weather information at the moment."
-    
-    if response.status_code == 200:
-        data = response.json()
-        temperature = data['current']['temp_c']
-        description = data['current']['condition']['text']
-        return f"The current temperature in {city} is {temperature}°C with {description}."
-    else:
-        return "Sorry, I couldn't fetch the weather information at the moment."
+    return get_client(API_KEY).get_weather(city)
 
-def process_command(command):
-    if "weather" in command:
-        speak("Sure, for which city would you like the weather update?")
+# Function to pull the city out of e.g. "what's the weather in new york today"
+def extract_city(command):
+    match = CITY_REGEX.search(command)
+    return match.group(1) if match else None
+
+def handle_weather(command):
+    city = extract_city(command)
+    if not city:
+        speak("Sure, for which city would you like the weather update?", cacheable=True)
         city = listen()
-        if city:  # Check if a city was actually provided
-            weather_info = get_weather(city)
-            speak(weather_info)
-
-    elif "time" in command:
-        current_time = datetime.datetime.now().strftime("%H:%M:%S")
-        speak(f"The current time is {current_time}")
-
-    elif "date" in command:
-        current_date = datetime.date.today().strftime("%B %d, %Y")
-        speak(f"Today's date is {current_date}")
-
-    elif "exit" in command or "bye" in command:
-        speak("Goodbye! Have a great day!")
-        return False
-    else:
-        speak("I'm not sure how to help with that. Can you please try again?")
-    return True
-
-speak("Hello! I'm your AI assistant. How can I help you today?")
-
-while True:
-    command = listen()
-    if not process_command(command):
-        break
+    if city:  # Check if a city was actually provided
+        weather_info = get_weather(city)
+        speak(weather_info)
+
+def handle_time(command):
+    current_time = datetime.datetime.now().strftime("%H:%M:%S")
+    # The fixed part of a template is a separate fragment so it is rendered once
+    speak(["The current time is", current_time], cacheable=(True, False))
+
+def handle_date(command):
+    current_date = datetime.date.today().strftime("%B %d, %Y")
+    speak(["Today's date is", current_date], cacheable=(True, False))
+
+def handle_cancel(command):
+    speak("Okay.", cacheable=True)
+
+def handle_exit(command):
+    speak("Goodbye! Have a great day!", cacheable=True)
+    return False
+
+def not_understood(command):
+    speak("I'm not sure how to help with that. Can you please try again?", cacheable=True)
+
+intents.register('weather', ['weather', 'temperature', 'forecast', 'is it raining', 'how hot', 'how cold'], handle_weather,
+                 timeout=20)
+intents.register('time', ['time', 'what time', 'what time is it', 'the time', 'current time'], handle_time)
+intents.register('date', ['date', "what's the date", 'what is the date', "today's date", 'what day is it'], handle_date)
+intents.register('exit', ['exit', 'bye', 'goodbye', 'quit'], handle_exit)
+# Under the assistant core this also cancels whatever is still running
+intents.register('cancel', ['stop', 'cancel', 'never mind', 'nevermind'], handle_cancel)
+
+# Function to route a command to the best matching skill; returns False to exit
+def process_command(command):
+    _, result = intents.dispatch(command, default=not_understood)
+    return result is not False
+
+def main():
+    speak("Hello! I'm your AI assistant. How can I help you today?", cacheable=True)
+
+    while True:
+        try:
+            command = listen()
+        except EOFError:
+            # Recorded audio (ASSISTANT_AUDIO_FILES) has run out
+            break
+        if not process_command(command):
+            break
+    # Let the goodbye finish before the process ends
+    speech.wait_until_idle()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import re
+import threading
+from collections import deque
+
+import metrics
+
+# Intent routing for the assistant. Skills register trigger phrases for their
+# intents; all phrases are compiled into one word-level Aho-Corasick automaton,
+# so routing a command is a single pass over its words however many skills are
+# registered. Every phrase found adds weight * (words in the phrase) to its
+# intent's score, and the best-scoring intent handles the command: longer, more
+# specific phrases ('what time') beat single keywords ('weather').
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    return _WORD_RE.findall(text.lower())
+
+
+class Intent:
+    __slots__ = ('name', 'handler', 'phrases', 'weight', 'timeout', 'serial')
+
+    def __init__(self, name, handler, phrases, weight, timeout=None, serial=False):
+        self.name = name
+        self.handler = handler
+        self.phrases = phrases
+        self.weight = weight
+        self.timeout = timeout
+        self.serial = serial
+
+
+# Word-level Aho-Corasick automaton: state 0 is the root, `goto` holds the
+# word transitions of each state and `output` the (intent index, score) pairs of
+# every phrase ending there, including those reached through failure links.
+class _Automaton:
+    def __init__(self, intents):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for index, intent in enumerate(intents):
+            for phrase in intent.phrases:
+                words = tokenize(phrase)
+                state = 0
+                for word in words:
+                    if word not in self.goto[state]:
+                        self.goto.append({})
+                        self.fail.append(0)
+                        self.output.append([])
+                        self.goto[state][word] = len(self.goto) - 1
+                    state = self.goto[state][word]
+                self.output[state].append((index, intent.weight * len(words)))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(word, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    # Function to score every intent mentioned in a list of words
+    def scores(self, words):
+        goto, fail, output = self.goto, self.fail, self.output
+        scores = {}
+        state = 0
+        for word in words:
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            for index, score in output[state]:
+                scores[index] = scores.get(index, 0) + score
+        return scores
+
+
+class IntentRouter:
+    def __init__(self):
+        self._intents = []
+        self._automaton = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._intents)
+
+    # Function to register an intent. `phrases` are word sequences that trigger
+    # it; `handler(command)` runs when it wins and its result is returned by dispatch.
+    # `timeout` (seconds) caps the handler when it runs under the assistant core,
+    # and `serial` handlers (ones that change or read shared state, like setting
+    # and listing reminders) run there one at a time in the order they were heard.
+    def register(self, name, phrases, handler, weight=1.0, timeout=None, serial=False):
+        with self._lock:
+            phrases = [phrases] if isinstance(phrases, str) else list(phrases)
+            self._intents.append(Intent(name, handler, phrases, weight, timeout, serial))
+            # Rebuilt on the next route
+            self._automaton = None
+
+    def _compiled(self):
+        with self._lock:
+            if self._automaton is None:
+                self._automaton = _Automaton(self._intents)
+            return self._automaton, self._intents
+
+    # Function to find the best intent for a command: (intent, score) or (None, 0).
+    # Ties go to the intent registered first.
+    def route(self, command):
+        automaton, intents = self._compiled()
+        scores = automaton.scores(tokenize(command))
+        if not scores:
+            return None, 0
+        index = min(scores, key=lambda i: (-scores[i], i))
+        return intents[index], scores[index]
+
+    # Function to tell whether a command contains any phrase of intent `name`,
+    # whether or not that intent would win the command
+    def mentions(self, command, name):
+        automaton, intents = self._compiled()
+        return any(intents[index].name == name for index in automaton.scores(tokenize(command)))
+
+    # Function to run the handler of the best intent; returns (intent name, result),
+    # or (None, default(command)) when nothing matched
+    def dispatch(self, command, default=None):
+        with metrics.timer('route'):
+            intent, _ = self.route(command)
+        if intent is None:
+            metrics.count('command_not_understood')
+            return None, default(command) if default else None
+        with metrics.timer(f'handle_{intent.name}'):
+            return intent.name, intent.handler(command)
+
+
+# Process-wide router that the skills register with
+router = IntentRouter()
+
+
+def register(name, phrases, handler, weight=1.0, timeout=None, serial=False):
+    router.register(name, phrases, handler, weight, timeout, serial)
+
+
+def route(command):
+    return router.route(command)
+
+
+def dispatch(command, default=None):
+    return router.dispatch(command, default)
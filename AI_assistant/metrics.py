@@ -0,0 +1,239 @@
+import atexit
+import bisect
+import collections
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Per-stage timers, counters and histograms for the assistant's hot paths.
+#
+#   @metrics.timed('parse_command')           time every call of a function
+#   with metrics.timer('recognize'): ...      time a block
+#   metrics.count('weather_cache_hit')        count an event
+#
+# Everything is off unless ASSISTANT_METRICS=1 is set before the modules are
+# imported. Off means free: timed() hands back the undecorated function, and
+# timer()/count() are no-ops. ASSISTANT_METRICS_FILE=<path>.prom or .jsonl
+# writes Prometheus text or JSON lines at exit.
+
+ENABLED = os.getenv("ASSISTANT_METRICS", "") not in ("", "0")
+
+STAGE_METRIC = 'assistant_stage_seconds'
+EVENT_METRIC = 'assistant_events_total'
+
+# Upper bounds in seconds, from fast regex work up to slow network calls
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Function to estimate a quantile from the buckets (upper bound of its bucket)
+    def quantile(self, q):
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return 0.0
+
+
+class _Timer:
+    __slots__ = ('registry', 'stage', 'started')
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.stage, time.perf_counter() - self.started)
+
+
+class Registry:
+    def __init__(self):
+        self.stages = collections.defaultdict(Histogram)
+        self.events = collections.Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.stages[stage].observe(seconds)
+
+    def count(self, event, n=1):
+        with self._lock:
+            self.events[event] += n
+
+    def timer(self, stage):
+        return _Timer(self, stage)
+
+    def timed(self, stage):
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(stage, time.perf_counter() - started)
+            return wrapper
+        return decorate
+
+    # Function to render every series in the Prometheus text exposition format
+    def prometheus(self):
+        with self._lock:
+            lines = [f"# TYPE {STAGE_METRIC} histogram"]
+            for stage, histogram in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{STAGE_METRIC}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{STAGE_METRIC}_sum{{stage="{stage}"}} {histogram.sum!r}')
+                lines.append(f'{STAGE_METRIC}_count{{stage="{stage}"}} {histogram.count}')
+            lines.append(f"# TYPE {EVENT_METRIC} counter")
+            for event, value in sorted(self.events.items()):
+                lines.append(f'{EVENT_METRIC}{{event="{event}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    # Function to render one JSON object per series
+    def jsonl(self):
+        now = time.time()
+        with self._lock:
+            records = [
+                {'ts': now, 'metric': STAGE_METRIC, 'stage': stage, 'count': histogram.count, 'sum': histogram.sum,
+                 'p50': histogram.quantile(0.5), 'p99': histogram.quantile(0.99),
+                 'buckets': dict(zip([str(bound) for bound in BUCKETS] + ['+Inf'], histogram.counts))}
+                for stage, histogram in sorted(self.stages.items())
+            ]
+            records += [{'ts': now, 'metric': EVENT_METRIC, 'event': event, 'value': value}
+                        for event, value in sorted(self.events.items())]
+        return ''.join(json.dumps(record) + '\n' for record in records)
+
+    def dump(self, path):
+        text = self.jsonl() if path.endswith('.jsonl') else self.prometheus()
+        mode = 'a' if path.endswith('.jsonl') else 'w'
+        with open(path, mode, encoding='utf-8') as output:
+            output.write(text)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def _unchanged(func):
+    return func
+
+
+registry = Registry() if ENABLED else None
+
+if ENABLED:
+    timer = registry.timer
+    timed = registry.timed
+    count = registry.count
+else:
+    def timer(stage):
+        return _NULL_TIMER
+
+    def timed(stage):
+        return _unchanged
+
+    def count(event, n=1):
+        pass
+
+
+def export(path):
+    if registry:
+        registry.dump(path)
+
+
+if ENABLED and os.getenv("ASSISTANT_METRICS_FILE"):
+    atexit.register(export, os.getenv("ASSISTANT_METRICS_FILE"))
+
+
+# Samples the stacks of every thread at a fixed interval and counts them in the
+# collapsed format ("thread;outer;inner count") read by flamegraph.pl and speedscope
+class StackSampler:
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as output:
+            for stack, samples in self.stacks.most_common():
+                output.write(f"{stack} {samples}\n")
+
+
+# Function to profile a block, e.g. one command. A .prof/.pstats path gets
+# cProfile output (snakeviz, flameprof); anything else gets sampled stacks of
+# all threads in the collapsed format for flamegraph.pl.
+@contextlib.contextmanager
+def profile(path):
+    if path.endswith(('.prof', '.pstats')):
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+    else:
+        sampler = StackSampler().start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.write(path)
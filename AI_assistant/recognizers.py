@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+import speech_recognition as sr
+
+import metrics
+
+# Speech-to-text backends. Every backend takes sr.AudioData and returns text,
+# raising sr.UnknownValueError when nothing was understood and sr.RequestError
+# when the engine itself failed, the same contract as recognize_google, so
+# callers keep their existing error handling.
+#
+# SPEECH_BACKEND picks the backend for a deployment: google (default, online),
+# vosk or whisper_cpp (offline, CPU). SPEECH_MODEL_PATH points the offline
+# engines at their model.
+
+SAMPLE_RATE = 16000
+
+
+# Google Web Speech API through speech_recognition (needs network)
+class GoogleBackend:
+    name = 'google'
+
+    def __init__(self, language='en-US'):
+        self.language = language
+        self.recognizer = sr.Recognizer()
+
+    def load(self):
+        return self
+
+    def recognize(self, audio):
+        return self.recognizer.recognize_google(audio, language=self.language)
+
+
+# Offline recognition with Vosk; the model is loaded once and kept in memory
+class VoskBackend:
+    name = 'vosk'
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.model = None
+
+    def load(self):
+        if self.model is None:
+            try:
+                import vosk
+            except ImportError:
+                raise sr.RequestError("vosk is not installed; run pip install vosk")
+            vosk.SetLogLevel(-1)
+            self._vosk = vosk
+            self.model = vosk.Model(self.model_path)
+        return self
+
+    def recognize(self, audio):
+        self.load()
+        # A recognizer per utterance is cheap next to the model, and keeps calls independent
+        recognizer = self._vosk.KaldiRecognizer(self.model, SAMPLE_RATE)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get('text', '')
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+# Offline recognition with whisper.cpp (pywhispercpp bindings); the model is
+# loaded once and kept in memory
+class WhisperCppBackend:
+    name = 'whisper_cpp'
+
+    def __init__(self, model_path, threads=None):
+        self.model_path = model_path
+        self.threads = threads or os.cpu_count() or 4
+        self.model = None
+
+    def load(self):
+        if self.model is None:
+            try:
+                from pywhispercpp.model import Model
+                import numpy
+            except ImportError:
+                raise sr.RequestError("pywhispercpp is not installed; run pip install pywhispercpp")
+            self._numpy = numpy
+            self.model = Model(self.model_path, n_threads=self.threads, print_progress=False,
+                               print_realtime=False)
+        return self
+
+    def recognize(self, audio):
+        self.load()
+        pcm = array('h', audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2))
+        samples = self._numpy.array(pcm, dtype=self._numpy.float32) / 32768.0
+        text = ' '.join(segment.text.strip() for segment in self.model.transcribe(samples)).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+BACKENDS = {
+    'google': GoogleBackend,
+    'vosk': VoskBackend,
+    'whisper_cpp': WhisperCppBackend
+}
+
+
+# Function to create the backend named by `name` (default: SPEECH_BACKEND)
+def create_backend(name=None, model_path=None):
+    name = name or os.getenv("SPEECH_BACKEND", "google")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown speech backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    if name == 'google':
+        return GoogleBackend()
+    model_path = model_path or os.getenv("SPEECH_MODEL_PATH")
+    if not model_path:
+        raise ValueError(f"SPEECH_MODEL_PATH must point at a model for the {name} backend")
+    return BACKENDS[name](model_path)
+
+
+# Function to hash the audio content (samples and format) for the result cache
+def audio_key(audio):
+    digest = hashlib.sha1(audio.frame_data)
+    digest.update(f"{audio.sample_rate}:{audio.sample_width}".encode())
+    return digest.hexdigest()
+
+
+# Wraps a backend with an LRU cache of recent audio-to-text results keyed on a
+# content hash, so replayed audio (test recordings, repeated prompts) skips the
+# engine. Only successful recognitions are cached.
+class CachedRecognizer:
+    def __init__(self, backend, max_entries=256):
+        self.backend = backend
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, audio):
+        key = audio_key(audio)
+        with self._lock:
+            text = self._cache.get(key)
+            if text is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                metrics.count('recognizer_cache_hit')
+                return text
+            self.misses += 1
+        metrics.count('recognizer_cache_miss')
+        text = self.backend.recognize(audio)
+        with self._lock:
+            self._cache[key] = text
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return text
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_recognizer = None
+_recognizer_lock = threading.Lock()
+
+
+# Function to get the process-wide recognizer, loading the backend on first use
+def get_recognizer():
+    global _recognizer
+    with _recognizer_lock:
+        if _recognizer is None:
+            _recognizer = CachedRecognizer(create_backend().load())
+    return _recognizer
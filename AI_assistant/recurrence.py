@@ -0,0 +1,84 @@
+import calendar
+from datetime import timedelta
+
+RECURRENCE_TYPES = ('day', 'week', 'month', 'year')
+
+# Fixed-length steps; months and years are computed on the calendar instead
+_FIXED_STEPS = {
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1)
+}
+_MONTH_STEPS = {
+    'month': 1,
+    'year': 12
+}
+
+
+# Function to add whole months to a datetime, clamping to the end of shorter months
+def add_months(start, months):
+    total = start.month - 1 + months
+    year, month = start.year + total // 12, total % 12 + 1
+    day = min(start.day, calendar.monthrange(year, month)[1])
+    return start.replace(year=year, month=month, day=day)
+
+
+# Function to get the n-th occurrence (0 = start) of a recurrence rule.
+# Every occurrence is computed from the original start, so clamping a 31st to
+# the 30th (or Feb 29 to Feb 28) never drifts into later occurrences.
+def nth_occurrence(start, recurring_type, n):
+    if recurring_type in _FIXED_STEPS:
+        return start + _FIXED_STEPS[recurring_type] * n
+    if recurring_type in _MONTH_STEPS:
+        return add_months(start, _MONTH_STEPS[recurring_type] * n)
+    raise ValueError(f"Unknown recurrence type: {recurring_type}")
+
+
+# Function to find the index of the first occurrence at or after a moment
+def occurrence_index(start, recurring_type, moment):
+    if moment <= start:
+        return 0
+    if recurring_type in _FIXED_STEPS:
+        step = _FIXED_STEPS[recurring_type]
+        n = (moment - start) // step
+    else:
+        step = _MONTH_STEPS[recurring_type]
+        n = ((moment.year - start.year) * 12 + moment.month - start.month) // step
+        n = max(n - 1, 0)
+    # The estimate is at most a couple of steps short
+    while nth_occurrence(start, recurring_type, n) < moment:
+        n += 1
+    return n
+
+
+# A recurring rule that keeps exactly one pending occurrence and advances lazily
+class Recurrence:
+    __slots__ = ('start', 'recurring_type', 'index')
+
+    def __init__(self, start, recurring_type, index=0):
+        if recurring_type not in RECURRENCE_TYPES:
+            raise ValueError(f"Unknown recurrence type: {recurring_type}")
+        self.start = start
+        self.recurring_type = recurring_type
+        self.index = index
+
+    def __repr__(self):
+        return f"Recurrence({self.start!r}, {self.recurring_type!r}, index={self.index})"
+
+    def __iter__(self):
+        n = self.index
+        while True:
+            yield nth_occurrence(self.start, self.recurring_type, n)
+            n += 1
+
+    @property
+    def current(self):
+        return nth_occurrence(self.start, self.recurring_type, self.index)
+
+    def advance(self):
+        self.index += 1
+        return self.current
+
+    # Jump to the first occurrence at or after a moment without walking every step
+    def skip_to(self, moment):
+        self.index = max(self.index, occurrence_index(self.start, self.recurring_type, moment))
+        return self.current
@@ -1,114 +1,47 @@
-import time
-from datetime import datetime, timedelta
+import os
 import re
+from datetime import datetime, timedelta
 import threading
-import pyttsx3
-import calendar
-
-# Initialize the TTS engine
-tts_engine = pyttsx3.init()
-
-# Store reminders in lists
-reminders = []
-recurring_reminders = []
+import intents
+import metrics
+import speech
+from scheduler import Scheduler
+from reminder_store import ReminderStore
+from recurrence import Recurrence
+from reminder_index import ReminderIndex
+from reminder_record import reminder_payload
+from reminder_parser import parse_reminder, resolve
+import temporal
+from temporal import resolve_date
 
-# Function to speak text
-def speak(text):
-    print(text)  # Also print the text for debugging
-    tts_engine.say(text)
-    tts_engine.runAndWait()
+# Function to speak text or a list of fragments (queued on the shared speech worker, never blocks)
+def speak(text, cacheable=False):
+    print(text if isinstance(text, str) else ' '.join(text))  # Also print the text for debugging
+    speech.speak(text, cacheable=cacheable)
 
 # Function to drop a message and speak it
 def drop_message(message):
     print("\n" + "=" * 40)
     print(f"REMINDER: {message}")
     print("=" * 40 + "\n")
-    speak(f"Reminder: {message}")
+    # Reminders due together are announced as one message
+    speech.speak(["Reminder:", message], priority=speech.URGENT, group='reminder', detail=message,
+                 cacheable=(True, False))
 
 # Function to parse natural language input for reminders
 def parse_reminder_input(input_text):
-    recurring_patterns = {
-        'day': r'(every\s*day|daily)',
-        'week': r'every\s*week',
-        'month': r'every\s*month',
-        'year': r'every\s*year'
-    }
-    
-    reminder_text = input_text
-    recurring_type = None
-    time_str = None
-    date_str = None
-    
-    # Check for recurring patterns
-    for recurrence, pattern in recurring_patterns.items():
-        if re.search(pattern, input_text, re.IGNORECASE):
-            recurring_type = recurrence
-            # Remove the recurring pattern from the reminder text
-            reminder_text = re.sub(pattern, '', input_text, flags=re.IGNORECASE).strip()
-            break
-    
-    # Check for date in the input
-    date_patterns = [
-        r'(today|tomorrow|the next day)',
-        r'(on|for) (\d{1,2}(?:st|nd|rd|th)? (?:of )?(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?))',
-        r'(\d{1,2}(?:st|nd|rd|th)? (?:of )?(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?))'
-    ]
-    
-    for pattern in date_patterns:
-        date_match = re.search(pattern, reminder_text, re.IGNORECASE)
-        if date_match:
-            date_str = date_match.group()
-            reminder_text = re.sub(re.escape(date_str), '', reminder_text, flags=re.IGNORECASE).strip()
-            break
-    
-    # Check for time in the input
-    time_patterns = [
-        r'at (\d{1,2}(?::\d{2})?\s*(?:am|pm))',
-        r'(\d{1,2}(?::\d{2})?\s*(?:am|pm))',
-        r'(\d{1,2}\s*o\'clock)',
-        r'at (\w+)',  # For phrases like "at noon", "at midnight"
-        r'in (\d+) (minute|minutes|hour|hours|day|days)',
-    ]
-    
-    for pattern in time_patterns:
-        time_match = re.search(pattern, reminder_text, re.IGNORECASE)
-        if time_match:
-            time_str = time_match.group()
-            reminder_text = re.sub(re.escape(time_str), '', reminder_text, flags=re.IGNORECASE).strip()
-            break
-    
-    return reminder_text, recurring_type, time_str, date_str
+    parsed = parse_reminder(input_text)
+    return parsed.text, parsed.recurring_type, parsed.time_str, parsed.date_str
 
 # Function to parse natural language date expressions
 def parse_date_expression(date_input):
-    if not date_input:
-        return datetime.now().date()
-    
     today = datetime.now().date()
-    
-    if 'today' in date_input.lower():
+    if not date_input:
         return today
-    elif 'tomorrow' in date_input.lower():
-        return today + timedelta(days=1)
-    elif 'the next day' in date_input.lower():
-        return today + timedelta(days=2)
-    
-    # Handle specific dates like "15th August"
-    date_match = re.search(r'(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?(\w+)', date_input, re.IGNORECASE)
-    if date_match:
-        day = int(date_match.group(1))
-        month = date_match.group(2).lower()
-        month_num = list(calendar.month_abbr).index(month[:3].title())
-        year = today.year
-        
-        # If the date has already passed this year, assume it's for next year
-        parsed_date = datetime(year, month_num, day).date()
-        if parsed_date < today:
-            parsed_date = datetime(year + 1, month_num, day).date()
-        
-        return parsed_date
-    
-    return None
+    date_value = parse_reminder(date_input).date_value
+    if date_value is None:
+        return None
+    return resolve_date(date_value, today)
 
 # Function to parse natural language time expressions
 def parse_time_expression(time_input):
@@ -117,107 +50,253 @@ def parse_time_expression(time_input):
     if not time_input:
         return now.replace(hour=9, minute=0, second=0, microsecond=0)  # Default to 9:00 AM if no time specified
     
-    # Handling "in X minutes/hours/days"
-    relative_time_match = re.match(r'in (\d+) (minute|minutes|hour|hours|day|days)', time_input, re.IGNORECASE)
-    if relative_time_match:
-        value = int(relative_time_match.group(1))
-        unit = relative_time_match.group(2).lower()
-        
-        if 'minute' in unit:
-            return now + timedelta(minutes=value)
-        elif 'hour' in unit:
-            return now + timedelta(hours=value)
-        elif 'day' in unit:
-            return now + timedelta(days=value)
-    
-    # Handling specific times
-    time_patterns = [
-        (r'(?:at\s)?(\d{1,2})(?::(\d{2}))?\s*(am|pm)?', lambda h, m, p: (int(h) % 12 + (12 if p and p.lower() == 'pm' else 0), int(m) if m else 0)),
-        (r'(\d{1,2})\s*o\'clock', lambda h, _: (int(h) % 12, 0)),
-        (r'noon', lambda: (12, 0)),
-        (r'midnight', lambda: (0, 0)),
-        (r'morning', lambda: (9, 0)),
-        (r'afternoon', lambda: (14, 0)),
-        (r'evening', lambda: (18, 0)),
-        (r'night', lambda: (20, 0))
-    ]
-    
-    for pattern, time_func in time_patterns:
-        match = re.match(pattern, time_input, re.IGNORECASE)
-        if match:
-            if callable(time_func):
-                hour, minute = time_func(*match.groups())
-            else:
-                hour, minute = time_func()
-            
-            reminder_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-            return reminder_time
-    
-    return None
+    time_value = parse_reminder(time_input).time_value
+    if time_value is None:
+        return None
+    if isinstance(time_value, timedelta):
+        return now + time_value
+    hour, minute = time_value
+    return now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+# Function to fire a due reminder; returns the next fire time for recurring ones.
+# Reminders are queued under their ids; a one-off's payload is just its text.
+def fire_reminder(when, reminder, reminder_id):
+    if reminder is PAGE_IN:
+        return page_in_reminders(when)
+    one_off = type(reminder) is str
+    with _cancel_lock:
+        if reminder_id in cancelled_ids:
+            # Cancelled after it was queued; the scheduler entry is simply dropped
+            cancelled_ids.discard(reminder_id)
+            return None
+        if one_off:
+            # Under the lock, so a cancel from now on knows it is no longer queued
+            store.record_fire(reminder_id)
+    metrics.count('reminder_fired')
+    if one_off:
+        drop_message(reminder)
+        index_remove(reminder_id)
+        return None
+    drop_message(reminder.text)
+    # Skip occurrences missed while the machine was asleep instead of replaying them
+    next_when = reminder.advance(datetime.now())
+    store.record_fire(reminder_id, next_when, reminder.occurrence)
+    index_put(reminder_id, reminder.text, next_when, reminder.recurring_type)
+    return next_when
+
+# Pending reminders, ordered by their next fire time
+scheduler = Scheduler(fire_reminder)
+
+# Reminders survive restarts through an append-only journal plus SQLite snapshots
+store = ReminderStore(os.getenv("REMINDER_STORE_DIR", "reminder_data"))
+
+# Stored reminders are loaded a window at a time; this scheduler entry marks
+# the end of the loaded window and pulls in the next one when it comes due
+PAGE_IN = object()
+PAGE_SECONDS = 6 * 60 * 60
+
+# Ids cancelled while they are still queued with the scheduler; each is
+# removed again when its scheduler entry comes due
+cancelled_ids = set()
+_cancel_lock = threading.Lock()
+
+# Query index over every stored reminder, built on first use (see get_index)
+_index = None
+_index_lock = threading.Lock()
+
+# Function to get the reminder query index, loading it from the store the first
+# time. Before the store is opened there is nothing to index yet.
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            if not store.opened:
+                return ReminderIndex()
+            _index = ReminderIndex().load(store.load_all())
+        return _index
+
+# The index is only kept up to date once it exists; until then the store has everything
+def index_put(reminder_id, reminder_text, fire_at, recurring_type=None):
+    with _index_lock:
+        if _index is not None:
+            _index.put(reminder_id, reminder_text, fire_at, recurring_type)
+
+def index_remove(reminder_id):
+    with _index_lock:
+        if _index is not None:
+            _index.remove(reminder_id)
+
+# Function to queue a reminder with the scheduler
+def add_reminder(reminder_text, reminder_datetime, recurring_type=None):
+    recurrence = None
+    start_at = None
+    if recurring_type:
+        # Only the next pending occurrence is queued; it advances when it fires
+        recurrence = Recurrence(reminder_datetime, recurring_type)
+        start_at = reminder_datetime.timestamp()
+        reminder_datetime = recurrence.skip_to(datetime.now())
+    occurrence = recurrence.index if recurrence else 0
+    reminder_id = store.new_id()
+    when = reminder_datetime.timestamp()
+    store.record_set(reminder_id, reminder_text, when, recurring_type, start_at, occurrence)
+    index_put(reminder_id, reminder_text, when, recurring_type)
+    return scheduler.schedule(when, reminder_payload(reminder_text, recurring_type, start_at, occurrence),
+                              key=reminder_id)
+
+# Function to cancel a pending reminder by id. Only a reminder already queued
+# with the scheduler has an entry to skip; the store keeps the rest from loading.
+def cancel_reminder(reminder_id):
+    with _cancel_lock:
+        if store.record_cancel(reminder_id):
+            cancelled_ids.add(reminder_id)
+    index_remove(reminder_id)
+
+# Function to queue stored reminders loaded from the store, keyed on their ids
+def schedule_rows(rows):
+    items = [(fire_at, reminder_payload(reminder_text, recurring_type, start_at, occurrence))
+             for _, reminder_text, fire_at, recurring_type, start_at, occurrence, _ in rows]
+    scheduler.schedule_many(items, keys=[row[0] for row in rows])
+    return len(items)
+
+# Function to load the next window of stored reminders; returns when to load the one after
+def page_in_reminders(window_start):
+    window_end = window_start + PAGE_SECONDS
+    schedule_rows(store.load_window(window_end))
+    return window_end
+
+# Function to load the reminders saved by previous runs into the scheduler
+def restore_reminders():
+    window_end = datetime.now().timestamp() + PAGE_SECONDS
+    restored = schedule_rows(store.open(window_end))
+    scheduler.schedule(window_end, PAGE_IN)
+    return restored
 
 # Function to set a reminder
+@metrics.timed('set_reminder')
 def set_reminder(input_text=None):
     if not input_text:
-        speak("What do you want to be reminded about?")
+        speak("What do you want to be reminded about?", cacheable=True)
         input_text = input("Reminder: ")
     
-    reminder_text, recurring_type, time_str, date_str = parse_reminder_input(input_text)
+    try:
+        parsed = parse_reminder(input_text)
+        reminder_datetime = resolve(parsed)
+    except ValueError as e:
+        # A time that doesn't exist, e.g. "at 25"
+        print(f"Could not set the reminder: {e}")
+        speak([str(e), "Please tell me the reminder again with a valid time."], cacheable=(False, True))
+        return
+    reminder_text, recurring_type = parsed.text, parsed.recurring_type
     
-    reminder_date = parse_date_expression(date_str)
-    reminder_time = parse_time_expression(time_str)
-    
-    if reminder_date and reminder_time:
-        reminder_datetime = datetime.combine(reminder_date, reminder_time.time())
-        
+    if reminder_datetime:
+        add_reminder(reminder_text, reminder_datetime, recurring_type)
         if recurring_type:
-            recurring_reminders.append((reminder_text, reminder_datetime.time(), recurring_type))
-            speak(f"Recurring reminder set for {reminder_datetime.strftime('%I:%M %p')} on {reminder_datetime.strftime('%B %d, %Y')} {recurring_type}")
+            speak(["Recurring reminder set for", f"{reminder_datetime.strftime('%I:%M %p')} on {reminder_datetime.strftime('%B %d, %Y')}", recurring_type],
+                  cacheable=(True, False, True))
         else:
-            reminders.append((reminder_text, reminder_datetime))
-            speak(f"Reminder set for {reminder_datetime.strftime('%I:%M %p')} on {reminder_datetime.strftime('%B %d, %Y')}")
+            speak(["Reminder set for", f"{reminder_datetime.strftime('%I:%M %p')} on {reminder_datetime.strftime('%B %d, %Y')}"],
+                  cacheable=(True, False))
     else:
-        speak("I couldn't understand the time or date. The reminder has been set for 9:00 AM today by default.")
+        speak("I couldn't understand the time or date. The reminder has been set for 9:00 AM today by default.",
+              cacheable=True)
         default_time = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0)
-        if recurring_type:
-            recurring_reminders.append((reminder_text, default_time.time(), recurring_type))
+        add_reminder(reminder_text, default_time, recurring_type)
+
+REMINDER_TRIGGER_REGEX = re.compile(
+    r"^\s*(?:please\s+)?(?:remind me(?:\s+to)?|set (?:a\s+)?reminder(?:\s+(?:to|for))?)\s+", re.IGNORECASE)
+
+# Handler for the assistant's reminder intent
+def handle_reminder_command(command):
+    set_reminder(REMINDER_TRIGGER_REGEX.sub('', command, count=1))
+
+intents.register('reminder', ['remind', 'remind me', 'reminder', 'set a reminder'], handle_reminder_command,
+                 serial=True)
+
+QUERY_WEEK_REGEX = re.compile(r"\b(this|next)\s+week\b", re.IGNORECASE)
+QUERY_ABOUT_REGEX = re.compile(r"\babout\s+(.+?)[?.!]*$", re.IGNORECASE)
+CANCEL_TRIGGER_REGEX = re.compile(r"^\s*(?:please\s+)?(?:cancel|delete|remove)\s+", re.IGNORECASE)
+MAX_LISTED = 5
+
+# Function to get the [start, end) range a query asks about, or None for "what's next"
+def query_range(command, now):
+    week = QUERY_WEEK_REGEX.search(command)
+    if week:
+        monday = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        if week.group(1).lower() == 'next':
+            monday += timedelta(weeks=1)
+        return max(monday, now), monday + timedelta(weeks=1)
+    day = temporal.extract_date(command, now.date())
+    if day is None:
+        return None
+    start = datetime.combine(day, datetime.min.time())
+    return max(start, now), start + timedelta(days=1)
+
+# Function to read out some reminders as (id, text, fire_at, recurring_type) entries
+def describe_reminders(entries, total):
+    fragments = [f"You have {total} reminder{'s' if total != 1 else ''}."]
+    for _, reminder_text, fire_at, _ in entries[:MAX_LISTED]:
+        fragments.append(f"{reminder_text} on {datetime.fromtimestamp(fire_at).strftime('%A at %I:%M %p')}.")
+    if total > MAX_LISTED:
+        fragments.append(f"And {total - MAX_LISTED} more.")
+    speak(fragments)
+
+# Handler for "what are my reminders tomorrow", "list everything next week", "reminders about rent"
+def handle_reminder_query(command):
+    index = get_index()
+    now = datetime.now()
+    about = QUERY_ABOUT_REGEX.search(command)
+    if about:
+        entries = [entry for entry in index.search(about.group(1)) if entry[2] >= now.timestamp()]
+        total = len(entries)
+    else:
+        window = query_range(command, now)
+        if window is None:
+            entries = index.upcoming(now.timestamp(), MAX_LISTED)
+            total = len(index)
+        else:
+            entries = index.between(window[0].timestamp(), window[1].timestamp())
+            total = len(entries)
+    if not entries:
+        if about:
+            speak(f"You have no reminders about {about.group(1)}.")
         else:
-            reminders.append((reminder_text, default_time))
+            speak("You have no reminders then.", cacheable=True)
+        return
+    describe_reminders(entries, total)
 
-# Function to check reminders
+# Handler for "cancel the dentist reminder": cancels the soonest reminder whose text has every word
+def handle_reminder_cancel(command):
+    description = CANCEL_TRIGGER_REGEX.sub('', command, count=1)
+    matches = get_index().search(description)
+    if not matches:
+        speak(f"I couldn't find a reminder matching {description}.")
+        return
+    reminder_id, reminder_text, fire_at, _ = matches[0]
+    cancel_reminder(reminder_id)
+    fragments = ["Cancelled the reminder", f"{reminder_text} on {datetime.fromtimestamp(fire_at).strftime('%A at %I:%M %p')}."]
+    if len(matches) > 1:
+        others = len(matches) - 1
+        fragments.append(f"{others} more like it {'is' if others == 1 else 'are'} still set.")
+    speak(fragments, cacheable=(True,) + (False,) * (len(fragments) - 1))
+
+intents.register('reminder_query', ['my reminders', 'list reminders', 'list my reminders', 'what reminders',
+                                    'reminders do i have', 'list everything', 'reminders about'],
+                 handle_reminder_query, timeout=30, serial=True)
+intents.register('reminder_cancel', ['cancel the', 'cancel my', 'delete the', 'delete my', 'remove the', 'remove my',
+                                     'cancel reminder', 'delete reminder'], handle_reminder_cancel, timeout=30,
+                 serial=True)
+
+# Function to check reminders: sleeps until the next reminder is due
 def check_reminders():
-    while True:
-        current_time = datetime.now()
-        
-        # Check one-time reminders
-        for reminder in reminders[:]:
-            reminder_text, reminder_time = reminder
-            if current_time >= reminder_time:
-                drop_message(reminder_text)
-                reminders.remove(reminder)
-        
-        # Check recurring reminders
-        for reminder in recurring_reminders:
-            reminder_text, reminder_time, recurring_type = reminder
-            if current_time.time().replace(second=0, microsecond=0) == reminder_time.replace(second=0, microsecond=0):
-                drop_message(reminder_text)
-                
-                # Schedule the next occurrence
-                if recurring_type == 'day':
-                    next_reminder = current_time.replace(hour=reminder_time.hour, minute=reminder_time.minute, second=0, microsecond=0) + timedelta(days=1)
-                elif recurring_type == 'week':
-                    next_reminder = current_time.replace(hour=reminder_time.hour, minute=reminder_time.minute, second=0, microsecond=0) + timedelta(weeks=1)
-                elif recurring_type == 'month':
-                    next_reminder = current_time.replace(hour=reminder_time.hour, minute=reminder_time.minute, second=0, microsecond=0) + timedelta(days=30)  # Approximate
-                elif recurring_type == 'year':
-                    next_reminder = current_time.replace(hour=reminder_time.hour, minute=reminder_time.minute, second=0, microsecond=0) + timedelta(days=365)  # Approximate
-                
-                reminders.append((reminder_text, next_reminder))
-        
-        time.sleep(1)  # Check every second
+    scheduler.run()
 
 # Main loop
 def main():
-    speak("Hello! How can I assist you today?")
+    speak("Hello! How can I assist you today?", cacheable=True)
+    
+    restored = restore_reminders()
+    if restored:
+        print(f"Restored {restored} pending reminder(s).")
     
     # Start the reminder checking thread
     reminder_thread = threading.Thread(target=check_reminders, daemon=True)
@@ -228,7 +307,9 @@ def main():
         command = input("Command: ")
         
         if command.lower() == "exit" or command.lower() == "stop":
-            speak("Goodbye!")
+            speak("Goodbye!", cacheable=True)
+            store.close()
+            speech.wait_until_idle()
             break
         else:
             set_reminder(command)
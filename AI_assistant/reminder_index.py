@@ -0,0 +1,172 @@
+import threading
+from bisect import bisect_left, insort
+
+from intents import tokenize
+
+# Words that say nothing about which reminder is meant
+STOP_WORDS = frozenset(['a', 'an', 'the', 'to', 'my', 'me', 'for', 'of', 'about', 'on', 'at', 'in', 'and',
+                        'reminder', 'reminders', 'remind'])
+
+
+# Function to get the searchable words of a reminder text or a query
+def index_terms(text):
+    terms = set()
+    for token in tokenize(text):
+        if token.endswith("'s"):
+            token = token[:-2]
+        if token and token not in STOP_WORDS:
+            terms.add(token)
+    return terms
+
+
+# Sorted list split into buckets of about LOAD items: inserts and removals
+# move one bucket instead of the whole list, and range scans bisect straight
+# to the first bucket that can hold the start of the range.
+class _SortedList:
+    LOAD = 1000
+
+    def __init__(self, values=()):
+        values = sorted(values)
+        self._lists = [values[i:i + self.LOAD] for i in range(0, len(values), self.LOAD)]
+        self._maxes = [bucket[-1] for bucket in self._lists]
+        self._len = len(values)
+
+    def __len__(self):
+        return self._len
+
+    def add(self, value):
+        if not self._lists:
+            self._lists.append([value])
+            self._maxes.append(value)
+        else:
+            i = bisect_left(self._maxes, value)
+            if i == len(self._maxes):
+                i -= 1
+                self._lists[i].append(value)
+                self._maxes[i] = value
+            else:
+                insort(self._lists[i], value)
+            bucket = self._lists[i]
+            if len(bucket) > 2 * self.LOAD:
+                self._lists.insert(i + 1, bucket[self.LOAD:])
+                del bucket[self.LOAD:]
+                self._maxes[i] = bucket[-1]
+                self._maxes.insert(i + 1, self._lists[i + 1][-1])
+        self._len += 1
+
+    def remove(self, value):
+        i = bisect_left(self._maxes, value)
+        if i == len(self._maxes):
+            raise ValueError(value)
+        bucket = self._lists[i]
+        j = bisect_left(bucket, value)
+        if j == len(bucket) or bucket[j] != value:
+            raise ValueError(value)
+        del bucket[j]
+        self._len -= 1
+        if not bucket:
+            del self._lists[i]
+            del self._maxes[i]
+        elif j == len(bucket):
+            self._maxes[i] = bucket[-1]
+
+    # Function to iterate over the values v with low <= v, in order
+    def iter_from(self, low):
+        i = bisect_left(self._maxes, low)
+        if i == len(self._lists):
+            return
+        bucket = self._lists[i]
+        yield from bucket[bisect_left(bucket, low):]
+        for bucket in self._lists[i + 1:]:
+            yield from bucket
+
+
+# Query layer over the pending reminders: a time-ordered index of
+# (fire_at, id) for range and next-N questions ("what are my reminders
+# tomorrow") and an inverted index from words to ids for search and
+# cancel-by-description ("cancel the dentist reminder"). Both are updated in
+# place as reminders are set, fire and are cancelled.
+class ReminderIndex:
+    def __init__(self):
+        # id -> (fire_at, text, recurring_type)
+        self.reminders = {}
+        self._times = _SortedList()
+        self._terms = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.reminders)
+
+    def __contains__(self, reminder_id):
+        return reminder_id in self.reminders
+
+    # Function to index stored rows (id, text, fire_at, recurring_type, ...) in bulk
+    def load(self, rows):
+        with self._lock:
+            for row in rows:
+                reminder_id, text, fire_at, recurring_type = row[:4]
+                self.reminders[reminder_id] = (fire_at, text, recurring_type)
+                for term in index_terms(text):
+                    self._terms.setdefault(term, set()).add(reminder_id)
+            self._times = _SortedList((fire_at, reminder_id) for reminder_id, (fire_at, _, _) in self.reminders.items())
+        return self
+
+    # Function to add a reminder, or move it to a new fire time
+    def put(self, reminder_id, text, fire_at, recurring_type=None):
+        with self._lock:
+            previous = self.reminders.get(reminder_id)
+            if previous is not None:
+                self._times.remove((previous[0], reminder_id))
+                if previous[1] != text:
+                    self._unindex_text(reminder_id, previous[1])
+            if previous is None or previous[1] != text:
+                for term in index_terms(text):
+                    self._terms.setdefault(term, set()).add(reminder_id)
+            self.reminders[reminder_id] = (fire_at, text, recurring_type)
+            self._times.add((fire_at, reminder_id))
+
+    def remove(self, reminder_id):
+        with self._lock:
+            previous = self.reminders.pop(reminder_id, None)
+            if previous is None:
+                return False
+            self._times.remove((previous[0], reminder_id))
+            self._unindex_text(reminder_id, previous[1])
+            return True
+
+    def _unindex_text(self, reminder_id, text):
+        for term in index_terms(text):
+            ids = self._terms.get(term)
+            if ids is not None:
+                ids.discard(reminder_id)
+                if not ids:
+                    del self._terms[term]
+
+    def _entry(self, reminder_id):
+        fire_at, text, recurring_type = self.reminders[reminder_id]
+        return reminder_id, text, fire_at, recurring_type
+
+    # Function to list the reminders due in [start, end) as (id, text, fire_at, recurring_type), soonest first
+    def between(self, start, end, limit=None):
+        results = []
+        with self._lock:
+            for fire_at, reminder_id in self._times.iter_from((start,)):
+                if fire_at >= end or len(results) == limit:
+                    break
+                results.append(self._entry(reminder_id))
+        return results
+
+    # Function to list the next `count` reminders due at or after `after`
+    def upcoming(self, after, count=5):
+        return self.between(after, float('inf'), count)
+
+    # Function to find the reminders whose text has every word of the query, soonest first
+    def search(self, query, limit=None):
+        terms = index_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            postings = sorted((self._terms.get(term, ()) for term in terms), key=len)
+            ids = set(postings[0]).intersection(*postings[1:])
+            results = sorted((self._entry(reminder_id) for reminder_id in ids), key=lambda entry: entry[2])
+        return results[:limit] if limit else results
@@ -0,0 +1,91 @@
+import re
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Tuple
+
+from temporal import DATE_PATTERN, FLAGS, TIME_PATTERN, date_value, resolve_date, time_value
+
+RECURRENCE_WORDS = {'day': 'day', 'daily': 'day', 'week': 'week', 'weekly': 'week',
+                    'month': 'month', 'monthly': 'month', 'year': 'year', 'yearly': 'year'}
+
+# One alternation covering every token the reminder grammar knows about, built
+# from the shared date/time fragments in temporal.py. Alternatives are tried
+# left to right at each position, so dates win over the bare numbers inside them.
+_TOKEN_RE = re.compile(rf"""
+    \b(?:
+        (?P<recurrence>every\s*(?P<every>day|week|month|year)|(?P<ly>daily|weekly|monthly|yearly))
+      | (?P<date>{DATE_PATTERN})
+      | (?P<time>{TIME_PATTERN})
+    )(?!\w)
+""", FLAGS)
+
+_SPACES_RE = re.compile(r'\s+')
+
+
+# Result of parsing one utterance. Spans index into the original text, so callers
+# can highlight or strip the matched pieces without searching for them again.
+class ParsedReminder(NamedTuple):
+    text: str
+    recurring_type: Optional[str]
+    date_str: Optional[str]
+    time_str: Optional[str]
+    recurrence_span: Optional[Tuple[int, int]]
+    date_span: Optional[Tuple[int, int]]
+    time_span: Optional[Tuple[int, int]]
+    # See temporal.date_value and temporal.time_value
+    date_value: object
+    time_value: object
+
+
+# Function to parse a reminder utterance in a single pass over the text
+def parse_reminder(input_text):
+    found = {}
+    for match in _TOKEN_RE.finditer(input_text):
+        # The category groups close last, so lastgroup names the token kind.
+        # The first token of each kind wins; later ones stay part of the text.
+        kind = match.lastgroup
+        if kind not in found:
+            found[kind] = match
+
+    pieces = []
+    position = 0
+    for match in sorted(found.values(), key=lambda m: m.start()):
+        pieces.append(input_text[position:match.start()])
+        position = match.end()
+    pieces.append(input_text[position:])
+    text = _SPACES_RE.sub(' ', ''.join(pieces)).strip()
+
+    recurrence = found.get('recurrence')
+    date = found.get('date')
+    time = found.get('time')
+    recurring_type = None
+    if recurrence:
+        recurring_type = RECURRENCE_WORDS[(recurrence.group('every') or recurrence.group('ly')).lower()]
+    return ParsedReminder(
+        text,
+        recurring_type,
+        date.group() if date else None,
+        time.group() if time else None,
+        recurrence.span() if recurrence else None,
+        date.span() if date else None,
+        time.span() if time else None,
+        date_value(date) if date else None,
+        time_value(time) if time else None
+    )
+
+
+# Function to parse a batch of utterances, e.g. when importing a reminder backlog
+def parse_many(input_texts):
+    return [parse_reminder(text) for text in input_texts]
+
+
+# Function to turn a parsed reminder into the datetime it should fire at
+def resolve(parsed, now=None):
+    now = now or datetime.now()
+    if isinstance(parsed.time_value, timedelta):
+        return now + parsed.time_value
+    reminder_date = resolve_date(parsed.date_value, now.date())
+    if reminder_date is None:
+        return None
+    # Default to 9:00 AM if no time specified
+    hour, minute = parsed.time_value or (9, 0)
+    return datetime(reminder_date.year, reminder_date.month, reminder_date.day, hour, minute)
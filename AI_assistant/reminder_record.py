@@ -0,0 +1,49 @@
+import sys
+from datetime import datetime
+
+from recurrence import RECURRENCE_TYPES, Recurrence
+
+# Recurrence codes, one per RECURRENCE_TYPES entry. Small ints are shared by
+# the interpreter, so a code costs a record nothing.
+RECURRENCE_CODES = {recurring_type: code for code, recurring_type in enumerate(RECURRENCE_TYPES, 1)}
+
+
+# A recurring reminder as the scheduler holds it. The id is the scheduler key
+# and the fire time lives in the scheduler entry; the rule is kept as (code,
+# start epoch, occurrence) and only turned into a Recurrence when it fires.
+class ReminderRecord:
+    __slots__ = ('text', 'code', 'start_at', 'occurrence')
+
+    def __init__(self, text, recurring_type, start_at, occurrence=0):
+        self.text = sys.intern(text)
+        self.code = RECURRENCE_CODES[recurring_type]
+        self.start_at = start_at
+        self.occurrence = occurrence
+
+    def __repr__(self):
+        return f"ReminderRecord({self.text!r}, {self.recurring_type!r}, {self.start_at!r}, {self.occurrence!r})"
+
+    @property
+    def recurring_type(self):
+        return RECURRENCE_TYPES[self.code - 1]
+
+    def recurrence(self):
+        return Recurrence(datetime.fromtimestamp(self.start_at), self.recurring_type, self.occurrence)
+
+    # Function to move the reminder to its first occurrence after the current
+    # one and at or after `moment`; returns that fire time
+    def advance(self, moment):
+        recurrence = self.recurrence()
+        recurrence.advance()
+        fire_at = recurrence.skip_to(moment).timestamp()
+        self.occurrence = recurrence.index
+        return fire_at
+
+
+# Function to build the scheduler payload of a pending reminder. A one-off
+# reminder is nothing but its text, interned so the same reminder set many
+# times ("take my medicine") shares one string; recurring ones get a record.
+def reminder_payload(text, recurring_type=None, start_at=None, occurrence=0):
+    if recurring_type:
+        return ReminderRecord(text, recurring_type, start_at, occurrence)
+    return sys.intern(text)
@@ -0,0 +1,344 @@
+import argparse
+import asyncio
+import collections
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from http import HTTPStatus
+
+from recurrence import RECURRENCE_TYPES, Recurrence
+from reminder_parser import parse_reminder, resolve
+from reminder_store import ReminderStore
+from scheduler import Scheduler
+
+# Reminder daemon for many users and clients. State is partitioned per user;
+# one scheduler thread sleeps until the earliest deadline across all users, and
+# every change goes through the same journal + SQLite store as reminder.py.
+#
+# HTTP API (JSON bodies, keep-alive):
+#   POST   /users/<user>/reminders              {"text", "fire_at", "recurring_type"} or {"phrase"}
+#   GET    /users/<user>/reminders              pending reminders, soonest first
+#   DELETE /users/<user>/reminders/<id>         cancel
+#   POST   /users/<user>/reminders/<id>/snooze  {"minutes"}
+#   GET    /users/<user>/fired                  recently fired reminders
+
+FIRED_HISTORY = 100
+
+
+class _Reminder:
+    __slots__ = ('id', 'user', 'text', 'fire_at', 'recurrence', 'handle')
+
+    def __init__(self, reminder_id, user, text, fire_at, recurrence=None):
+        self.id = reminder_id
+        self.user = user
+        self.text = text
+        self.fire_at = fire_at
+        self.recurrence = recurrence
+        self.handle = None
+
+    def to_json(self):
+        return {
+            'id': self.id,
+            'text': self.text,
+            'fire_at': self.fire_at,
+            'recurring_type': self.recurrence.recurring_type if self.recurrence else None
+        }
+
+
+# One user's reminders: pending ones by id, plus the recently fired ones so
+# clients can pick them up and snooze them
+class _Partition:
+    __slots__ = ('pending', 'fired')
+
+    def __init__(self):
+        self.pending = {}
+        self.fired = collections.deque(maxlen=FIRED_HISTORY)
+
+
+class ReminderService:
+    def __init__(self, store, clock=time.time):
+        self.store = store
+        self.clock = clock
+        self.users = collections.defaultdict(_Partition)
+        self.scheduler = Scheduler(self._fire, clock=clock)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.fired = 0
+
+    # Function to load every stored reminder and start the scheduler thread
+    def start(self):
+        rows = self.store.open(float('inf'))
+        with self._lock:
+            for reminder_id, text, fire_at, recurring_type, start_at, occurrence, owner in rows:
+                recurrence = None
+                if recurring_type:
+                    recurrence = Recurrence(datetime.fromtimestamp(start_at), recurring_type, occurrence)
+                reminder = _Reminder(reminder_id, owner or '', text, fire_at, recurrence)
+                self.users[reminder.user].pending[reminder_id] = reminder
+            reminders = [reminder for partition in self.users.values() for reminder in partition.pending.values()]
+            handles = self.scheduler.schedule_many((reminder.fire_at, reminder) for reminder in reminders)
+            for reminder, handle in zip(reminders, handles):
+                reminder.handle = handle
+        self._thread = threading.Thread(target=self.scheduler.run, daemon=True)
+        self._thread.start()
+        return len(rows)
+
+    def stop(self):
+        self.scheduler.stop()
+        if self._thread:
+            self._thread.join()
+        self.store.close()
+
+    def _fire(self, when, reminder, key):
+        with self._lock:
+            partition = self.users[reminder.user]
+            if partition.pending.get(reminder.id) is not reminder:
+                # Cancelled or snoozed while it was coming due
+                return None
+            self.fired += 1
+            partition.fired.append({'id': reminder.id, 'text': reminder.text, 'fired_at': when})
+            if reminder.recurrence is None:
+                del partition.pending[reminder.id]
+                self.store.record_fire(reminder.id)
+                return None
+            reminder.recurrence.advance()
+            # Skip occurrences missed while the service was down
+            reminder.fire_at = reminder.recurrence.skip_to(datetime.fromtimestamp(self.clock())).timestamp()
+            self.store.record_fire(reminder.id, reminder.fire_at, reminder.recurrence.index)
+            return reminder.fire_at
+
+    def create(self, user, text, fire_at, recurring_type=None):
+        recurrence = None
+        start_at = None
+        if recurring_type:
+            start = datetime.fromtimestamp(fire_at)
+            recurrence = Recurrence(start, recurring_type)
+            start_at = fire_at
+            fire_at = recurrence.skip_to(datetime.fromtimestamp(self.clock())).timestamp()
+        reminder = _Reminder(self.store.new_id(), user, text, fire_at, recurrence)
+        with self._lock:
+            # Recorded before it is scheduled: a reminder that is already due
+            # could otherwise fire and journal its removal ahead of its creation
+            self.store.record_set(reminder.id, text, fire_at, recurring_type, start_at,
+                                  recurrence.index if recurrence else 0, user)
+            self.users[user].pending[reminder.id] = reminder
+            reminder.handle = self.scheduler.schedule(fire_at, reminder)
+        return reminder.to_json()
+
+    def list(self, user):
+        with self._lock:
+            partition = self.users.get(user)
+            reminders = list(partition.pending.values()) if partition else []
+        return [reminder.to_json() for reminder in sorted(reminders, key=lambda reminder: reminder.fire_at)]
+
+    def list_fired(self, user):
+        with self._lock:
+            partition = self.users.get(user)
+            return list(partition.fired) if partition else []
+
+    def cancel(self, user, reminder_id):
+        with self._lock:
+            partition = self.users.get(user)
+            reminder = partition.pending.pop(reminder_id, None) if partition else None
+            if reminder is None:
+                return False
+            self.scheduler.cancel(reminder.handle)
+        self.store.record_cancel(reminder_id)
+        return True
+
+    # Function to push a reminder back by `seconds` from now. A pending one-off
+    # reminder is moved; a one-off that has just fired is brought back. A
+    # recurring series is never moved: snoozing it adds a one-off copy instead.
+    def snooze(self, user, reminder_id, seconds):
+        fire_at = self.clock() + seconds
+        with self._lock:
+            partition = self.users.get(user)
+            if partition is None:
+                return None
+            reminder = partition.pending.get(reminder_id)
+            if reminder is None:
+                fired = next((item for item in reversed(partition.fired) if item['id'] == reminder_id), None)
+                if fired is None:
+                    return None
+                text = fired['text']
+            elif reminder.recurrence is None:
+                self.scheduler.cancel(reminder.handle)
+                reminder.fire_at = fire_at
+                self.store.record_set(reminder_id, reminder.text, fire_at, owner=user)
+                reminder.handle = self.scheduler.schedule(fire_at, reminder)
+                return reminder.to_json()
+            else:
+                text = reminder.text
+                reminder_id = None
+        if reminder_id is None:
+            return self.create(user, text, fire_at)
+        reminder = _Reminder(reminder_id, user, text, fire_at)
+        with self._lock:
+            self.store.record_set(reminder_id, text, fire_at, owner=user)
+            partition.pending[reminder_id] = reminder
+            reminder.handle = self.scheduler.schedule(fire_at, reminder)
+        return reminder.to_json()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+_ROUTE_RE = re.compile(r'^/users/(?P<user>[^/]+)/(?:(?P<fired>fired)|reminders(?:/(?P<id>\d+)(?P<snooze>/snooze)?)?)/?$')
+
+
+# Function to parse a create body into (text, fire_at, recurring_type)
+def parse_create(body):
+    if 'phrase' in body:
+        try:
+            parsed = parse_reminder(str(body['phrase']))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        if not parsed.text:
+            raise HTTPError(400, "the phrase says nothing to be reminded of")
+        if parsed.time_str is None and parsed.date_str is None:
+            raise HTTPError(400, "the phrase has no date or time")
+        fire_at = resolve(parsed)
+        if fire_at is None:
+            raise HTTPError(400, f"could not work out the date '{parsed.date_str}'")
+        return parsed.text, fire_at.timestamp(), parsed.recurring_type
+    try:
+        text = str(body['text'])
+        fire_at = float(body['fire_at'])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPError(400, "expected {'text', 'fire_at'} or {'phrase'}")
+    recurring_type = body.get('recurring_type')
+    if recurring_type is not None and recurring_type not in RECURRENCE_TYPES:
+        raise HTTPError(400, f"recurring_type must be one of {', '.join(RECURRENCE_TYPES)}")
+    return text, fire_at, recurring_type
+
+
+# Function to run one API request; returns (status, payload)
+def handle_request(service, method, path, body):
+    match = _ROUTE_RE.match(path.split('?', 1)[0])
+    if not match:
+        raise HTTPError(404, "not found")
+    user = match.group('user')
+    reminder_id = int(match.group('id')) if match.group('id') else None
+
+    if match.group('fired'):
+        if method != 'GET':
+            raise HTTPError(405, "method not allowed")
+        return 200, service.list_fired(user)
+    if reminder_id is None:
+        if method == 'GET':
+            return 200, service.list(user)
+        if method == 'POST':
+            return 201, service.create(user, *parse_create(body))
+        raise HTTPError(405, "method not allowed")
+    if match.group('snooze'):
+        if method != 'POST':
+            raise HTTPError(405, "method not allowed")
+        try:
+            minutes = float(body.get('minutes', 10))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "minutes must be a number")
+        # Also turns away NaN and infinity, which would never come due
+        if not 0 < minutes < float('inf'):
+            raise HTTPError(400, "minutes must be more than 0")
+        reminder = service.snooze(user, reminder_id, minutes * 60)
+        if reminder is None:
+            raise HTTPError(404, "no such reminder")
+        return 200, reminder
+    if method == 'DELETE':
+        if not service.cancel(user, reminder_id):
+            raise HTTPError(404, "no such reminder")
+        return 200, {'cancelled': reminder_id}
+    raise HTTPError(405, "method not allowed")
+
+
+# Function to serve one client connection (HTTP/1.1 with keep-alive)
+async def serve_connection(service, reader, writer):
+    try:
+        while True:
+            # The request line and headers arrive together; read them in one go
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except asyncio.IncompleteReadError:
+                break
+            lines = head.decode('latin-1').split('\r\n')
+            try:
+                method, path, _ = lines[0].split(' ', 2)
+            except ValueError:
+                break
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            try:
+                length = headers.get('content-length') or '0'
+                if not length.isdigit():
+                    # Without a usable length the rest of the stream can't be framed
+                    headers['connection'] = 'close'
+                    raise HTTPError(400, "bad Content-Length")
+                length = int(length)
+                raw_body = await reader.readexactly(length) if length else b''
+                body = json.loads(raw_body) if raw_body else {}
+                if not isinstance(body, dict):
+                    raise HTTPError(400, "body must be a JSON object")
+                status, payload = handle_request(service, method, path, body)
+            except asyncio.IncompleteReadError:
+                # The client went away mid-body
+                raise
+            except HTTPError as e:
+                status, payload = e.status, {'error': str(e)}
+            except ValueError as e:
+                status, payload = 400, {'error': f"bad request: {e}"}
+            except Exception as e:
+                status, payload = 500, {'error': str(e)}
+
+            data = json.dumps(payload).encode()
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            writer.write(
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host='127.0.0.1', port=8765, ready=None):
+    server = await asyncio.start_server(
+        lambda reader, writer: serve_connection(service, reader, writer), host, port, backlog=1024)
+    if ready:
+        ready(server)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-user reminder service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--store', default=os.getenv("REMINDER_SERVICE_DIR", "reminder_service_data"))
+    args = parser.parse_args()
+
+    service = ReminderService(ReminderStore(args.store))
+    restored = service.start()
+    print(f"Restored {restored} reminder(s); listening on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+
+if __name__ == "__main__":
+    main()
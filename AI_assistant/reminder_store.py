@@ -0,0 +1,254 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+
+# Durable reminder storage: every change is appended to a journal (JSON lines)
+# and the journal is periodically folded into an SQLite snapshot, so a restart
+# only has to replay the short tail written since the last compaction.
+# Stored reminders are paged into memory by fire time (load_window), so startup
+# cost depends on what is due soon rather than on everything ever stored.
+#
+# Journal events:
+#   ["set", id, text, fire_at, recurring_type, start_at, occurrence, owner]
+#   ["fire", id, next_fire_at or None, occurrence]
+#   ["cancel", id]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL,
+    fire_at REAL NOT NULL,
+    recurring_type TEXT,
+    start_at REAL,
+    occurrence INTEGER NOT NULL DEFAULT 0,
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS reminders_fire_at ON reminders (fire_at);
+"""
+
+COLUMNS = 'id, text, fire_at, recurring_type, start_at, occurrence, owner'
+
+_STOP = None
+
+
+class ReminderStore:
+    def __init__(self, directory, compact_every=10000, batch_size=1024):
+        self.directory = directory
+        self._db_path = os.path.join(directory, 'reminders.sqlite3')
+        self._journal_path = os.path.join(directory, 'journal.log')
+        self._compact_every = compact_every
+        self._batch_size = batch_size
+        self._queue = queue.Queue()
+        # Events already in the journal but not yet folded into the snapshot
+        self._pending = []
+        self._id_lock = threading.Lock()
+        self._next_id = 1
+        # Ids that already live in memory: loaded by a window or created this session
+        self._resident = set()
+        self._loaded_until = float('-inf')
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._journal = None
+        self._writer = None
+        # Why the journal could not be written; the store refuses changes after that
+        self._error = None
+
+    # Function to open the store; returns the stored reminders due before `until`
+    # as (id, text, fire_at, recurring_type, start_at, occurrence, owner) rows.
+    # `owner` is None for the single-user assistant and the user id in the service.
+    def open(self, until):
+        os.makedirs(self.directory, exist_ok=True)
+        self._db = sqlite3.connect(self._db_path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        # The snapshot is only written by compaction, right before the journal is
+        # truncated, so its commit has to be on disk first
+        self._db.execute('PRAGMA synchronous=FULL')
+        self._db.executescript(SCHEMA)
+        if 'owner' not in [column[1] for column in self._db.execute('PRAGMA table_info(reminders)')]:
+            # Snapshots written before reminders had owners
+            self._db.execute('ALTER TABLE reminders ADD COLUMN owner TEXT')
+
+        # Fold whatever the last run left in the journal into the snapshot
+        self._apply(self._read_journal())
+        self._journal = open(self._journal_path, 'a', encoding='utf-8')
+        self._journal.truncate(0)
+
+        self._next_id = (self._db.execute('SELECT MAX(id) FROM reminders').fetchone()[0] or 0) + 1
+
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+        return self.load_window(until)
+
+    @property
+    def opened(self):
+        return self._writer is not None
+
+    # Function to fetch the stored reminders due before `until` that are not in memory yet
+    def load_window(self, until):
+        start = self._loaded_until
+        rows = self._select('WHERE fire_at >= ? AND fire_at < ?', (start, until))
+        self._loaded_until = until
+        with self._id_lock:
+            # Anything touched this session is already resident and its row may be stale
+            rows = [row for row in rows if row[0] not in self._resident and start <= row[2] < until]
+            self._resident.update(row[0] for row in rows)
+        return rows
+
+    # Function to fetch every stored reminder, including changes still waiting in
+    # the journal, e.g. to build a query index over all of them
+    def load_all(self):
+        return self._select()
+
+    # Function to read snapshot rows with the journal tail applied on top, so
+    # events not yet compacted (a cancel, a set) are already reflected
+    def _select(self, where='', params=()):
+        self._check_opened()
+        self.flush()
+        with self._db_lock:
+            rows = {row[0]: row for row in self._db.execute(f'SELECT {COLUMNS} FROM reminders {where}', params)}
+            # Replaying events the snapshot already has is harmless, as in _apply
+            events = list(self._pending)
+        for event in events:
+            op = event[0]
+            if op == 'set':
+                row = tuple((event + [None])[1:8])
+                rows[row[0]] = row
+            elif op == 'fire' and event[2] is not None:
+                row = rows.get(event[1])
+                if row:
+                    rows[row[0]] = row[:2] + (event[2],) + row[3:5] + (event[3],) + row[6:]
+            else:
+                rows.pop(event[1], None)
+        return list(rows.values())
+
+    def close(self):
+        if self._writer:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+            self._journal.close()
+            self._db.close()
+
+    # Function to wait until everything recorded so far is on disk; raises if
+    # the writer could not write it
+    def flush(self):
+        if self._writer:
+            done = threading.Event()
+            self._queue.put(done)
+            done.wait()
+        self._check_written()
+
+    def new_id(self):
+        with self._id_lock:
+            # Ids continue from the stored ones, which are only known once opened
+            self._check_opened()
+            reminder_id = self._next_id
+            self._next_id += 1
+            self._resident.add(reminder_id)
+        return reminder_id
+
+    # The record_* calls only enqueue; the writer thread group-commits them, so
+    # callers never wait on fsync. Using the store before open() is an error,
+    # so no event is lost and no id is handed out twice.
+    def record_set(self, reminder_id, text, fire_at, recurring_type=None, start_at=None, occurrence=0, owner=None):
+        self._record(['set', reminder_id, text, fire_at, recurring_type, start_at, occurrence, owner])
+
+    def record_fire(self, reminder_id, next_fire_at=None, occurrence=0):
+        if next_fire_at is None:
+            with self._id_lock:
+                self._resident.discard(reminder_id)
+        self._record(['fire', reminder_id, next_fire_at, occurrence])
+
+    # Function to record a cancellation; returns whether the reminder was in memory
+    def record_cancel(self, reminder_id):
+        with self._id_lock:
+            resident = reminder_id in self._resident
+            self._resident.discard(reminder_id)
+        self._record(['cancel', reminder_id])
+        return resident
+
+    def _record(self, event):
+        self._check_opened()
+        self._check_written()
+        self._queue.put(event)
+
+    def _check_opened(self):
+        if not self.opened:
+            raise RuntimeError("the reminder store has not been opened")
+
+    def _check_written(self):
+        if self._error is not None:
+            raise RuntimeError(f"the reminder journal could not be written: {self._error}") from self._error
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = _STOP in batch
+            events = [event for event in batch if isinstance(event, list)]
+            if events and self._error is None:
+                try:
+                    self._journal.write(''.join(json.dumps(event) + '\n' for event in events))
+                    self._journal.flush()
+                    # One fsync per batch (group commit)
+                    os.fsync(self._journal.fileno())
+                    self._pending.extend(events)
+                except Exception as e:
+                    # These events may be lost, so nothing more is accepted; the
+                    # callers get the error from flush() and the next record_* call
+                    print(f"Could not write the reminder journal: {e}")
+                    self._error = e
+            # Waiters are always released, whatever happened to the batch
+            for event in batch:
+                if isinstance(event, threading.Event):
+                    event.set()
+            if stopping or len(self._pending) >= self._compact_every:
+                try:
+                    self.compact()
+                except Exception as e:
+                    # The journal still holds every event; compaction is retried
+                    # after the next batch
+                    print(f"Could not compact the reminder journal: {e}")
+            if stopping:
+                return
+
+    # Function to fold the journal into the snapshot and start a fresh journal.
+    # Applying an event twice is harmless, so a crash between the snapshot commit
+    # and the truncate only means the same tail is replayed on the next start.
+    def compact(self):
+        self._apply(self._pending)
+        self._pending = []
+        self._journal.truncate(0)
+
+    def _apply(self, events):
+        with self._db_lock, self._db:
+            for event in events:
+                op = event[0]
+                if op == 'set':
+                    # Journals from before owners were recorded have one field less
+                    self._db.execute(f'INSERT OR REPLACE INTO reminders ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                     (event + [None])[1:8])
+                elif op == 'fire' and event[2] is not None:
+                    self._db.execute('UPDATE reminders SET fire_at = ?, occurrence = ? WHERE id = ?',
+                                     (event[2], event[3], event[1]))
+                else:
+                    self._db.execute('DELETE FROM reminders WHERE id = ?', (event[1],))
+
+    def _read_journal(self):
+        events = []
+        if not os.path.exists(self._journal_path):
+            return events
+        with open(self._journal_path, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # A torn write from a crash can only be the last line
+                    break
+        return events
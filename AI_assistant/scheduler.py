@@ -0,0 +1,141 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+# Min-heap scheduler keyed on the next fire time (epoch seconds).
+# The worker sleeps on a condition variable until the earliest deadline and is
+# woken early whenever an entry is pushed in front of the current head.
+#
+# Heap entries are (when, key, payload) tuples, the smallest shape that still
+# sorts in C: the key breaks ties between equal times and identifies the entry
+# for cancel(). Callers whose payloads already carry a unique non-negative int
+# id pass it as the key, which saves an int per entry; otherwise the scheduler
+# numbers entries itself with negative keys, so the two never clash.
+class Scheduler:
+    def __init__(self, on_fire, clock=time.time, max_sleep=60.0):
+        # on_fire(when, payload, key) is called outside the lock; returning a new
+        # timestamp re-queues the same payload (used for recurring reminders)
+        self._on_fire = on_fire
+        self._clock = clock
+        # Cap on a single wait so wall-clock adjustments are picked up
+        self._max_sleep = max_sleep
+        self._heap = []
+        self._counter = itertools.count(-1, -1)
+        self._cond = threading.Condition()
+        # Keys of entries cancelled while still in the heap (lazy deletion)
+        self._cancelled = set()
+        # Key of the entry whose callback is running
+        self._firing = None
+        self._live = 0
+        self._stopped = False
+
+    def __len__(self):
+        return self._live
+
+    # Function to queue a payload; returns the handle for cancel()
+    def schedule(self, when, payload, key=None):
+        entry = (when, next(self._counter) if key is None else key, payload)
+        with self._cond:
+            self._live += 1
+            self._push(entry)
+        return entry
+
+    # Function to queue many (when, payload) pairs at once, e.g. on startup;
+    # `keys` gives one key per pair when the payloads have ids
+    def schedule_many(self, items, keys=None):
+        if keys is None:
+            entries = [(when, next(self._counter), payload) for when, payload in items]
+        else:
+            entries = [(when, key, payload) for (when, payload), key in zip(items, keys)]
+        with self._cond:
+            self._heap.extend(entries)
+            heapq.heapify(self._heap)
+            self._live += len(entries)
+            self._cond.notify()
+        return entries
+
+    def _push(self, entry):
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            if self._heap[0] is entry:
+                self._cond.notify()
+
+    # Function to cancel a queued entry by its handle. The handle stays valid
+    # while a re-queued payload keeps firing; cancel only what is still queued.
+    # Returns False for an entry that already fired or was never queued. Checking
+    # the heap costs a pass per cancel but keeps no extra per-entry set.
+    def cancel(self, entry):
+        key = entry[1]
+        with self._cond:
+            if key in self._cancelled:
+                return False
+            if key != self._firing and all(queued[1] != key for queued in self._heap):
+                return False
+            # Lazy deletion: the entry is skipped when it reaches the head
+            self._cancelled.add(key)
+            self._live -= 1
+            # Rebuild once dead entries dominate so the heap doesn't leak
+            if len(self._heap) > 2 * self._live + 64:
+                cancelled = self._cancelled
+                self._heap = [e for e in self._heap if e[1] not in cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = cancelled & {self._firing}
+            self._cond.notify()
+        return True
+
+    def next_deadline(self):
+        with self._cond:
+            self._drop_cancelled()
+            return self._heap[0][0] if self._heap else None
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _drop_cancelled(self):
+        heap, cancelled = self._heap, self._cancelled
+        while heap and heap[0][1] in cancelled:
+            cancelled.discard(heapq.heappop(heap)[1])
+
+    def _next_due(self):
+        # Blocks until an entry is due; returns None once stopped
+        with self._cond:
+            while not self._stopped:
+                self._drop_cancelled()
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - self._clock()
+                if delay <= 0:
+                    entry = heapq.heappop(self._heap)
+                    self._firing = entry[1]
+                    return entry
+                self._cond.wait(min(delay, self._max_sleep))
+            return None
+
+    def run(self):
+        while True:
+            entry = self._next_due()
+            if entry is None:
+                return
+            when, key, payload = entry
+            try:
+                next_when = self._on_fire(when, payload, key)
+            except Exception as e:
+                # A failing callback drops its entry but must not stop the others
+                print(f"Scheduled callback failed: {e}")
+                next_when = None
+            with self._cond:
+                self._firing = None
+                if key in self._cancelled:
+                    # Cancelled while its callback was running
+                    self._cancelled.discard(key)
+                    continue
+                if next_when is None:
+                    self._live -= 1
+                    continue
+                # Re-queued under the same key so the caller's handle stays valid
+                self._push((next_when, key, payload))
@@ -0,0 +1,551 @@
+import contextvars
+import hashlib
+import heapq
+import itertools
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+# Aliased: the metrics() methods below would shadow the module in their class bodies
+import metrics as instrumentation
+
+# Priorities: lower is spoken first
+URGENT = 0
+NORMAL = 1
+
+# Set by the assistant core to the cancel event of the command being handled;
+# anything that command tries to say after it was cancelled is dropped
+cancelled = contextvars.ContextVar('cancelled', default=None)
+
+# Optional engine settings; they are part of the phrase cache key
+TTS_VOICE = os.getenv("ASSISTANT_TTS_VOICE")
+TTS_RATE = os.getenv("ASSISTANT_TTS_RATE")
+
+
+# Stand-in for a pyttsx3 engine so speech can run headless (ASSISTANT_TTS=stub).
+# `warmup` is the engine start-up cost and `latency` the delay before each
+# runAndWait starts producing audio.
+class StubEngine:
+    def __init__(self, seconds_per_char=0.0, warmup=0.0, latency=0.0):
+        time.sleep(warmup)
+        self.seconds_per_char = seconds_per_char
+        self.latency = latency
+        self.spoken = []
+        self.started = []
+        self._pending = []
+        self._files = []
+        self._stop = threading.Event()
+
+    def say(self, text):
+        self._pending.append(text)
+
+    def save_to_file(self, text, path):
+        self._files.append((text, path))
+
+    def runAndWait(self):
+        self._stop.clear()
+        time.sleep(self.latency)
+        for text in self._pending:
+            self.started.append(time.perf_counter())
+            if self._stop.wait(len(text) * self.seconds_per_char):
+                break
+            self.spoken.append(text)
+        # Renders silence as long as the text would take to say
+        for text, path in self._files:
+            with wave.open(path, 'wb') as audio:
+                audio.setnchannels(1)
+                audio.setsampwidth(2)
+                audio.setframerate(8000)
+                audio.writeframes(b'\0\0' * int(len(text) * self.seconds_per_char * 8000))
+        self._pending = []
+        self._files = []
+
+    # Function to cut off what is being said, like pyttsx3's engine.stop()
+    def stop(self):
+        self._stop.set()
+
+
+def create_engine():
+    if os.getenv("ASSISTANT_TTS") == "stub":
+        return StubEngine()
+    import pyttsx3
+    engine = pyttsx3.init()
+    if TTS_VOICE:
+        engine.setProperty('voice', TTS_VOICE)
+    if TTS_RATE:
+        engine.setProperty('rate', int(TTS_RATE))
+    return engine
+
+
+# Plays an audio file and returns when it has finished; stop() from another
+# thread cuts the playback short
+class CommandPlayer:
+    def __init__(self, command):
+        self.command = command
+        self._process = None
+
+    def play(self, path):
+        process = subprocess.Popen(self.command + [path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._process = process
+        try:
+            code = process.wait()
+        finally:
+            self._process = None
+        # A negative code means stop() terminated it
+        if code > 0:
+            raise subprocess.CalledProcessError(code, self.command + [path])
+
+    def stop(self):
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+
+class WinsoundPlayer:
+    def play(self, path):
+        import winsound
+        winsound.PlaySound(path, winsound.SND_FILENAME)
+
+    def stop(self):
+        import winsound
+        winsound.PlaySound(None, 0)
+
+
+# Stand-in player for headless runs: "plays" a file by waiting out its duration
+class StubPlayer:
+    def __init__(self):
+        self.played = []
+        self.started = []
+        self._stop = threading.Event()
+
+    def play(self, path):
+        self._stop.clear()
+        self.started.append(time.perf_counter())
+        with wave.open(path, 'rb') as audio:
+            if self._stop.wait(audio.getnframes() / audio.getframerate()):
+                return
+        self.played.append(path)
+
+    def stop(self):
+        self._stop.set()
+
+
+# Function to pick a player for cached phrases; None means speak through the engine only
+def create_player():
+    if os.getenv("ASSISTANT_TTS") == "stub":
+        return StubPlayer()
+    if sys.platform == 'win32':
+        return WinsoundPlayer()
+    for command in (['afplay'], ['aplay', '-q'], ['paplay']):
+        if shutil.which(command[0]):
+            return CommandPlayer(command)
+    return None
+
+
+# On-disk LRU cache of rendered phrases, keyed by text, voice and rate. Files
+# are evicted least recently played first once the cache grows past max_bytes.
+# Recency survives restarts through the file modification times.
+class PhraseCache:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, voice=TTS_VOICE, rate=TTS_RATE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.voice = voice
+        self.rate = rate
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for name in os.listdir(directory):
+            if name.endswith('.wav') and not name.endswith('.tmp.wav'):
+                stat = os.stat(os.path.join(directory, name))
+                files.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self.bytes += size
+        with self._lock:
+            self._evict()
+
+    def _key(self, text):
+        return hashlib.sha1(f"{self.voice}\0{self.rate}\0{text}".encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.wav')
+
+    # Function to get the cached rendering of a phrase, or None
+    def get(self, text):
+        key = self._key(text)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                instrumentation.count('phrase_cache_miss')
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        instrumentation.count('phrase_cache_hit')
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            # Deleted behind our back
+            with self._lock:
+                self.bytes -= self._entries.pop(key, 0)
+            return None
+        return path
+
+    # Function to render a phrase with render(text, path) and cache it; returns the path or None
+    def put(self, text, render):
+        key = self._key(text)
+        path = self._path(key)
+        temp_path = os.path.join(self.directory, key + '.tmp.wav')
+        try:
+            render(text, temp_path)
+            size = os.path.getsize(temp_path)
+        except (OSError, RuntimeError) as e:
+            print(f"Could not render phrase: {e}")
+            return None
+        if not size:
+            return None
+        os.replace(temp_path, path)
+        with self._lock:
+            self.bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+        return path
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+
+# Function to create the phrase cache for this deployment; ASSISTANT_TTS_CACHE
+# sets the directory, and an empty value turns the cache off
+def create_phrase_cache():
+    directory = os.getenv("ASSISTANT_TTS_CACHE", "tts_cache")
+    return PhraseCache(directory) if directory else None
+
+
+class _Message:
+    __slots__ = ('priority', 'seq', 'fragments', 'cacheable', 'group', 'detail', 'enqueued_at', 'done')
+
+    def __init__(self, priority, seq, fragments, cacheable, group, detail, done):
+        self.priority = priority
+        self.seq = seq
+        self.fragments = fragments
+        self.cacheable = cacheable
+        self.group = group
+        self.detail = detail
+        self.enqueued_at = time.perf_counter()
+        self.done = done
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+# Single thread that owns the TTS engine (pyttsx3 is not thread-safe).
+# Callers enqueue and return immediately; messages of the same group that arrive
+# within the coalesce window are spoken as one announcement. cancel() drops the
+# queue and also cuts off the message being spoken, so "stop" takes effect at once.
+# Text can be a list of fragments, e.g. ["Reminder set for", "5 PM"]. Fragments
+# the caller marks cacheable (fixed prompts and template parts, never times,
+# names or reminder texts) are rendered once into the phrase cache and then
+# played straight from disk; everything else goes to the engine directly.
+class SpeechWorker:
+    def __init__(self, engine_factory=create_engine, maxsize=32, coalesce_window=0.25, phrase_cache=None,
+                 player=None):
+        self._engine_factory = engine_factory
+        self.phrase_cache = phrase_cache
+        self.player = player
+        self._maxsize = maxsize
+        self._coalesce_window = coalesce_window
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._busy = False
+        # Priority of the message being spoken, and whether cancel() cut it off
+        self._speaking = None
+        self._stopping = False
+        # When the last message finished (time.monotonic())
+        self._last_spoke = None
+        self._thread = None
+        self._alive = False
+        self.engine = None
+        # Why the engine could not be created, once that has happened
+        self.failed = None
+        self.spoken = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.speech_seconds = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._alive = True
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+    # Function to queue text (a string or a list of fragments) for speech;
+    # returns False if it had to be dropped. `cacheable` is True or False for
+    # the whole text, or one flag per fragment.
+    def speak(self, text, priority=NORMAL, group=None, detail=None, wait=False, cacheable=False):
+        done = threading.Event() if wait else None
+        fragments = (text,) if isinstance(text, str) else tuple(text)
+        if isinstance(cacheable, bool):
+            cacheable = (cacheable,) * len(fragments)
+        elif len(cacheable) != len(fragments):
+            raise ValueError("cacheable needs one flag per fragment")
+        message = _Message(priority, next(self._counter), fragments, tuple(cacheable), group,
+                           detail or ' '.join(fragments), done)
+        with self._cond:
+            if self._thread is not None and not self._alive:
+                # The worker is gone; nothing would ever say this
+                self.dropped += 1
+                self._release(message)
+                return False
+            if len(self._heap) >= self._maxsize:
+                # Queue full: evict the least important message, possibly this one
+                self.dropped += 1
+                worst = max(self._heap)
+                if not message < worst:
+                    self._release(message)
+                    return False
+                self._heap.remove(worst)
+                heapq.heapify(self._heap)
+                self._release(worst)
+            heapq.heappush(self._heap, message)
+            self._cond.notify_all()
+        if done:
+            done.wait()
+        return True
+
+    # Function to drop messages less important than `keep` (by default everything
+    # but urgent ones, e.g. due reminders), including the one being spoken;
+    # returns how many queued messages were dropped
+    def cancel(self, keep=URGENT):
+        with self._cond:
+            dropped = [message for message in self._heap if message.priority > keep]
+            if dropped:
+                self._heap = [message for message in self._heap if message.priority <= keep]
+                heapq.heapify(self._heap)
+                for message in dropped:
+                    self._release(message)
+                self._cond.notify_all()
+            interrupt = self._speaking is not None and self._speaking > keep
+            if interrupt:
+                self._stopping = True
+        if interrupt:
+            self._stop_playback()
+        return len(dropped)
+
+    def _stop_playback(self):
+        for output in (self.player, self.engine):
+            stop = getattr(output, 'stop', None)
+            if stop is not None:
+                try:
+                    stop()
+                except Exception as e:
+                    print(f"Could not stop speech: {e}")
+
+    # Function to tell whether anything was being said at or after `moment`
+    # (time.monotonic()), e.g. to recognize the assistant's own voice
+    def spoke_since(self, moment):
+        with self._cond:
+            return self._busy or (self._last_spoke is not None and self._last_spoke >= moment)
+
+    # Function to block until everything queued so far has been spoken, or
+    # the worker has died
+    def wait_until_idle(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._alive or (not self._heap and not self._busy), timeout)
+
+    def metrics(self):
+        cache = self.phrase_cache.metrics() if self.phrase_cache else {}
+        with self._cond:
+            return {
+                'phrase_cache': cache,
+                'queue_depth': len(self._heap),
+                'spoken': self.spoken,
+                'dropped': self.dropped,
+                'coalesced': self.coalesced,
+                'latency_avg': self.latency_total / self.spoken if self.spoken else 0.0,
+                'latency_max': self.latency_max,
+                'speech_seconds': self.speech_seconds
+            }
+
+    def _release(self, message):
+        if message.done:
+            message.done.set()
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._heap)
+            self._busy = True
+            first = heapq.heappop(self._heap)
+            if first.group is None:
+                return [first]
+        # Give a burst a moment to arrive, then take every message of the same group
+        time.sleep(self._coalesce_window)
+        with self._cond:
+            batch = [first] + [message for message in self._heap if message.group == first.group]
+            if len(batch) > 1:
+                self._heap = [message for message in self._heap if message.group != first.group]
+                heapq.heapify(self._heap)
+        return batch
+
+    def _get_engine(self):
+        if self.engine is None:
+            if self.failed is not None:
+                # Don't retry a broken TTS install for every message
+                raise RuntimeError(f"no speech engine: {self.failed}")
+            try:
+                self.engine = self._engine_factory()
+            except Exception as e:
+                self.failed = e
+                raise
+        return self.engine
+
+    @instrumentation.timed('tts_render')
+    def _render(self, text, path):
+        engine = self._get_engine()
+        engine.save_to_file(text, path)
+        engine.runAndWait()
+
+    def _say_direct(self, fragments):
+        if self._stopping:
+            return
+        engine = self._get_engine()
+        engine.say(' '.join(fragments))
+        engine.runAndWait()
+
+    @instrumentation.timed('speak')
+    def _say(self, fragments, cacheable):
+        if self.phrase_cache is None or self.player is None:
+            self._say_direct(fragments)
+            return
+        # Runs of one-off fragments go to the engine as one utterance
+        direct = []
+        for fragment, cached in zip(fragments, cacheable):
+            if not cached:
+                direct.append(fragment)
+                continue
+            if direct:
+                self._say_direct(direct)
+                direct = []
+            if self._stopping:
+                return
+            path = self.phrase_cache.get(fragment) or self.phrase_cache.put(fragment, self._render)
+            if self._stopping:
+                return
+            if path:
+                self.player.play(path)
+            else:
+                self._say_direct([fragment])
+        if direct:
+            self._say_direct(direct)
+
+    def _run(self):
+        try:
+            self._loop()
+        finally:
+            # Whatever killed the worker, nobody may wait on it forever
+            with self._cond:
+                self._alive = False
+                self._busy = False
+                for message in self._heap:
+                    self._release(message)
+                self._heap = []
+                self._cond.notify_all()
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if len(batch) == 1:
+                fragments, cacheable = batch[0].fragments, batch[0].cacheable
+            else:
+                fragments = (f"{len(batch)} {batch[0].group}s due:",) + tuple(message.detail for message in batch)
+                cacheable = (False,) * len(fragments)
+            with self._cond:
+                self._speaking = min(message.priority for message in batch)
+            started = time.perf_counter()
+            try:
+                self._say(fragments, cacheable)
+            except Exception as e:
+                print(f"Speech failed: {e}")
+            finished = time.perf_counter()
+            with self._cond:
+                self._speaking = None
+                self._stopping = False
+                self._last_spoke = time.monotonic()
+                for message in batch:
+                    latency = started - message.enqueued_at
+                    self.latency_total += latency
+                    self.latency_max = max(self.latency_max, latency)
+                    self._release(message)
+                self.spoken += len(batch)
+                self.coalesced += len(batch) - 1
+                self.speech_seconds += finished - started
+                self._busy = False
+                self._cond.notify_all()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+# Function to get the process-wide speech worker, starting it on first use
+def get_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = SpeechWorker(phrase_cache=create_phrase_cache(), player=create_player()).start()
+    return _worker
+
+
+# Function to speak text without blocking the caller (unless wait=True).
+# Mark fixed prompts cacheable so they are rendered once and replayed from disk.
+def speak(text, priority=NORMAL, group=None, detail=None, wait=False, cacheable=False):
+    event = cancelled.get()
+    if event is not None and event.is_set():
+        return False
+    return get_worker().speak(text, priority, group, detail, wait, cacheable)
+
+
+def cancel(keep=URGENT):
+    return get_worker().cancel(keep)
+
+
+def wait_until_idle(timeout=None):
+    return get_worker().wait_until_idle(timeout)
+
+
+def spoke_since(moment):
+    return get_worker().spoke_since(moment)
@@ -0,0 +1,154 @@
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+# Shared date/time grammar used by reminder_parser.py and gcalendar.py.
+# DATE_PATTERN and TIME_PATTERN are regex fragments with named groups so callers
+# can embed them in larger grammars; date_value/time_value read those groups.
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+WEEKDAYS = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
+    'friday': 4, 'saturday': 5, 'sunday': 6
+}
+RELATIVE_DAYS = {'today': 0, 'tomorrow': 1, 'day after tomorrow': 2, 'the day after tomorrow': 2,
+                 'the next day': 2}
+NAMED_TIMES = {'noon': (12, 0), 'midnight': (0, 0), 'morning': (9, 0),
+               'afternoon': (14, 0), 'evening': (18, 0), 'night': (20, 0)}
+RELATIVE_UNITS = {'minute': 'minutes', 'hour': 'hours', 'day': 'days'}
+
+MONTH_PATTERN = r'jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?'
+WEEKDAY_PATTERN = '|'.join(WEEKDAYS)
+
+# Longer phrases come first so 'day after tomorrow' is never read as 'tomorrow'
+DATE_PATTERN = rf"""
+    (?:(?:on|for)\s+)?(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<month>{MONTH_PATTERN})
+  | (?:(?:on|for)\s+)?(?P<month_first>{MONTH_PATTERN})\s+(?P<day_after>\d{{1,2}})(?:st|nd|rd|th)?
+  | (?P<relday>(?:the\s+)?day\s+after\s+tomorrow|today|tomorrow|the\s+next\s+day)
+  | (?:(?:next|on|this)\s+)?(?P<weekday>{WEEKDAY_PATTERN})
+"""
+
+# Times with a meridiem are tried before a plain "at N"
+TIME_PATTERN = r"""
+    in\s+(?P<rel_n>\d+)\s+(?P<rel_unit>minute|hour|day)s?
+  | (?:at\s+)?(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<meridiem>[ap])\.?m\.?
+  | (?:at\s+)?(?P<oclock>\d{1,2})\s*o'clock
+  | at\s+(?P<at_hour>\d{1,2})(?::(?P<at_minute>\d{2}))?
+  | (?:at\s+)?(?P<named>noon|midnight)
+  | (?:at|in\s+the|this)\s+(?P<part>morning|afternoon|evening|night)
+  | (?P<tonight>tonight)
+"""
+
+FLAGS = re.IGNORECASE | re.VERBOSE
+
+_DATE_RE = re.compile(rf'\b(?:{DATE_PATTERN})(?!\w)', FLAGS)
+_TIME_RE = re.compile(rf'\b(?:{TIME_PATTERN})(?!\w)', FLAGS)
+_SPACES_RE = re.compile(r'\s+')
+
+
+# Function to read a date match into ('offset', days), ('date', month, day) or ('weekday', n)
+def date_value(match):
+    group = match.group
+    if group('relday'):
+        return 'offset', RELATIVE_DAYS[_SPACES_RE.sub(' ', group('relday').lower())]
+    if group('weekday'):
+        return 'weekday', WEEKDAYS[group('weekday').lower()]
+    if group('month'):
+        return 'date', MONTHS[group('month')[:3].lower()], int(group('day'))
+    return 'date', MONTHS[group('month_first')[:3].lower()], int(group('day_after'))
+
+
+# Function to check a clock time as written; raises ValueError for one that
+# doesn't exist, e.g. "at 25" or "5:75 pm"
+def _clock(hour, minute, last_hour, written):
+    if hour > last_hour or minute > 59:
+        raise ValueError(f"There is no such time as {written}.")
+    return hour, minute
+
+
+# Function to read a time match into an (hour, minute) tuple or a timedelta from now
+def time_value(match):
+    group = match.group
+    if group('rel_n'):
+        return timedelta(**{RELATIVE_UNITS[group('rel_unit').lower()]: int(group('rel_n'))})
+    if group('hour'):
+        meridiem = group('meridiem').lower()
+        hour, minute = _clock(int(group('hour')), int(group('minute') or 0), 12,
+                              f"{group('hour')}:{group('minute') or '00'} {meridiem.upper()}M")
+        return hour % 12 + (12 if meridiem == 'p' else 0), minute
+    if group('oclock'):
+        return _clock(int(group('oclock')), 0, 23, f"{group('oclock')} o'clock")
+    if group('at_hour'):
+        return _clock(int(group('at_hour')), int(group('at_minute') or 0), 23,
+                      f"{group('at_hour')}:{group('at_minute') or '00'}")
+    if group('tonight'):
+        return NAMED_TIMES['night']
+    return NAMED_TIMES[(group('named') or group('part')).lower()]
+
+
+# Function to turn a date value into a calendar date relative to today
+def resolve_date(value, today):
+    if value is None:
+        return today
+    kind = value[0]
+    if kind == 'offset':
+        return today + timedelta(days=value[1])
+    if kind == 'weekday':
+        # The next such weekday, never today
+        return today + timedelta(days=(value[1] - today.weekday() + 7) % 7 or 7)
+    _, month, day = value
+    # The next time the date comes round, today included: a date that has passed
+    # is for next year, and Feb 29 waits for a leap year (at most 8 years away).
+    # A date that never exists (31 Feb) gives None.
+    for year in range(today.year, today.year + 9):
+        try:
+            parsed_date = today.replace(year=year, month=month, day=day)
+        except ValueError:
+            continue
+        if parsed_date >= today:
+            return parsed_date
+    return None
+
+
+def normalize(text):
+    return _SPACES_RE.sub(' ', text.strip().lower())
+
+
+# Repeated commands hit this cache and skip the regex work entirely
+@lru_cache(maxsize=4096)
+def _extract(normalized_text, today):
+    date_match = _DATE_RE.search(normalized_text)
+    parsed_date = resolve_date(date_value(date_match), today) if date_match else None
+    time_match = _TIME_RE.search(normalized_text)
+    parsed_time = time_value(time_match) if time_match else None
+    return parsed_date, parsed_time
+
+
+# Function to find the first date mentioned in a text
+def extract_date(text, today=None):
+    return _extract(normalize(text), today or date.today())[0]
+
+
+# Function to find the first time mentioned in a text: (hour, minute), a timedelta or None
+def extract_time(text, today=None):
+    return _extract(normalize(text), today or date.today())[1]
+
+
+# Function to find the datetime a text refers to, defaulting the date to today
+def extract_datetime(text, now=None, default_time=None):
+    now = now or datetime.now()
+    parsed_date, parsed_time = _extract(normalize(text), now.date())
+    if isinstance(parsed_time, timedelta):
+        return now + parsed_time
+    parsed_time = parsed_time or default_time
+    if parsed_time is None:
+        return None
+    parsed_date = parsed_date or now.date()
+    return datetime(parsed_date.year, parsed_date.month, parsed_date.day, *parsed_time)
+
+
+def cache_info():
+    return _extract.cache_info()
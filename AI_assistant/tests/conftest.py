@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The assistant's modules are imported by name, as when it runs from its directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,127 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+
+from assistant_core import AssistantCore, _Turn
+from intents import IntentRouter
+
+
+# Speech module stand-in: records what is said instead of speaking it
+class FakeSpeech:
+    cancelled = contextvars.ContextVar('cancelled', default=None)
+
+    def __init__(self):
+        self.said = []
+        self.cancels = 0
+
+    def speak(self, text, **kwargs):
+        self.said.append(text)
+        return True
+
+    def cancel(self):
+        self.cancels += 1
+        return 0
+
+
+# Function to run a session over scripted commands (a callable is called for
+# its command when its turn comes); returns the core
+def run_session(router, commands, timeout=5.0):
+    script = iter(commands)
+
+    def listen():
+        try:
+            command = next(script)
+        except StopIteration:
+            raise EOFError
+        return command() if callable(command) else command
+
+    core = AssistantCore(listen, router=router, timeout=timeout, speech_module=FakeSpeech())
+    asyncio.run(asyncio.wait_for(core.run(), 10))
+    return core
+
+
+def recorder(log, name, seconds=0.0):
+    def handler(command):
+        log.append(('start', name, time.monotonic()))
+        time.sleep(seconds)
+        log.append(('end', name, time.monotonic()))
+        return name
+    return handler
+
+
+def test_serial_skills_run_in_the_order_heard():
+    log = []
+    router = IntentRouter()
+    router.register('remind', ['remind'], recorder(log, 'remind', 0.2), serial=True)
+    router.register('list', ['list'], recorder(log, 'list'), serial=True)
+    core = run_session(router, ["remind me to stretch", "list reminders"])
+    assert [(step, name) for step, name, _ in log] == [('start', 'remind'), ('end', 'remind'),
+                                                       ('start', 'list'), ('end', 'list')]
+    assert core.handled == 2
+
+
+def test_other_skills_run_side_by_side():
+    log = []
+    router = IntentRouter()
+    router.register('weather', ['weather'], recorder(log, 'weather', 0.3))
+    router.register('time', ['time'], recorder(log, 'time', 0.3))
+    started = time.monotonic()
+    run_session(router, ["weather", "time"])
+    assert time.monotonic() - started < 0.55
+
+
+def test_timed_out_serial_skill_keeps_its_place():
+    log = []
+    router = IntentRouter()
+    router.register('calendar', ['schedule'], recorder(log, 'calendar', 0.4), timeout=0.1, serial=True)
+    router.register('list', ['list'], recorder(log, 'list'), serial=True)
+    core = run_session(router, ["schedule a meeting", "list reminders"])
+    times = {(step, name): moment for step, name, moment in log}
+    assert times[('start', 'list')] >= times[('end', 'calendar')]
+    assert core.timed_out == 1
+    assert core.speech.said == ["Sorry, that is taking too long."]
+
+
+def test_exit_waits_for_running_commands():
+    log = []
+    router = IntentRouter()
+    router.register('weather', ['weather'], recorder(log, 'weather', 0.2))
+    router.register('exit', ['exit'], recorder(log, 'exit'))
+    run_session(router, ["weather", "exit", "weather"])
+    assert [(step, name) for step, name, _ in log] == [('start', 'weather'), ('end', 'weather'),
+                                                       ('start', 'exit'), ('end', 'exit')]
+
+
+def test_stop_cancels_running_commands():
+    running, release = threading.Event(), threading.Event()
+
+    def weather(command):
+        running.set()
+        release.wait(5)
+
+    router = IntentRouter()
+    router.register('weather', ['weather'], weather)
+    router.register('cancel', ['stop'], lambda command: release.set())
+    # "stop" is only said once the weather lookup is under way
+    core = run_session(router, ["weather", lambda: running.wait(5) and "stop"])
+    assert core.cancelled == 1
+    assert core.speech.cancels == 1
+
+
+def test_cancelled_turn_is_reported_as_cancelled():
+    async def scenario():
+        core = AssistantCore(lambda: '', speech_module=FakeSpeech())
+        core._loop = asyncio.get_running_loop()
+        release = threading.Event()
+        task = asyncio.ensure_future(core._handle(_Turn('weather', 'weather'), lambda command: release.wait(5), 5))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        release.set()
+        return core
+
+    assert asyncio.run(scenario()).cancelled == 1
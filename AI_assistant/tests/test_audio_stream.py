@@ -0,0 +1,138 @@
+import math
+import time
+import wave
+from array import array
+
+import pytest
+import speech_recognition as sr
+
+from audio_stream import CHUNK, SAMPLE_RATE, AudioStream, EnergyVAD, WavSource, frame_energy
+
+
+# Function to write a 16 kHz mono WAV file from (seconds, amplitude) segments of
+# a 440 Hz tone; amplitude 0 is silence
+def write_wav(path, *segments, rate=SAMPLE_RATE):
+    samples = array('h')
+    for seconds, amplitude in segments:
+        samples.extend(int(amplitude * math.sin(2 * math.pi * 440 * n / rate)) for n in range(int(seconds * rate)))
+    with wave.open(str(path), 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(rate)
+        audio.writeframes(samples.tobytes())
+    return str(path)
+
+
+# Fake recognizer: names an utterance after its loudness in thousands
+def by_loudness(audio):
+    loudest = max(abs(sample) for sample in array('h', audio.frame_data))
+    if loudest >= 9000:
+        raise sr.UnknownValueError()
+    return f"{round(loudest / 1000)}k"
+
+
+def test_frame_energy():
+    assert frame_energy(b'') == 0.0
+    assert frame_energy(array('h', [300, -300] * 4).tobytes()) == 300.0
+    assert frame_energy(array('i', [5, -5]).tobytes(), sample_width=4) == 5.0
+
+
+def test_wav_source_plays_files_in_frames_with_gaps(tmp_path):
+    first = write_wav(tmp_path / 'a.wav', (0.1, 1000))
+    second = write_wav(tmp_path / 'b.wav', (0.05, 1000))
+    source = WavSource([first, second], gap=0.1)
+    frames = []
+    while frame := source.read():
+        frames.append(frame)
+    source.close()
+    assert all(len(frame) == CHUNK * 2 for frame in frames)
+    gap = int(0.1 * SAMPLE_RATE / CHUNK)
+    # 0.1 s is 3.125 frames, padded to 4; 0.05 s to 2
+    assert len(frames) == 4 + gap + 2 + gap
+    assert frame_energy(frames[4]) == 0.0
+
+
+def test_vad_finds_utterances_and_ignores_clicks():
+    vad = EnergyVAD()
+    frame_count = lambda seconds: int(seconds * SAMPLE_RATE / CHUNK)
+
+    def feed(seconds, amplitude):
+        frame = array('h', [amplitude, -amplitude] * (CHUNK // 2)).tobytes()
+        return [speech for speech in (vad.process(frame) for _ in range(frame_count(seconds))) if speech]
+
+    assert feed(0.6, 0) == []
+    assert vad.threshold == vad.min_energy
+    utterances = feed(1.0, 2000) + feed(1.0, 0)
+    assert len(utterances) == 1
+    # The preroll and the trailing pause are part of the utterance
+    assert len(utterances[0]) // (CHUNK * 2) >= frame_count(1.0) + vad.pause_frames
+    # A 64 ms click starts the VAD but is dropped as too short
+    assert feed(0.064, 2000) + feed(1.0, 0) == []
+    # Speech longer than max_speech is cut into pieces
+    assert len(feed(16.0, 2000)) == 1 and vad.in_speech
+
+
+# Utterances end after a pause, so every file ends in silence: speech still
+# going when the audio runs out is dropped
+def test_stream_recognizes_each_file(tmp_path):
+    paths = [write_wav(tmp_path / 'quiet.wav', (0.6, 0), (0.8, 2000), (1.0, 0)),
+             write_wav(tmp_path / 'loud.wav', (0.8, 5000), (1.0, 0), (0.8, 3000), (1.0, 0))]
+    stream = AudioStream(WavSource(paths), by_loudness)
+    heard = [stream.listen(5) for _ in range(3)]
+    assert heard == ["2k", "5k", "3k"]
+    assert stream.heard_at is not None
+    with pytest.raises(EOFError):
+        stream.listen(5)
+    stream.stop()
+    assert stream.utterances == 3
+
+
+def test_recognition_errors_are_raised_by_listen(tmp_path):
+    path = write_wav(tmp_path / 'a.wav', (0.6, 0), (0.8, 9500), (1.0, 0), (0.8, 4000), (1.0, 0))
+    stream = AudioStream(WavSource([path]), by_loudness)
+    with pytest.raises(sr.UnknownValueError):
+        stream.listen(5)
+    assert stream.listen(5) == "4k"
+    stream.stop()
+
+
+def test_without_a_recognizer_listen_returns_audio(tmp_path):
+    path = write_wav(tmp_path / 'a.wav', (0.6, 0), (0.5, 2000), (1.0, 0))
+    stream = AudioStream(WavSource([path]))
+    audio = stream.listen(5)
+    stream.stop()
+    assert isinstance(audio, sr.AudioData) and audio.sample_rate == SAMPLE_RATE
+
+
+def test_files_that_do_not_match_end_the_stream(tmp_path, capsys):
+    first = write_wav(tmp_path / 'a.wav', (0.6, 0), (0.5, 2000), (1.0, 0))
+    other_rate = write_wav(tmp_path / 'b.wav', (0.5, 2000), rate=8000)
+    stream = AudioStream(WavSource([first, other_rate]), by_loudness)
+    assert stream.listen(5) == "2k"
+    with pytest.raises(EOFError):
+        stream.listen(5)
+    stream.stop()
+    assert "expected mono 16000 Hz audio" in capsys.readouterr().out
+
+
+def test_clear_drops_what_was_heard(tmp_path):
+    path = write_wav(tmp_path / 'a.wav', (0.2, 0), (0.3, 2000), (0.5, 0), (0.3, 3000), (0.5, 0))
+    stream = AudioStream(WavSource([path], realtime=True), by_loudness, EnergyVAD(calibration=0.1, pause=0.2))
+    stream.start()
+    deadline = time.monotonic() + 5
+    while stream.utterances < 1:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    stream.clear()
+    assert stream.listen(5) == "3k"
+    stream.stop()
+
+
+def test_listen_times_out_in_silence(tmp_path):
+    path = write_wav(tmp_path / 'a.wav', (3.0, 0))
+    stream = AudioStream(WavSource([path], realtime=True), by_loudness)
+    started = time.monotonic()
+    with pytest.raises(sr.WaitTimeoutError):
+        stream.listen(0.3)
+    assert time.monotonic() - started < 1
+    stream.stop()
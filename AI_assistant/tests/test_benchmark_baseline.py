@@ -0,0 +1,23 @@
+from benchmarks.bench_hotpaths import compare
+
+BASELINE = {'throughput': 1000.0, 'p50': 0.001, 'p99': 0.01, 'peak': 0}
+
+
+def stats(throughput, p50, p99=0.01):
+    return {'throughput': throughput, 'p50': p50, 'p99': p99, 'peak': 0}
+
+
+def test_within_tolerance_is_not_a_regression():
+    speed, median, tail, regressed = compare(stats(900.0, 0.0011), BASELINE)
+    assert (round(speed, 2), round(median, 2), tail) == (0.9, 1.1, 1.0)
+    assert not regressed
+
+
+def test_lower_throughput_or_slower_median_regresses():
+    assert compare(stats(700.0, 0.001), BASELINE)[3]
+    assert compare(stats(1000.0, 0.0013), BASELINE)[3]
+    assert not compare(stats(700.0, 0.001), BASELINE, tolerance=0.5)[3]
+
+
+def test_tail_latency_is_not_judged():
+    assert not compare(stats(1000.0, 0.001, p99=0.1), BASELINE)[3]
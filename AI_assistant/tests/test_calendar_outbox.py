@@ -0,0 +1,115 @@
+import threading
+
+from calendar_outbox import CalendarOutbox, SENT, RETRY, FAILED
+
+
+# A fake Calendar API: answers each batch with the next scripted outcome (or
+# SENT once the script runs out) and remembers every body it was sent
+class FakeCalendar:
+    def __init__(self, *script):
+        self.script = list(script)
+        self.received = []
+        self.stored = {}
+
+    def send(self, bodies):
+        self.received.append([body['id'] for body in bodies])
+        outcome = self.script.pop(0) if self.script else SENT
+        if isinstance(outcome, Exception):
+            raise outcome
+        results = []
+        for body in bodies:
+            if outcome == SENT and body['id'] in self.stored:
+                results.append((SENT, '409 already exists'))
+            else:
+                if outcome == SENT:
+                    self.stored[body['id']] = body
+                results.append((outcome, f"{outcome} {body['summary']}"))
+        return results
+
+
+def make_outbox(tmp_path, calendar, **options):
+    options.setdefault('base_delay', 0.01)
+    options.setdefault('max_delay', 0.05)
+    return CalendarOutbox(str(tmp_path / 'outbox.db'), calendar.send, **options).open()
+
+
+def test_queued_events_are_sent_in_batches(tmp_path):
+    calendar = FakeCalendar()
+    gate = threading.Event()
+    send = calendar.send
+    # Hold the first batch until all five events are queued
+    calendar.send = lambda bodies: gate.wait() and send(bodies)
+    outbox = make_outbox(tmp_path, calendar, batch_size=2)
+    ids = [outbox.enqueue({'summary': f"event {n}"}) for n in range(5)]
+    gate.set()
+    assert outbox.wait(5)
+    outbox.stop()
+    assert sorted(calendar.stored) == sorted(ids)
+    assert all(len(batch) <= 2 for batch in calendar.received)
+    assert outbox.sent == 5 and len(outbox) == 0
+
+
+def test_unreachable_api_is_retried_with_the_same_ids(tmp_path):
+    calendar = FakeCalendar(ConnectionError("offline"), RETRY)
+    sent = []
+    outbox = make_outbox(tmp_path, calendar, on_sent=lambda: sent.append(True))
+    event_id = outbox.enqueue({'summary': "dentist"})
+    assert outbox.wait(5)
+    outbox.stop()
+    assert calendar.received == [[event_id]] * 3
+    assert list(calendar.stored) == [event_id]
+    assert sent == [True]
+
+
+def test_refused_events_are_kept_aside(tmp_path):
+    calendar = FakeCalendar(FAILED)
+    refused = []
+    outbox = make_outbox(tmp_path, calendar, on_failed=lambda body, message: refused.append(message))
+    event_id = outbox.enqueue({'summary': "bad event"})
+    assert outbox.wait(5)
+    assert outbox.failures() == [(event_id, {'summary': "bad event", 'id': event_id}, "failed bad event")]
+    assert outbox.pending() == []
+    outbox.stop()
+    assert refused == ["failed bad event"]
+    assert outbox.failed == 1 and calendar.stored == {}
+
+
+def test_queued_events_survive_a_restart(tmp_path):
+    offline = FakeCalendar(*[RETRY] * 1000)
+    outbox = make_outbox(tmp_path, offline, base_delay=60, max_delay=60)
+    first = outbox.enqueue({'summary': "call mom"})
+    second = outbox.enqueue({'summary': "pay rent"})
+    assert not outbox.wait(0.1)
+    outbox.stop()
+
+    calendar = FakeCalendar()
+    outbox = make_outbox(tmp_path, calendar)
+    assert outbox.wait(5)
+    outbox.stop()
+    assert sorted(calendar.stored) == sorted([first, second])
+
+
+def test_enqueueing_the_same_id_twice_sends_it_once(tmp_path):
+    calendar = FakeCalendar()
+    gate = threading.Event()
+    send = calendar.send
+    calendar.send = lambda bodies: gate.wait() and send(bodies)
+    outbox = make_outbox(tmp_path, calendar)
+    outbox.enqueue({'id': 'abc', 'summary': "standup"})
+    outbox.enqueue({'id': 'abc', 'summary': "standup"})
+    assert len(outbox) == 1
+    gate.set()
+    assert outbox.wait(5)
+    outbox.stop()
+    assert calendar.received == [['abc']]
+
+
+def test_flush_skips_the_backoff(tmp_path):
+    calendar = FakeCalendar(RETRY)
+    outbox = make_outbox(tmp_path, calendar, base_delay=60, max_delay=60)
+    outbox.enqueue({'summary': "review"})
+    assert not outbox.wait(0.2)
+    outbox.flush()
+    assert outbox.wait(5)
+    outbox.stop()
+    assert len(calendar.received) == 2
@@ -0,0 +1,122 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from event_index import EventIndex
+
+DAY = datetime(2024, 6, 12)
+
+
+def event(event_id, start_hour, hours=1, summary='', status='confirmed'):
+    start = DAY + timedelta(hours=start_hour)
+    return {'id': event_id, 'status': status, 'summary': summary,
+            'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': (start + timedelta(hours=hours)).isoformat()}}
+
+
+# Stand-in for the Calendar service: list() answers from `pages` (a list of
+# responses per call), raises 410 for an expired token, and can hold every
+# call until `release` is set
+class FakeService:
+    def __init__(self, *calls, expired=(), release=None):
+        self.calls = list(calls)
+        self.expired = set(expired)
+        self.release = release
+        self.params = []
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.params.append(params)
+        return self
+
+    def execute(self):
+        if self.release is not None:
+            self.release.wait(5)
+        if self.params[-1].get('syncToken') in self.expired:
+            raise HttpError(httplib2.Response({'status': 410}), b'gone')
+        return self.calls.pop(0)
+
+
+def ids(index, start_hour, end_hour):
+    return sorted(found[0] for found in index.overlapping(DAY + timedelta(hours=start_hour),
+                                                          DAY + timedelta(hours=end_hour)))
+
+
+def test_overlap_and_free_slots(tmp_path):
+    index = EventIndex(str(tmp_path / 'cache.json'))
+    for item in [event('standup', 9), event('offsite', 10, hours=5), event('lunch', 13)]:
+        index.apply(item)
+    assert ids(index, 9.5, 10.5) == ['offsite', 'standup']
+    # The long offsite still reaches a window that starts long after it began
+    assert ids(index, 14, 14.5) == ['offsite']
+    assert index.is_free(DAY + timedelta(hours=16), DAY + timedelta(hours=17))
+    assert index.busy((DAY + timedelta(hours=8)).timestamp(), (DAY + timedelta(hours=16)).timestamp()) == [
+        ((DAY + timedelta(hours=9)).timestamp(), (DAY + timedelta(hours=15)).timestamp())]
+    assert index.next_free_slot(timedelta(hours=1), DAY + timedelta(hours=9)) == DAY + timedelta(hours=15)
+
+
+def test_cancelled_events_are_removed(tmp_path):
+    index = EventIndex(str(tmp_path / 'cache.json'))
+    index.apply(event('standup', 9))
+    index.apply(event('standup', 9, status='cancelled'))
+    assert len(index) == 0 and ids(index, 0, 24) == []
+
+
+def test_incremental_sync_keeps_its_token_on_disk(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    index = EventIndex(path)
+    service = FakeService({'items': [event('standup', 9)], 'nextPageToken': 'p2'},
+                          {'items': [event('lunch', 13)], 'nextSyncToken': 't1'},
+                          {'items': [event('standup', 9, status='cancelled')], 'nextSyncToken': 't2'})
+    assert index.sync(service) == 2
+    assert index.sync(service) == 1
+    assert service.params[-1]['syncToken'] == 't1'
+
+    reloaded = EventIndex(path).load()
+    assert reloaded.sync_token == 't2' and ids(reloaded, 0, 24) == ['lunch']
+
+
+def test_sync_without_changes_does_not_rewrite_the_cache(tmp_path):
+    path = tmp_path / 'cache.json'
+    index = EventIndex(str(path))
+    assert index.sync(FakeService({'items': [], 'nextSyncToken': 't1'})) == 0
+    assert not path.exists()
+
+
+def test_expired_token_resyncs_and_keeps_queued_events(tmp_path):
+    index = EventIndex(str(tmp_path / 'cache.json'))
+    index.sync_token = 'old'
+    index.apply(event('deleted elsewhere', 9))
+    index.apply(event('queued', 11))
+    service = FakeService({'items': [event('lunch', 13)], 'nextSyncToken': 'fresh'}, expired={'old'})
+    assert index.sync(service, pending=lambda: [event('queued', 11)]) == 1
+    assert ids(index, 0, 24) == ['lunch', 'queued']
+    assert index.sync_token == 'fresh'
+
+
+def test_queries_do_not_wait_for_the_network(tmp_path):
+    index = EventIndex(str(tmp_path / 'cache.json'))
+    index.apply(event('standup', 9))
+    release = threading.Event()
+    service = FakeService({'items': [event('lunch', 13)], 'nextSyncToken': 't1'}, release=release)
+    syncing = threading.Thread(target=index.sync, args=(service,))
+    syncing.start()
+    try:
+        time.sleep(0.05)
+        started = time.perf_counter()
+        assert ids(index, 0, 24) == ['standup']
+        assert time.perf_counter() - started < 0.5
+    finally:
+        release.set()
+        syncing.join(5)
+    assert ids(index, 0, 24) == ['lunch', 'standup']
+
+
+def test_damaged_cache_is_ignored(tmp_path):
+    path = tmp_path / 'cache.json'
+    path.write_text('{"events": ')
+    assert len(EventIndex(str(path)).load()) == 0
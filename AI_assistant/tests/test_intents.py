@@ -0,0 +1,72 @@
+from intents import IntentRouter
+
+
+def make_router():
+    router = IntentRouter()
+    router.register('weather', ['weather', 'temperature'], lambda command: 'weather')
+    router.register('time', ['what time', 'time'], lambda command: 'time')
+    router.register('reminder', ['remind me', 'reminder'], lambda command: 'reminder')
+    router.register('exit', ['exit', 'bye'], lambda command: 'exit')
+    return router
+
+
+def name(route):
+    intent, _ = route
+    return intent.name if intent else None
+
+
+def test_routes_on_trigger_phrases():
+    router = make_router()
+    assert name(router.route("what is the weather in pune")) == 'weather'
+    assert name(router.route("Remind me to call mom")) == 'reminder'
+    assert name(router.route("ok bye")) == 'exit'
+
+
+def test_longer_phrases_outweigh_single_keywords():
+    router = make_router()
+    # 'what time' scores two words against the one of 'weather'
+    assert name(router.route("what time is the weather update")) == 'time'
+
+
+def test_phrase_found_inside_another_match():
+    router = IntentRouter()
+    router.register('alarm', ['set an alarm'], lambda command: None)
+    router.register('clock', ['an alarm clock'], lambda command: None, weight=2.0)
+    # 'an alarm clock' is only found through the failure link out of 'set an alarm'
+    intent, score = router.route("set an alarm clock")
+    assert intent.name == 'clock' and score == 6
+    assert name(router.route("set an alarm")) == 'alarm'
+
+
+def test_ties_go_to_the_first_registered():
+    router = IntentRouter()
+    router.register('first', ['hello'], lambda command: None)
+    router.register('second', ['hello'], lambda command: None)
+    assert name(router.route("hello there")) == 'first'
+
+
+def test_weight_scales_the_score():
+    router = IntentRouter()
+    router.register('light', ['lights'], lambda command: None)
+    router.register('music', ['play'], lambda command: None, weight=2.0)
+    assert name(router.route("play with the lights")) == 'music'
+
+
+def test_no_match():
+    assert make_router().route("tell me a joke") == (None, 0)
+
+
+def test_dispatch_runs_the_handler_or_the_default():
+    router = make_router()
+    assert router.dispatch("set a reminder") == ('reminder', 'reminder')
+    assert router.dispatch("tell me a joke", default=lambda command: command.upper()) == (None, "TELL ME A JOKE")
+    assert router.dispatch("tell me a joke") == (None, None)
+
+
+def test_registering_later_rebuilds_the_automaton():
+    router = make_router()
+    assert name(router.route("tell me a joke")) is None
+    router.register('joke', ['joke'], lambda command: 'joke', timeout=5, serial=True)
+    intent, _ = router.route("tell me a joke")
+    assert intent.name == 'joke' and intent.timeout == 5 and intent.serial
+    assert len(router) == 5
@@ -0,0 +1,130 @@
+import json
+import os
+import pstats
+import subprocess
+import sys
+import time
+
+import pytest
+
+import metrics
+from metrics import BUCKETS, Histogram, Registry
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram()
+    assert histogram.quantile(0.5) == 0.0
+    for seconds in (0.0001, 0.0002, 0.003, 0.003, 60.0):
+        histogram.observe(seconds)
+    assert histogram.count == 5 and histogram.sum == pytest.approx(60.0063)
+    # Values on a bound fall in that bucket; past the last one they overflow
+    assert histogram.counts[0] == 1 and histogram.counts[1] == 1 and histogram.counts[3] == 2
+    assert histogram.counts[-1] == 1
+    assert histogram.quantile(0.5) == 0.005
+    assert histogram.quantile(0.99) == float('inf')
+
+
+def test_registry_timers_and_counters():
+    registry = Registry()
+
+    @registry.timed('parse')
+    def parse(text):
+        if not text:
+            raise ValueError("empty")
+        return text.upper()
+
+    assert parse("hi") == "HI" and parse.__name__ == 'parse'
+    with pytest.raises(ValueError):
+        parse("")
+    with registry.timer('sleep'):
+        time.sleep(0.01)
+    registry.count('hit')
+    registry.count('hit', 2)
+    # Failed calls are timed too
+    assert registry.stages['parse'].count == 2
+    assert registry.stages['sleep'].sum >= 0.01
+    assert registry.events == {'hit': 3}
+
+
+def test_prometheus_output():
+    registry = Registry()
+    registry.observe('recognize', 0.3)
+    registry.observe('recognize', 0.0003)
+    registry.count('weather_cache_hit')
+    lines = registry.prometheus().splitlines()
+    assert lines[0] == "# TYPE assistant_stage_seconds histogram"
+    assert 'assistant_stage_seconds_bucket{stage="recognize",le="0.0001"} 0' in lines
+    assert 'assistant_stage_seconds_bucket{stage="recognize",le="0.0005"} 1' in lines
+    assert 'assistant_stage_seconds_bucket{stage="recognize",le="0.5"} 2' in lines
+    assert 'assistant_stage_seconds_bucket{stage="recognize",le="+Inf"} 2' in lines
+    assert 'assistant_stage_seconds_count{stage="recognize"} 2' in lines
+    assert lines[-2:] == ["# TYPE assistant_events_total counter",
+                          'assistant_events_total{event="weather_cache_hit"} 1']
+
+
+def test_dump_writes_prometheus_or_appends_json_lines(tmp_path):
+    registry = Registry()
+    registry.observe('speak', 1.5)
+    registry.count('reminder_fired', 4)
+    registry.dump(str(tmp_path / 'metrics.prom'))
+    registry.dump(str(tmp_path / 'metrics.prom'))
+    assert (tmp_path / 'metrics.prom').read_text() == registry.prometheus()
+
+    registry.dump(str(tmp_path / 'metrics.jsonl'))
+    registry.dump(str(tmp_path / 'metrics.jsonl'))
+    records = [json.loads(line) for line in (tmp_path / 'metrics.jsonl').read_text().splitlines()]
+    assert len(records) == 4
+    stage, event = records[:2]
+    assert (stage['stage'], stage['count'], stage['p50'], stage['buckets']['2.5']) == ('speak', 1, 2.5, 1)
+    assert len(stage['buckets']) == len(BUCKETS) + 1
+    assert (event['event'], event['value']) == ('reminder_fired', 4)
+
+
+# Function to run a snippet in a fresh interpreter, where ASSISTANT_METRICS is read at import
+def run_python(code, **env):
+    environment = dict(os.environ, **env)
+    return subprocess.run([sys.executable, '-c', code], cwd=APP_DIR, env=environment, capture_output=True,
+                          text=True, check=True, timeout=60).stdout
+
+
+def test_disabled_metrics_cost_nothing():
+    output = run_python(
+        "import metrics\n"
+        "def f(): pass\n"
+        "print(metrics.registry, metrics.timed('x')(f) is f, metrics.timer('x') is metrics.timer('y'))\n",
+        ASSISTANT_METRICS='0')
+    assert output.split() == ['None', 'True', 'True']
+
+
+def test_enabled_metrics_are_written_at_exit(tmp_path):
+    path = tmp_path / 'metrics.prom'
+    run_python("import metrics\nmetrics.count('started')\nwith metrics.timer('boot'): pass\n",
+               ASSISTANT_METRICS='1', ASSISTANT_METRICS_FILE=str(path))
+    text = path.read_text()
+    assert 'assistant_events_total{event="started"} 1' in text
+    assert 'assistant_stage_seconds_count{stage="boot"} 1' in text
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_profile_writes_cprofile_stats(tmp_path):
+    path = str(tmp_path / 'command.prof')
+    with metrics.profile(path):
+        busy(0.05)
+    functions = {function for _, _, function in pstats.Stats(path).stats}
+    assert 'busy' in functions
+
+
+def test_profile_writes_collapsed_stacks(tmp_path):
+    path = tmp_path / 'command.folded'
+    with metrics.profile(str(path)):
+        busy(0.2)
+    lines = path.read_text().splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any('MainThread;' in line and 'busy (test_metrics.py:' in line for line in lines)
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+
+from recurrence import Recurrence, add_months, nth_occurrence, occurrence_index
+
+
+def test_fixed_steps():
+    start = datetime(2024, 6, 12, 9, 0)
+    assert nth_occurrence(start, 'day', 3) == datetime(2024, 6, 15, 9, 0)
+    assert nth_occurrence(start, 'week', 2) == datetime(2024, 6, 26, 9, 0)
+
+
+def test_month_end_is_clamped_without_drifting():
+    start = datetime(2024, 1, 31, 8, 30)
+    assert [nth_occurrence(start, 'month', n) for n in range(4)] == [
+        datetime(2024, 1, 31, 8, 30), datetime(2024, 2, 29, 8, 30),
+        datetime(2024, 3, 31, 8, 30), datetime(2024, 4, 30, 8, 30)]
+
+
+def test_leap_day_yearly():
+    start = datetime(2024, 2, 29)
+    assert nth_occurrence(start, 'year', 1) == datetime(2025, 2, 28)
+    assert nth_occurrence(start, 'year', 4) == datetime(2028, 2, 29)
+
+
+def test_add_months_across_years():
+    assert add_months(datetime(2024, 11, 30), 3) == datetime(2025, 2, 28)
+    assert add_months(datetime(2024, 3, 15), -3) == datetime(2023, 12, 15)
+
+
+@pytest.mark.parametrize('recurring_type', ['day', 'week', 'month', 'year'])
+def test_occurrence_index_is_first_at_or_after(recurring_type):
+    start = datetime(2024, 1, 31, 9, 0)
+    for moment in [datetime(2023, 1, 1), start, datetime(2024, 3, 1), datetime(2024, 3, 31, 9, 0),
+                   datetime(2031, 7, 4, 12, 0)]:
+        n = occurrence_index(start, recurring_type, moment)
+        assert nth_occurrence(start, recurring_type, n) >= moment
+        assert n == 0 or nth_occurrence(start, recurring_type, n - 1) < moment
+
+
+def test_unknown_type_is_rejected():
+    with pytest.raises(ValueError):
+        Recurrence(datetime(2024, 1, 1), 'fortnight')
+    with pytest.raises(ValueError):
+        nth_occurrence(datetime(2024, 1, 1), 'fortnight', 1)
+
+
+def test_advance_and_skip_to():
+    recurrence = Recurrence(datetime(2024, 6, 12, 9, 0), 'week')
+    assert recurrence.advance() == datetime(2024, 6, 19, 9, 0)
+    assert recurrence.skip_to(datetime(2024, 7, 1)) == datetime(2024, 7, 3, 9, 0)
+    # Never moves backwards
+    assert recurrence.skip_to(datetime(2024, 1, 1)) == datetime(2024, 7, 3, 9, 0)
+    assert recurrence.index == 3
+
+
+def test_iterates_from_the_current_occurrence():
+    recurrence = Recurrence(datetime(2024, 6, 12), 'day', index=2)
+    occurrences = iter(recurrence)
+    assert [next(occurrences) for _ in range(2)] == [datetime(2024, 6, 14), datetime(2024, 6, 15)]
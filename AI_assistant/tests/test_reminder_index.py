@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from reminder_index import ReminderIndex, _SortedList, index_terms
+
+DAY = 86400.0
+
+
+def test_index_terms_drop_stop_words_and_possessives():
+    assert index_terms("Remind me to call Mom's dentist about the bill") == {'call', 'mom', 'dentist', 'bill'}
+    assert index_terms("the reminder for a") == set()
+
+
+def test_sorted_list_matches_a_plain_sorted_list(monkeypatch):
+    # Tiny buckets so splits and emptied buckets happen often
+    monkeypatch.setattr(_SortedList, 'LOAD', 4)
+    rng = random.Random(7)
+    values = [rng.randrange(1000) for _ in range(50)]
+    sorted_list = _SortedList(values)
+    expected = sorted(values)
+    for _ in range(2000):
+        if expected and rng.random() < 0.45:
+            value = rng.choice(expected)
+            sorted_list.remove(value)
+            expected.remove(value)
+        else:
+            value = rng.randrange(1000)
+            sorted_list.add(value)
+            expected.append(value)
+            expected.sort()
+        low = rng.randrange(1000)
+        assert list(sorted_list.iter_from(low)) == [v for v in expected if v >= low]
+        assert len(sorted_list) == len(expected)
+    assert all(len(bucket) <= 8 for bucket in sorted_list._lists)
+
+
+def test_sorted_list_remove_missing_value():
+    sorted_list = _SortedList([1, 3])
+    for missing in (0, 2, 4):
+        with pytest.raises(ValueError):
+            sorted_list.remove(missing)
+    assert list(sorted_list.iter_from(0)) == [1, 3]
+
+
+@pytest.fixture
+def index():
+    return ReminderIndex().load([
+        (1, "call mom", 3 * DAY, None, None, 0, None),
+        (2, "dentist appointment", 1 * DAY, None, None, 0, None),
+        (3, "pay the rent", 2 * DAY, 'month', 2 * DAY, 0, None),
+        (4, "call the dentist back", 2 * DAY + 60, None, None, 0, None),
+    ])
+
+
+def test_between_and_upcoming(index):
+    assert index.between(2 * DAY, 3 * DAY) == [(3, "pay the rent", 2 * DAY, 'month'),
+                                               (4, "call the dentist back", 2 * DAY + 60, None)]
+    assert [entry[0] for entry in index.upcoming(0, 3)] == [2, 3, 4]
+    assert [entry[0] for entry in index.upcoming(2 * DAY + 1)] == [4, 1]
+    assert index.between(4 * DAY, 5 * DAY) == []
+
+
+def test_search_needs_every_word(index):
+    assert [entry[0] for entry in index.search("dentist")] == [2, 4]
+    assert [entry[0] for entry in index.search("the call about the dentist")] == [4]
+    assert [entry[0] for entry in index.search("call", limit=1)] == [4]
+    assert index.search("plumber") == []
+    assert index.search("the") == []
+
+
+def test_put_moves_and_renames(index):
+    index.put(2, "dentist appointment", 5 * DAY)
+    assert [entry[0] for entry in index.upcoming(0)] == [3, 4, 1, 2]
+    index.put(1, "call dad", 3 * DAY)
+    assert index.search("mom") == []
+    assert [entry[0] for entry in index.search("call dad")] == [1]
+    index.put(9, "water plants", 0.5 * DAY, 'day')
+    assert index.upcoming(0, 1) == [(9, "water plants", 0.5 * DAY, 'day')]
+    assert len(index) == 5 and 9 in index
+
+
+def test_remove(index):
+    assert index.remove(4)
+    assert not index.remove(4)
+    assert 4 not in index
+    assert [entry[0] for entry in index.search("dentist")] == [2]
+    assert [entry[0] for entry in index.between(2 * DAY, 3 * DAY)] == [3]
+    # Terms nobody uses any more are dropped
+    assert 'back' not in index._terms
@@ -0,0 +1,64 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import temporal
+from reminder_parser import parse_reminder, resolve
+
+# Wednesday 12 June 2024
+NOW = datetime(2024, 6, 12, 8, 0)
+
+
+def test_splits_text_date_time_and_recurrence():
+    text = "call mom every week on friday at 5 pm"
+    parsed = parse_reminder(text)
+    assert parsed.text == "call mom"
+    assert parsed.recurring_type == 'week'
+    assert parsed.date_str == "on friday"
+    assert parsed.time_str == "at 5 pm"
+    assert text[slice(*parsed.time_span)] == "at 5 pm"
+    assert text[slice(*parsed.date_span)] == "on friday"
+    assert resolve(parsed, NOW) == datetime(2024, 6, 14, 17, 0)
+
+
+@pytest.mark.parametrize('phrase, expected', [
+    ("water the plants tomorrow at 9:30am", datetime(2024, 6, 13, 9, 30)),
+    ("pay rent on 1st july at noon", datetime(2024, 7, 1, 12, 0)),
+    ("dentist march 3 at 4 p.m.", datetime(2025, 3, 3, 16, 0)),
+    ("stand up at 10", datetime(2024, 6, 12, 10, 0)),
+    ("read tonight", datetime(2024, 6, 12, 20, 0)),
+    ("stretch in 20 minutes", NOW + timedelta(minutes=20)),
+    # No time given: 9:00 AM on the day
+    ("renew passport the day after tomorrow", datetime(2024, 6, 14, 9, 0)),
+])
+def test_resolves_fire_time(phrase, expected):
+    assert resolve(parse_reminder(phrase), NOW) == expected
+
+
+def test_daily_word_forms():
+    assert parse_reminder("take my medicine daily at 8 am").recurring_type == 'day'
+    assert parse_reminder("review budget monthly").recurring_type == 'month'
+
+
+def test_nothing_recognised():
+    parsed = parse_reminder("buy milk")
+    assert parsed.text == "buy milk"
+    assert parsed.date_value is None and parsed.time_value is None and parsed.recurring_type is None
+
+
+def test_impossible_date_does_not_resolve():
+    assert resolve(parse_reminder("party on 31 june"), NOW) is None
+
+
+@pytest.mark.parametrize('phrase', ["call mom at 25", "call mom at 7:80", "call mom at 13 pm", "at 5:75 pm"])
+def test_impossible_times_are_rejected(phrase):
+    with pytest.raises(ValueError):
+        parse_reminder(phrase)
+
+
+def test_temporal_extracts_from_free_text():
+    today = date(2024, 6, 12)
+    assert temporal.extract_date("schedule a meeting with john next monday at 3 pm", today) == date(2024, 6, 17)
+    assert temporal.extract_time("schedule a meeting with john next monday at 3 pm", today) == (15, 0)
+    assert temporal.extract_datetime("lunch tomorrow at noon", datetime(2024, 6, 12, 8, 0)) == \
+        datetime(2024, 6, 13, 12, 0)
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from reminder_service import HTTPError, ReminderService, handle_request, serve
+from reminder_store import ReminderStore
+
+NOW = 1_800_000_000.0
+HOUR = 3600.0
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = ReminderService(ReminderStore(tmp_path), clock=lambda: NOW)
+    service.start()
+    yield service
+    service.stop()
+
+
+def request(service, method, path, body=None):
+    return handle_request(service, method, path, body or {})
+
+
+def error(service, method, path, body=None):
+    with pytest.raises(HTTPError) as raised:
+        request(service, method, path, body)
+    return raised.value.status
+
+
+# Function to wait for the scheduler thread to fire `count` reminders
+def wait_fired(service, count):
+    deadline = time.monotonic() + 5
+    while service.fired < count:
+        assert time.monotonic() < deadline, f"only {service.fired} of {count} reminders fired"
+        time.sleep(0.01)
+
+
+def test_create_list_and_cancel(service):
+    status, later = request(service, 'POST', '/users/ann/reminders', {'text': "pay rent", 'fire_at': NOW + 2 * HOUR})
+    assert status == 201 and later['text'] == "pay rent"
+    _, sooner = request(service, 'POST', '/users/ann/reminders', {'text': "call mom", 'fire_at': NOW + HOUR})
+    request(service, 'POST', '/users/bob/reminders', {'text': "bob's", 'fire_at': NOW + HOUR})
+    assert request(service, 'GET', '/users/ann/reminders') == (200, [sooner, later])
+
+    assert request(service, 'DELETE', f"/users/ann/reminders/{sooner['id']}") == (200, {'cancelled': sooner['id']})
+    assert error(service, 'DELETE', f"/users/ann/reminders/{sooner['id']}") == 404
+    # One user can't cancel another's reminder
+    assert error(service, 'DELETE', f"/users/bob/reminders/{later['id']}") == 404
+    assert request(service, 'GET', '/users/ann/reminders') == (200, [later])
+
+
+def test_create_from_a_phrase(service):
+    status, reminder = request(service, 'POST', '/users/ann/reminders',
+                               {'phrase': "remind me to water plants every day at 9am"})
+    assert status == 201
+    assert reminder['text'] == "remind me to water plants" and reminder['recurring_type'] == 'day'
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'text': "no time"},
+    {'text': "call", 'fire_at': "soon"},
+    {'text': "call", 'fire_at': NOW, 'recurring_type': 'fortnight'},
+    {'phrase': "call mom"},
+])
+def test_bad_create_bodies_are_rejected(service, body):
+    assert error(service, 'POST', '/users/ann/reminders', body) == 400
+
+
+def test_unknown_routes_and_methods(service):
+    assert error(service, 'GET', '/reminders') == 404
+    assert error(service, 'PUT', '/users/ann/reminders') == 405
+    assert error(service, 'POST', '/users/ann/fired') == 405
+    assert error(service, 'GET', '/users/ann/reminders/1/snooze') == 405
+
+
+def test_snooze_moves_a_pending_reminder(service):
+    _, reminder = request(service, 'POST', '/users/ann/reminders', {'text': "stretch", 'fire_at': NOW + HOUR})
+    status, moved = request(service, 'POST', f"/users/ann/reminders/{reminder['id']}/snooze", {'minutes': 5})
+    assert status == 200
+    assert moved == dict(reminder, fire_at=NOW + 300)
+    assert request(service, 'GET', '/users/ann/reminders') == (200, [moved])
+
+
+@pytest.mark.parametrize('minutes', [0, -5, "ten", None, float('nan'), float('inf')])
+def test_snooze_needs_a_positive_number_of_minutes(service, minutes):
+    _, reminder = request(service, 'POST', '/users/ann/reminders', {'text': "stretch", 'fire_at': NOW + HOUR})
+    assert error(service, 'POST', f"/users/ann/reminders/{reminder['id']}/snooze", {'minutes': minutes}) == 400
+    assert request(service, 'GET', '/users/ann/reminders') == (200, [reminder])
+
+
+def test_due_reminder_fires_and_can_be_snoozed_back(service):
+    _, reminder = request(service, 'POST', '/users/ann/reminders', {'text': "take pills", 'fire_at': NOW - 1})
+    wait_fired(service, 1)
+    assert request(service, 'GET', '/users/ann/reminders') == (200, [])
+    assert request(service, 'GET', '/users/ann/fired') == (
+        200, [{'id': reminder['id'], 'text': "take pills", 'fired_at': NOW - 1}])
+
+    _, snoozed = request(service, 'POST', f"/users/ann/reminders/{reminder['id']}/snooze", {'minutes': 10})
+    assert snoozed == dict(reminder, fire_at=NOW + 600)
+    assert error(service, 'POST', '/users/ann/reminders/999/snooze', {'minutes': 10}) == 404
+
+
+def test_snoozing_a_series_adds_a_one_off_copy(service):
+    _, series = request(service, 'POST', '/users/ann/reminders',
+                        {'text': "standup", 'fire_at': NOW + HOUR, 'recurring_type': 'day'})
+    _, copy = request(service, 'POST', f"/users/ann/reminders/{series['id']}/snooze", {'minutes': 15})
+    assert copy['id'] != series['id'] and copy['recurring_type'] is None
+    assert request(service, 'GET', '/users/ann/reminders') == (200, [dict(copy, fire_at=NOW + 900), series])
+
+
+def test_reminders_survive_a_restart(tmp_path):
+    service = ReminderService(ReminderStore(tmp_path), clock=lambda: NOW)
+    service.start()
+    kept = service.create('ann', "pay rent", NOW + HOUR)
+    dropped = service.create('ann', "old", NOW + HOUR)
+    service.cancel('ann', dropped['id'])
+    series = service.create('bob', "standup", NOW + 2 * HOUR, 'week')
+    service.stop()
+
+    service = ReminderService(ReminderStore(tmp_path), clock=lambda: NOW)
+    assert service.start() == 2
+    assert service.list('ann') == [kept]
+    assert service.list('bob') == [series]
+    service.stop()
+
+
+def test_http_keep_alive_round_trip(service):
+    started = threading.Event()
+    loop = asyncio.new_event_loop()
+    servers = []
+    task = loop.create_task(serve(service, port=0, ready=lambda server: (servers.append(server), started.set())))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(5)
+    port = servers[0].sockets[0].getsockname()[1]
+
+    async def client():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        replies = []
+        for method, path, body in (('POST', '/users/ann/reminders', {'text': "call", 'fire_at': NOW + HOUR}),
+                                   ('POST', '/users/ann/reminders/1/snooze', {'minutes': 0}),
+                                   ('GET', '/users/ann/reminders', None)):
+            data = json.dumps(body).encode() if body else b''
+            writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+            head = (await reader.readuntil(b'\r\n\r\n')).decode()
+            length = int(head.split('Content-Length: ')[1].split('\r\n')[0])
+            replies.append((int(head.split(' ')[1]), json.loads(await reader.readexactly(length))))
+        writer.close()
+        return replies
+
+    try:
+        created, snoozed, listed = asyncio.run(client())
+    finally:
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(5)
+    assert created[0] == 201
+    assert snoozed == (400, {'error': "minutes must be more than 0"})
+    assert listed == (200, [created[1]])
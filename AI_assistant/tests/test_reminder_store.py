@@ -0,0 +1,161 @@
+import json
+import os
+
+import pytest
+
+import reminder_store
+from reminder_store import ReminderStore
+
+EVERYTHING = float('inf')
+
+
+def rows_by_id(rows):
+    return {row[0]: row for row in rows}
+
+
+def test_reopen_restores_what_was_recorded(tmp_path):
+    store = ReminderStore(tmp_path)
+    assert store.open(EVERYTHING) == []
+    first, second, third = store.new_id(), store.new_id(), store.new_id()
+    store.record_set(first, "call mom", 100.0)
+    store.record_set(second, "water plants", 200.0, 'day', 200.0, 0)
+    store.record_set(third, "pay rent", 300.0)
+    store.record_fire(second, 86600.0, 1)
+    store.record_cancel(third)
+    store.close()
+
+    store = ReminderStore(tmp_path)
+    rows = rows_by_id(store.open(EVERYTHING))
+    store.close()
+    assert rows == {
+        first: (first, "call mom", 100.0, None, None, 0, None),
+        second: (second, "water plants", 86600.0, 'day', 200.0, 1, None)
+    }
+
+
+def test_journal_tail_is_replayed_after_a_crash(tmp_path):
+    # What a run that died before compacting leaves behind, ending in a torn write
+    events = [
+        ['set', 1, "call mom", 100.0, None, None, 0],
+        ['set', 2, "stand up", 150.0, 'week', 150.0, 0, 'alice'],
+        ['fire', 1, None, 0],
+        ['set', 3, "dentist", 400.0, None, None, 0, None],
+        ['fire', 2, 604950.0, 1],
+    ]
+    with open(os.path.join(tmp_path, 'journal.log'), 'w') as journal:
+        journal.write(''.join(json.dumps(event) + '\n' for event in events))
+        journal.write('["cancel", 3')
+
+    store = ReminderStore(tmp_path)
+    rows = rows_by_id(store.open(EVERYTHING))
+    assert rows == {
+        2: (2, "stand up", 604950.0, 'week', 150.0, 1, 'alice'),
+        3: (3, "dentist", 400.0, None, None, 0, None)
+    }
+    # Ids continue after the replayed ones
+    assert store.new_id() == 4
+    store.close()
+
+
+def test_fired_one_off_stays_gone(tmp_path):
+    store = ReminderStore(tmp_path)
+    store.open(EVERYTHING)
+    reminder_id = store.new_id()
+    store.record_set(reminder_id, "past due", 1.0)
+    store.record_fire(reminder_id)
+    store.close()
+
+    store = ReminderStore(tmp_path)
+    assert store.open(EVERYTHING) == []
+    store.close()
+
+
+def test_uncompacted_changes_are_visible_to_queries(tmp_path):
+    store = ReminderStore(tmp_path, compact_every=1000)
+    store.open(EVERYTHING)
+    kept, cancelled = store.new_id(), store.new_id()
+    store.record_set(kept, "kept", 10.0)
+    store.record_set(cancelled, "cancelled", 20.0)
+    store.record_cancel(cancelled)
+    assert [row[0] for row in store.load_all()] == [kept]
+    store.close()
+
+
+def test_windows_page_in_each_reminder_once(tmp_path):
+    store = ReminderStore(tmp_path)
+    store.open(EVERYTHING)
+    for fire_at in (10.0, 20.0, 30.0):
+        store.record_set(store.new_id(), f"at {fire_at}", fire_at)
+    store.close()
+
+    store = ReminderStore(tmp_path)
+    assert [row[2] for row in store.open(15.0)] == [10.0]
+    assert [row[2] for row in store.load_window(25.0)] == [20.0]
+    assert store.load_window(25.0) == []
+    assert [row[2] for row in store.load_window(EVERYTHING)] == [30.0]
+    store.close()
+
+
+def test_cancel_reports_whether_the_reminder_was_in_memory(tmp_path):
+    store = ReminderStore(tmp_path)
+    store.open(EVERYTHING)
+    reminder_id = store.new_id()
+    store.record_set(reminder_id, "in memory", 10.0)
+    store.record_set(99, "never loaded", 10.0 ** 9)
+    assert store.record_cancel(reminder_id)
+    assert not store.record_cancel(99)
+    store.close()
+
+
+def test_use_before_open_is_an_error(tmp_path):
+    store = ReminderStore(tmp_path)
+    with pytest.raises(RuntimeError):
+        store.new_id()
+    with pytest.raises(RuntimeError):
+        store.record_set(1, "lost", 10.0)
+    with pytest.raises(RuntimeError):
+        store.load_all()
+
+
+def test_failed_journal_write_is_reported_instead_of_hanging(tmp_path, monkeypatch):
+    store = ReminderStore(tmp_path)
+    store.open(EVERYTHING)
+
+    def fail(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(reminder_store.os, 'fsync', fail)
+    store.record_set(store.new_id(), "lost", 10.0)
+    with pytest.raises(RuntimeError, match="No space left"):
+        store.flush()
+    with pytest.raises(RuntimeError):
+        store.record_set(store.new_id(), "refused", 20.0)
+    with pytest.raises(RuntimeError):
+        store.load_all()
+    store.close()
+
+
+def test_failed_compaction_keeps_the_journal(tmp_path, monkeypatch):
+    store = ReminderStore(tmp_path, compact_every=1)
+    store.open(EVERYTHING)
+    apply = store._apply
+    failures = []
+
+    def fail_once(events):
+        if not failures:
+            failures.append(events)
+            raise OSError("disk I/O error")
+        apply(events)
+
+    monkeypatch.setattr(store, '_apply', fail_once)
+    reminder_id = store.new_id()
+    store.record_set(reminder_id, "kept", 10.0)
+    store.flush()
+    assert failures
+    # The next batch compacts both events
+    store.record_fire(reminder_id, 20.0, 1)
+    store.close()
+
+    store = ReminderStore(tmp_path)
+    assert store.open(EVERYTHING) == [(reminder_id, "kept", 20.0, None, None, 1, None)]
+    store.close()
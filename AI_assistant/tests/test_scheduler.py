@@ -0,0 +1,143 @@
+import threading
+
+from scheduler import Scheduler
+
+
+# Function to run a scheduler whose clock is past every deadline until `count`
+# entries have fired; returns the (when, payload, key) calls in firing order
+def drain(scheduler, fired, count):
+    thread = threading.Thread(target=scheduler.run, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive(), f"only {len(fired)} of {count} entries fired"
+    return fired
+
+
+def make_scheduler(count, requeue=None):
+    fired = []
+
+    def on_fire(when, payload, key):
+        fired.append((when, payload, key))
+        if len(fired) == count:
+            scheduler.stop()
+        return requeue(when, payload) if requeue else None
+
+    scheduler = Scheduler(on_fire, clock=lambda: float('inf'))
+    return scheduler, fired
+
+
+def test_fires_in_time_order():
+    scheduler, fired = make_scheduler(3)
+    scheduler.schedule(30, 'c')
+    scheduler.schedule(10, 'a')
+    scheduler.schedule(20, 'b')
+    assert len(scheduler) == 3
+    assert [payload for _, payload, _ in drain(scheduler, fired, 3)] == ['a', 'b', 'c']
+    assert len(scheduler) == 0
+
+
+def test_equal_times_fire_by_key():
+    scheduler, fired = make_scheduler(3)
+    scheduler.schedule_many([(5, 'second'), (5, 'third'), (5, 'first')], keys=[2, 3, 1])
+    assert [payload for _, payload, _ in drain(scheduler, fired, 3)] == ['first', 'second', 'third']
+
+
+def test_own_keys_never_clash_with_caller_keys():
+    scheduler = Scheduler(lambda when, payload, key: None)
+    own = scheduler.schedule(1, 'a')
+    given = scheduler.schedule(1, 'b', key=1)
+    assert own[1] < 0 and given[1] == 1
+
+
+def test_cancelled_entry_does_not_fire():
+    scheduler, fired = make_scheduler(2)
+    scheduler.schedule(1, 'keep')
+    handle = scheduler.schedule(2, 'drop')
+    scheduler.schedule(3, 'keep too')
+    assert scheduler.cancel(handle)
+    assert not scheduler.cancel(handle)
+    assert len(scheduler) == 2
+    assert [payload for _, payload, _ in drain(scheduler, fired, 2)] == ['keep', 'keep too']
+
+
+def test_cancel_ignores_entries_that_are_not_queued():
+    scheduler, fired = make_scheduler(1)
+    done = scheduler.schedule(1, 'fires')
+    scheduler.schedule(2, 'waits', key=5)
+    drain(scheduler, fired, 1)
+    assert len(scheduler) == 1
+    assert not scheduler.cancel(done)
+    assert not scheduler.cancel((3, 99, 'never queued'))
+    assert len(scheduler) == 1
+    assert scheduler.cancel((2, 5, 'waits'))
+    assert len(scheduler) == 0
+
+
+def test_failing_callback_does_not_stop_the_scheduler(capsys):
+    fired = []
+
+    def on_fire(when, payload, key):
+        fired.append(payload)
+        if payload == 'broken':
+            raise RuntimeError("speaker unplugged")
+        if len(fired) == 3:
+            scheduler.stop()
+        return when + 100 if payload == 'daily' else None
+
+    scheduler = Scheduler(on_fire, clock=lambda: float('inf'))
+    scheduler.schedule(1, 'daily')
+    scheduler.schedule(50, 'broken')
+    drain(scheduler, fired, 3)
+    assert fired == ['daily', 'broken', 'daily']
+    assert "speaker unplugged" in capsys.readouterr().out
+    # The broken entry is gone; the recurring one is queued again
+    assert len(scheduler) == 1
+
+
+def test_next_deadline_skips_cancelled_entries():
+    scheduler = Scheduler(lambda when, payload, key: None)
+    assert scheduler.next_deadline() is None
+    first = scheduler.schedule(10, 'a')
+    scheduler.schedule(20, 'b')
+    scheduler.cancel(first)
+    assert scheduler.next_deadline() == 20
+
+
+def test_returned_time_requeues_the_payload_under_its_key():
+    scheduler, fired = make_scheduler(3, requeue=lambda when, payload: when + 100)
+    scheduler.schedule(1, 'daily', key=7)
+    drain(scheduler, fired, 3)
+    assert fired == [(1, 'daily', 7), (101, 'daily', 7), (201, 'daily', 7)]
+    assert len(scheduler) == 1
+
+
+def test_cancel_during_callback_stops_requeue():
+    fired = []
+
+    def on_fire(when, payload, key):
+        fired.append(when)
+        # The reminder is cancelled while it is being announced
+        scheduler.cancel(handle)
+        scheduler.stop()
+        return when + 100
+
+    scheduler = Scheduler(on_fire, clock=lambda: float('inf'))
+    handle = scheduler.schedule(1, 'daily', key=7)
+    drain(scheduler, fired, 1)
+    assert fired == [1]
+    assert len(scheduler) == 0
+    assert scheduler.next_deadline() is None
+
+
+def test_waits_for_the_clock():
+    now = [0.0]
+    fired = threading.Event()
+    scheduler = Scheduler(lambda when, payload, key: fired.set(), clock=lambda: now[0], max_sleep=0.01)
+    scheduler.schedule(10, 'later')
+    thread = threading.Thread(target=scheduler.run, daemon=True)
+    thread.start()
+    assert not fired.wait(0.1)
+    now[0] = 10
+    assert fired.wait(5)
+    scheduler.stop()
+    thread.join(5)
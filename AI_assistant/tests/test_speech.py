@@ -0,0 +1,231 @@
+import os
+import time
+
+import pytest
+
+import speech
+from speech import URGENT, PhraseCache, SpeechWorker, StubEngine, StubPlayer
+
+
+@pytest.fixture
+def engine():
+    return StubEngine(seconds_per_char=0.01)
+
+
+def start_worker(engine, **kwargs):
+    kwargs.setdefault('coalesce_window', 0.0)
+    return SpeechWorker(lambda: engine, **kwargs).start()
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_speak_returns_before_the_speech_is_done(engine):
+    worker = start_worker(engine)
+    started = time.monotonic()
+    assert worker.speak("a fairly long sentence to say " * 5)
+    assert time.monotonic() - started < 0.1
+    assert engine.spoken == []
+    assert worker.wait_until_idle(5)
+    assert len(engine.spoken) == 1
+
+    worker.speak("Done.", wait=True)
+    assert engine.spoken[-1] == "Done."
+
+
+def test_urgent_messages_jump_the_queue(engine):
+    worker = start_worker(engine)
+    worker.speak("the weather report for today")
+    wait_for(lambda: engine.started)
+    worker.speak("first")
+    worker.speak("second")
+    worker.speak("Reminder: call mom", priority=URGENT)
+    assert worker.wait_until_idle(5)
+    assert engine.spoken == ["the weather report for today", "Reminder: call mom", "first", "second"]
+
+
+def test_full_queue_drops_the_least_important_message(engine):
+    worker = SpeechWorker(lambda: engine, maxsize=2, coalesce_window=0.0)
+    assert worker.speak("one")
+    assert worker.speak("two")
+    assert not worker.speak("three")
+    assert worker.speak("Reminder: urgent", priority=URGENT)
+    assert worker.dropped == 2
+    worker.start()
+    assert worker.wait_until_idle(5)
+    assert engine.spoken == ["Reminder: urgent", "one"]
+
+
+def test_a_burst_of_one_group_is_spoken_as_one_announcement(engine):
+    worker = start_worker(engine, coalesce_window=0.2)
+    for text in ("call mom", "pay rent", "water plants"):
+        worker.speak(f"Reminder: {text}", priority=URGENT, group='reminder', detail=text)
+    worker.speak("unrelated")
+    assert worker.wait_until_idle(5)
+    assert engine.spoken == ["3 reminders due: call mom pay rent water plants", "unrelated"]
+    assert worker.metrics()['coalesced'] == 2
+
+
+def test_a_broken_engine_does_not_hang_callers(capsys):
+    def broken():
+        raise RuntimeError("no audio device")
+
+    worker = SpeechWorker(broken).start()
+    assert worker.speak("hello", wait=True)
+    assert worker.speak("again", wait=True)
+    assert worker.wait_until_idle(5)
+    assert isinstance(worker.failed, RuntimeError)
+    assert "no audio device" in capsys.readouterr().out
+
+
+def test_stub_engine_is_used_headless(monkeypatch):
+    monkeypatch.setenv('ASSISTANT_TTS', 'stub')
+    assert isinstance(speech.create_engine(), StubEngine)
+
+
+# Function to render a phrase as `size` bytes of fake audio
+def render_bytes(size):
+    def render(text, path):
+        with open(path, 'wb') as audio:
+            audio.write(b'\0' * size)
+    return render
+
+
+def test_phrase_cache_renders_once(tmp_path):
+    cache = PhraseCache(str(tmp_path))
+    assert cache.get("How can I help?") is None
+    path = cache.put("How can I help?", render_bytes(100))
+    assert cache.get("How can I help?") == path
+    assert cache.get("How can I help? ") is None
+    assert cache.metrics() == {'entries': 1, 'bytes': 100, 'hits': 1, 'misses': 2, 'hit_rate': 1 / 3,
+                               'evictions': 0}
+    # Another voice or rate renders the phrase differently
+    assert PhraseCache(str(tmp_path), voice='other').get("How can I help?") is None
+
+
+def test_phrase_cache_evicts_the_least_recently_played(tmp_path):
+    cache = PhraseCache(str(tmp_path), max_bytes=250)
+    first = cache.put("one", render_bytes(100))
+    cache.put("two", render_bytes(100))
+    cache.get("one")
+    cache.put("three", render_bytes(100))
+    assert cache.get("two") is None
+    assert cache.get("one") == first
+    assert cache.metrics()['evictions'] == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(cache.get(text)) for text in ("one", "three"))
+
+
+def test_phrase_cache_survives_a_restart(tmp_path):
+    cache = PhraseCache(str(tmp_path))
+    first = cache.put("one", render_bytes(100))
+    second = cache.put("two", render_bytes(100))
+    os.utime(first, (1000, 1000))
+    os.utime(second, (2000, 2000))
+    # Reopened smaller: the phrase played longest ago goes
+    cache = PhraseCache(str(tmp_path), max_bytes=150)
+    assert cache.get("one") is None
+    assert cache.get("two") == second
+
+
+def test_phrase_cache_skips_failed_renders(tmp_path, capsys):
+    def broken(text, path):
+        raise RuntimeError("engine crashed")
+
+    cache = PhraseCache(str(tmp_path))
+    assert cache.put("hello", broken) is None
+    assert "engine crashed" in capsys.readouterr().out
+    assert cache.put("hello", render_bytes(0)) is None
+    assert cache.get("hello") is None
+
+
+def test_cacheable_fragments_play_from_disk(tmp_path):
+    player = StubPlayer()
+    worker = start_worker(StubEngine(), phrase_cache=PhraseCache(str(tmp_path)), player=player)
+    for _ in range(2):
+        worker.speak(["Reminder set for", "5 PM"], cacheable=(True, False), wait=True)
+    cache = worker.phrase_cache.metrics()
+    assert (cache['entries'], cache['hits'], cache['misses']) == (1, 1, 1)
+    assert len(player.played) == 2 and player.played[0] == player.played[1]
+    assert worker.engine.spoken == ["5 PM", "5 PM"]
+
+
+def test_cancel_cuts_off_the_message_being_spoken(engine):
+    worker = start_worker(engine)
+    worker.speak("a long weather report " * 20)
+    worker.speak("and then some more")
+    wait_for(lambda: engine.started)
+    started = time.monotonic()
+    assert worker.cancel() == 1
+    assert worker.wait_until_idle(1)
+    assert time.monotonic() - started < 1
+    assert engine.spoken == []
+
+
+def test_cancel_keeps_urgent_speech(engine):
+    worker = start_worker(engine)
+    worker.speak("Reminder: call mom", priority=URGENT)
+    wait_for(lambda: engine.started)
+    worker.cancel()
+    assert worker.wait_until_idle(5)
+    assert engine.spoken == ["Reminder: call mom"]
+
+
+def test_cancel_stops_cached_playback(engine, tmp_path):
+    player = StubPlayer()
+    worker = start_worker(engine, phrase_cache=PhraseCache(str(tmp_path)), player=player)
+    worker.speak("Hello! I'm your AI assistant. How can I help you today? " * 5, cacheable=True)
+    wait_for(lambda: player.started)
+    worker.cancel()
+    assert worker.wait_until_idle(1)
+    assert player.played == []
+
+
+def test_spoke_since(engine):
+    worker = start_worker(engine)
+    before = time.monotonic()
+    assert not worker.spoke_since(before)
+    worker.speak("Okay.", wait=True)
+    assert worker.spoke_since(before)
+    assert not worker.spoke_since(time.monotonic())
+
+
+# Stand-in for audio_stream.AudioStream: hands out (text, heard_at) pairs
+class FakeStream:
+    def __init__(self, *heard):
+        self.heard = list(heard)
+        self.heard_at = None
+
+    def listen(self, timeout=None):
+        import speech_recognition as sr
+
+        if not self.heard:
+            raise sr.WaitTimeoutError("nothing more")
+        text, self.heard_at = self.heard.pop(0)
+        return text
+
+
+@pytest.fixture
+def listen(monkeypatch):
+    import audio_stream
+    import greet
+
+    # The assistant was talking from t=10 to t=20
+    monkeypatch.setattr(speech, 'spoke_since', lambda moment: moment <= 20)
+
+    def run(*heard):
+        monkeypatch.setattr(audio_stream, 'get_stream', lambda: FakeStream(*heard))
+        return greet.listen()
+    return run
+
+
+def test_echo_of_the_assistant_is_ignored(listen):
+    assert listen(("the current time is ten", 12), ("What time is it", 25)) == "what time is it"
+    assert listen(("the current time is ten", 12)) == ""
+
+
+def test_stop_over_the_assistant_barges_in(listen):
+    assert listen(("the weather in pune is stop stop", 15)) == "stop"
@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+
+import pytest
+
+import temporal
+
+# Conformance corpus for temporal.py, evaluated on Wednesday 12 June 2024:
+# (text, expected date, expected time). The temporal
+# benchmark times the extractor over the same texts.
+TEMPORAL_TODAY = date(2024, 6, 12)
+TEMPORAL_CASES = [
+    ("schedule a meeting with john today at 3 pm", date(2024, 6, 12), (15, 0)),
+    ("meeting with priya tomorrow at 10:30 am", date(2024, 6, 13), (10, 30)),
+    ("meeting with the team day after tomorrow at 9am", date(2024, 6, 14), (9, 0)),
+    ("remind me the day after tomorrow at noon", date(2024, 6, 14), (12, 0)),
+    ("meeting next monday at 4 p.m.", date(2024, 6, 17), (16, 0)),
+    ("call on friday at 7 o'clock", date(2024, 6, 14), (7, 0)),
+    ("meeting next wednesday at 11", date(2024, 6, 19), (11, 0)),
+    ("dinner on 15th august at 8pm", date(2024, 8, 15), (20, 0)),
+    ("review on aug 15th at 8:45 pm", date(2024, 8, 15), (20, 45)),
+    ("party 3rd of march", date(2025, 3, 3), None),
+    ("standup 12 jun at 9:15am", date(2024, 6, 12), (9, 15)),
+    ("sync for 21 December at 12 am", date(2024, 12, 21), (0, 0)),
+    ("lunch at 12 pm", None, (12, 0)),
+    ("call back in 20 minutes", None, timedelta(minutes=20)),
+    ("check the oven in 2 hours", None, timedelta(hours=2)),
+    ("water plants this evening", None, (18, 0)),
+    ("read a book tonight", None, (20, 0)),
+    ("go running in the morning", None, (9, 0)),
+    ("deploy at midnight", None, (0, 0)),
+    ("Meeting   With  Bob   TOMORROW   AT 5 PM", date(2024, 6, 13), (17, 0)),
+    ("buy 2 apples", None, None),
+    ("invalid date 31 feb at 3pm", None, (15, 0)),
+    # Feb 29 is next in 2028
+    ("anniversary on 29 feb at 7pm", date(2028, 2, 29), (19, 0)),
+]
+
+
+@pytest.mark.parametrize('text, expected_date, expected_time', TEMPORAL_CASES)
+def test_conformance(text, expected_date, expected_time):
+    assert temporal.extract_date(text, TEMPORAL_TODAY) == expected_date
+    assert temporal.extract_time(text, TEMPORAL_TODAY) == expected_time
+
+
+@pytest.mark.parametrize('text', ["meet at 25 o'clock", "call at 7:61"])
+def test_time_that_does_not_exist(text):
+    with pytest.raises(ValueError):
+        temporal.extract_time(text, TEMPORAL_TODAY)
+
+
+@pytest.mark.parametrize('today, expected', [
+    (date(2024, 1, 10), date(2024, 2, 29)),
+    (date(2024, 2, 29), date(2024, 2, 29)),
+    (date(2024, 3, 1), date(2028, 2, 29)),
+    (date(2097, 3, 1), date(2104, 2, 29)),
+])
+def test_leap_day_rolls_forward_to_the_next_leap_year(today, expected):
+    assert temporal.resolve_date(('date', 2, 29), today) == expected
+
+
+def test_date_that_never_exists():
+    assert temporal.resolve_date(('date', 2, 31), TEMPORAL_TODAY) is None
+    assert temporal.resolve_date(('date', 4, 31), TEMPORAL_TODAY) is None
@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from weather_client import WeatherClient, describe
+
+
+# Stand-in for weatherapi.com's current.json: "nowhere" is unknown, "slow" takes
+# `delay` seconds, and `gate` (when set) holds every answer until it opens
+class StubWeather:
+    def __init__(self):
+        self.queries = []
+        self.connections = 0
+        self.delay = 0.0
+        self.gate = None
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                city = query['q'][0]
+                stub.queries.append((query['key'][0], city))
+                if stub.gate:
+                    stub.gate.wait(5)
+                if city == 'slow':
+                    time.sleep(stub.delay)
+                if city == 'nowhere':
+                    status, payload = 400, {'error': {'message': "No matching location found."}}
+                else:
+                    status, payload = 200, {'current': {'temp_c': 21.5, 'condition': {'text': "Sunny"}}}
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/current.json"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def stub():
+    stub = StubWeather()
+    yield stub
+    if stub.gate:
+        stub.gate.set()
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+def test_summary_and_cache(stub):
+    client = WeatherClient('secret', stub.url)
+    assert client.get_weather("London") == "The current temperature in London is 21.5°C with Sunny."
+    assert client.get_weather("LONDON ") == "The current temperature in LONDON  is 21.5°C with Sunny."
+    # Normalized city names share one cache entry and one keep-alive connection
+    assert stub.queries == [('secret', 'london')]
+    assert client.cache_hits == 1
+    client.clear_cache()
+    client.get_weather("London")
+    assert len(stub.queries) == 2 and stub.connections == 1
+
+
+def test_entries_expire_and_the_oldest_is_evicted(stub):
+    client = WeatherClient('secret', stub.url, ttl=0.05, max_entries=2)
+    client.current("paris")
+    time.sleep(0.1)
+    client.current("paris")
+    assert stub.queries.count(('secret', 'paris')) == 2
+
+    client.ttl = 600
+    for city in ("rome", "oslo", "paris", "rome"):
+        client.current(city)
+    # paris was fresh, rome had been pushed out by oslo and paris
+    assert [city for _, city in stub.queries] == ['paris', 'paris', 'rome', 'oslo', 'paris', 'rome']
+
+
+def test_concurrent_lookups_for_a_city_are_coalesced(stub):
+    stub.gate = threading.Event()
+    client = WeatherClient('secret', stub.url)
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(client.current, "Tokyo") for _ in range(8)]
+        while client.coalesced < 7:
+            time.sleep(0.01)
+        stub.gate.set()
+        results = [future.result(5) for future in futures]
+    assert stub.queries == [('secret', 'tokyo')]
+    assert all(result is results[0] for result in results)
+
+
+def test_failures_are_reported_and_not_cached(stub, capsys):
+    client = WeatherClient('secret', stub.url)
+    assert client.get_weather("nowhere") == "Sorry, I couldn't fetch the weather information at the moment."
+    assert "400" in capsys.readouterr().out
+    client.get_weather("nowhere")
+    assert len(stub.queries) == 2
+
+
+def test_unreachable_server(stub):
+    url = stub.url
+    stub.server.shutdown()
+    stub.server.server_close()
+    client = WeatherClient('secret', url, timeout=(0.5, 0.5))
+    assert client.get_weather("London") == "Sorry, I couldn't fetch the weather information at the moment."
+
+
+def test_many_cities_with_a_deadline(stub):
+    stub.delay = 1.0
+    client = WeatherClient('secret', stub.url)
+    started = time.monotonic()
+    results = client.get_weather_many(["Lima", "nowhere", "slow", "Lima"], deadline=0.5)
+    assert time.monotonic() - started < 1.5
+    assert results == {
+        "Lima": (True, describe("Lima", {'current': {'temp_c': 21.5, 'condition': {'text': "Sunny"}}})),
+        "nowhere": (False, results["nowhere"][1]),
+        "slow": (False, "Timed out fetching the weather for slow."),
+    }
+    assert results["nowhere"][1].startswith("Couldn't fetch the weather for nowhere: 400")
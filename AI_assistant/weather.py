@@ -1,6 +1,6 @@
-import requests
 from dotenv import load_dotenv
 import os
+from weather_client import get_client
 
 # Load environment variables from .env file
 load_dotenv()
@@ -9,36 +9,19 @@ load_dotenv()
 API_KEY = os.getenv("API_KEY")
 
 def get_weather(city):
-    base_url = "http://api.weatherapi.com/v1/current.json"
-    params = {
-        "key": API_KEY,
-        "q": city,
-        "aqi": "no"
-    }
-    response = requests.get(base_url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        temperature = data['current']['temp_c']
-        description = data['current']['condition']['text']
-        return f"The current temperature in {city} is {temperature}°C with {description}."
-    else:
-        return "Sorry, I couldn't fetch the weather information at the moment."
+    return get_client(API_KEY).get_weather(city)
+
+# Look up several cities at once; returns {city: (ok, message)}
+def get_weather_many(cities, max_workers=16, deadline=None):
+    return get_client(API_KEY).get_weather_many(cities, max_workers=max_workers, deadline=deadline)
     
 ########################################################################################################################################
 
 def check_weather_api(api_key, city):
-    base_url = "http://api.weatherapi.com/v1/current.json"
-    params = {
-        "key": api_key,
-        "q": city,
-        "aqi": "no"  # You can set this to "yes" if you want air quality information
-    }
-    
+    import requests
+
     try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()  # Raises an HTTPError if the HTTP request returned an unsuccessful status code
-        
-        data = response.json()
+        data = get_client(api_key).current(city)
         temperature = data['current']['temp_c']
         description = data['current']['condition']['text']
         
@@ -48,7 +31,7 @@ def check_weather_api(api_key, city):
         print(f"Description: {description}")
     
     except requests.exceptions.HTTPError as http_err:
-        error_message = response.json().get("error", {}).get("message", "Unknown error")
+        error_message = http_err.response.json().get("error", {}).get("message", "Unknown error")
         print(f"HTTP error occurred: {http_err}")
         print(f"Error message from API: {error_message}")
     except Exception as err:
@@ -57,8 +40,10 @@ def check_weather_api(api_key, city):
 # You can change this to any city you want to test
 CITY = "Pune"
 
-# Check if API key is loaded
-if API_KEY:
-    check_weather_api(API_KEY, CITY)
-else:
-    print("API key not found. Please make sure it's set in the .env file.")
+# The live API check only runs when this file is executed, never on import
+if __name__ == "__main__":
+    # Check if API key is loaded
+    if API_KEY:
+        check_weather_api(API_KEY, CITY)
+    else:
+        print("API key not found. Please make sure it's set in the .env file.")
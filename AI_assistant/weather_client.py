@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import metrics
+
+# WEATHER_API_URL points the client at another endpoint, e.g. a local stub
+BASE_URL = os.getenv("WEATHER_API_URL", "http://api.weatherapi.com/v1/current.json")
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+
+
+def normalize_city(city):
+    return ' '.join(city.lower().split())
+
+
+# Function to format a weatherapi.com current-conditions payload
+def describe(city, data):
+    temperature = data['current']['temp_c']
+    description = data['current']['condition']['text']
+    return f"The current temperature in {city} is {temperature}°C with {description}."
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Weather client shared by weather.py and greet.py: keep-alive connection pool,
+# explicit timeouts, a TTL cache with LRU eviction keyed on the normalized city,
+# and coalescing of concurrent lookups for the same city into one request.
+class WeatherClient:
+    def __init__(self, api_key, base_url=BASE_URL, timeout=DEFAULT_TIMEOUT, ttl=600, max_entries=256, pool_size=10):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # requests is imported here so importing this module stays cheap
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.requests_made = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+
+    # Function to get the raw current-conditions payload for a city.
+    # Raises requests.RequestException (or ValueError on a bad body) on failure.
+    def current(self, city, timeout=None):
+        key = normalize_city(city)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                metrics.count('weather_cache_hit')
+                return cached[1]
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            else:
+                self.coalesced += 1
+                metrics.count('weather_coalesced')
+
+        if not leader:
+            call.event.wait()
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._fetch(key, timeout or self.timeout)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                # Failures are not cached, so the next lookup retries
+                if call.error is None:
+                    self._cache[key] = (time.monotonic() + self.ttl, call.result)
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+            call.event.set()
+
+    @metrics.timed('weather_http')
+    def _fetch(self, city, timeout):
+        params = {
+            "key": self.api_key,
+            "q": city,
+            "aqi": "no"
+        }
+        with self._lock:
+            self.requests_made += 1
+        response = self.session.get(self.base_url, params=params, timeout=timeout)
+        response.raise_for_status()  # Will raise an exception for 4xx/5xx status codes
+        return response.json()
+
+    # Function to get a spoken weather summary for a city
+    def get_weather(self, city):
+        import requests
+
+        try:
+            return describe(city, self.current(city))
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            print(f"Error fetching weather data: {e}")
+            return "Sorry, I couldn't fetch the weather information at the moment."
+
+    # Function to look up many cities concurrently; returns {city: (ok, message)}.
+    # Each request gets request_timeout; cities still pending when the overall
+    # deadline passes are reported as failures instead of holding up the rest.
+    def get_weather_many(self, cities, max_workers=16, deadline=None, request_timeout=None):
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        futures = {executor.submit(self.current, city, request_timeout): city for city in dict.fromkeys(cities)}
+        _, not_done = wait(futures, timeout=deadline)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        results = {}
+        for future, city in futures.items():
+            if future in not_done:
+                results[city] = (False, f"Timed out fetching the weather for {city}.")
+            elif future.exception() is not None:
+                results[city] = (False, f"Couldn't fetch the weather for {city}: {future.exception()}")
+            else:
+                try:
+                    results[city] = (True, describe(city, future.result()))
+                except (KeyError, TypeError) as e:
+                    results[city] = (False, f"Unexpected weather data for {city}: {e}")
+        return results
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+# Function to get the process-wide client for an API key
+def get_client(api_key, base_url=BASE_URL):
+    with _clients_lock:
+        client = _clients.get((api_key, base_url))
+        if client is None:
+            client = _clients[(api_key, base_url)] = WeatherClient(api_key, base_url)
+    return client